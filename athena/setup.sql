@@ -6,6 +6,11 @@
 --
 -- Usage: Run this in AWS Athena console after S3 bucket is created
 -- Replace {BUCKET_NAME} with your actual S3 bucket name
+--
+-- The JsonSerDe reads one JSON record per line. Reports written with
+-- generate_test_data.py --format jsonl.gz hold one finding per line in
+-- the same nesting as the full report, so the *_scans tables below read
+-- them unchanged; Athena decompresses .gz objects by their extension.
 -- ========================================
 
 -- Create database
@@ -245,6 +250,153 @@ TBLPROPERTIES (
   'recursive.directories' = 'true'
 );
 
+-- ========================================
+-- Compacted Trivy Findings Table
+-- ========================================
+-- One row per finding, written as Parquet by scripts/compact_reports.py
+CREATE EXTERNAL TABLE IF NOT EXISTS security_analytics.trivy_findings (
+  run_id STRING,
+  target STRING,
+  vulnerability_id STRING,
+  pkg_name STRING,
+  installed_version STRING,
+  fixed_version STRING,
+  severity STRING,
+  title STRING
+)
+PARTITIONED BY (
+  year STRING,
+  month STRING,
+  day STRING
+)
+STORED AS PARQUET
+LOCATION 's3://bankapp-security-reports-211125523455/compacted/trivy_findings/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.year.type' = 'integer',
+  'projection.year.range' = '2024,2030',
+  'projection.month.type' = 'integer',
+  'projection.month.range' = '01,12',
+  'projection.month.digits' = '2',
+  'projection.day.type' = 'integer',
+  'projection.day.range' = '01,31',
+  'projection.day.digits' = '2',
+  'storage.location.template' = 's3://bankapp-security-reports-211125523455/compacted/trivy_findings/${year}/${month}/${day}',
+  'parquet.compression' = 'ZSTD'
+);
+
+-- ========================================
+-- Compacted Snyk Findings Table
+-- ========================================
+-- One row per finding, written as Parquet by scripts/compact_reports.py
+CREATE EXTERNAL TABLE IF NOT EXISTS security_analytics.snyk_findings (
+  run_id STRING,
+  snyk_id STRING,
+  cve_id STRING,
+  package_name STRING,
+  version STRING,
+  fixed_version STRING,
+  severity STRING,
+  title STRING,
+  cvss_score DOUBLE
+)
+PARTITIONED BY (
+  year STRING,
+  month STRING,
+  day STRING
+)
+STORED AS PARQUET
+LOCATION 's3://bankapp-security-reports-211125523455/compacted/snyk_findings/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.year.type' = 'integer',
+  'projection.year.range' = '2024,2030',
+  'projection.month.type' = 'integer',
+  'projection.month.range' = '01,12',
+  'projection.month.digits' = '2',
+  'projection.day.type' = 'integer',
+  'projection.day.range' = '01,31',
+  'projection.day.digits' = '2',
+  'storage.location.template' = 's3://bankapp-security-reports-211125523455/compacted/snyk_findings/${year}/${month}/${day}',
+  'parquet.compression' = 'ZSTD'
+);
+
+-- ========================================
+-- Compacted Gitleaks Findings Table
+-- ========================================
+-- One row per finding, written as Parquet by scripts/compact_reports.py
+CREATE EXTERNAL TABLE IF NOT EXISTS security_analytics.gitleaks_findings (
+  run_id STRING,
+  rule_id STRING,
+  description STRING,
+  file STRING,
+  start_line INT,
+  `commit` STRING,
+  entropy DOUBLE,
+  fingerprint STRING
+)
+PARTITIONED BY (
+  year STRING,
+  month STRING,
+  day STRING
+)
+STORED AS PARQUET
+LOCATION 's3://bankapp-security-reports-211125523455/compacted/gitleaks_findings/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.year.type' = 'integer',
+  'projection.year.range' = '2024,2030',
+  'projection.month.type' = 'integer',
+  'projection.month.range' = '01,12',
+  'projection.month.digits' = '2',
+  'projection.day.type' = 'integer',
+  'projection.day.range' = '01,31',
+  'projection.day.digits' = '2',
+  'storage.location.template' = 's3://bankapp-security-reports-211125523455/compacted/gitleaks_findings/${year}/${month}/${day}',
+  'parquet.compression' = 'ZSTD'
+);
+
+-- ========================================
+-- Daily Security Summary Table
+-- ========================================
+-- One pre-aggregated record per day, maintained by scripts/rollup_reports.py
+CREATE EXTERNAL TABLE IF NOT EXISTS security_analytics.daily_security_summary (
+  scan_date STRING,
+  runs INT,
+  critical_count INT,
+  high_count INT,
+  medium_count INT,
+  low_count INT,
+  total_count INT,
+  secret_count INT,
+  affected_files INT,
+  risk_score DOUBLE,
+  risk_level STRING,
+  generated_at STRING
+)
+PARTITIONED BY (
+  year STRING,
+  month STRING,
+  day STRING
+)
+ROW FORMAT SERDE 'org.openx.data.jsonserde.JsonSerDe'
+WITH SERDEPROPERTIES (
+  'ignore.malformed.json' = 'true'
+)
+LOCATION 's3://bankapp-security-reports-211125523455/daily_security_summary/'
+TBLPROPERTIES (
+  'projection.enabled' = 'true',
+  'projection.year.type' = 'integer',
+  'projection.year.range' = '2024,2030',
+  'projection.month.type' = 'integer',
+  'projection.month.range' = '01,12',
+  'projection.month.digits' = '2',
+  'projection.day.type' = 'integer',
+  'projection.day.range' = '01,31',
+  'projection.day.digits' = '2',
+  'storage.location.template' = 's3://bankapp-security-reports-211125523455/daily_security_summary/${year}/${month}/${day}'
+);
+
 -- ========================================
 -- Repair partitions (run after first data upload)
 -- ========================================
@@ -0,0 +1,146 @@
+"""
+AI Report Cache
+
+Local on-disk cache for AI-generated reports. Entries are keyed on a hash
+of the canonicalized scan findings plus the prompt template version, so
+an unchanged security posture reuses the stored report instead of
+calling Gemini again. Eviction is LRU (by access time) bounded by total
+size, plus a TTL on entry age.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+DEFAULT_CACHE_DIR = os.getenv('AI_CACHE_DIR', '.ai-cache')
+DEFAULT_MAX_BYTES = int(os.getenv('AI_CACHE_MAX_BYTES', str(50 * 1024 * 1024)))
+DEFAULT_TTL_SECONDS = int(os.getenv('AI_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+_MODULUS = 1 << 256
+
+
+class FindingsDigest:
+    """Order-independent hash of a multiset of findings.
+
+    Each finding's fields are hashed on their own and the digests are
+    summed modulo 2**256, which gives the same result as hashing the
+    sorted list of findings without having to keep that list in memory.
+    """
+
+    def __init__(self):
+        self._acc = 0
+        self.count = 0
+
+    def add(self, *fields):
+        encoded = "\x1f".join("" if f is None else str(f) for f in fields).encode('utf-8')
+        self._acc = (self._acc + int.from_bytes(hashlib.sha256(encoded).digest(), 'big')) % _MODULUS
+        self.count += 1
+
+    def hexdigest(self):
+        return f"{self._acc:064x}:{self.count}"
+
+
+def cache_key(prompt_version, *parts):
+    """Cache key from the prompt template version and canonicalized data parts"""
+    h = hashlib.sha256(prompt_version.encode('utf-8'))
+    for part in parts:
+        h.update(b"\x1e")
+        if isinstance(part, FindingsDigest):
+            h.update(part.hexdigest().encode('utf-8'))
+        else:
+            h.update(json.dumps(part, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+    return h.hexdigest()
+
+
+class ReportCache:
+    """Size- and TTL-bounded LRU cache of text reports stored as JSON files"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.stats["misses"] += 1
+            return None
+
+        if time.time() - entry.get("created", 0) > self.ttl_seconds:
+            self._remove(path)
+            self.stats["misses"] += 1
+            return None
+
+        # Touch the entry so LRU eviction sees it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.stats["hits"] += 1
+        return entry.get("value")
+
+    def put(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"created": time.time(), "value": value}, f)
+        os.replace(tmp_path, self._path(key))
+        self.stats["writes"] += 1
+        self.evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.stats["evictions"] += 1
+        except OSError:
+            pass
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        now = time.time()
+        entries = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+                with open(path, 'r', encoding='utf-8') as f:
+                    created = json.load(f).get("created", 0)
+            except (OSError, ValueError):
+                continue
+            if now - created > self.ttl_seconds:
+                self._remove(path)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def format_stats(self):
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        rate = (s["hits"] / lookups * 100) if lookups else 0
+        return (
+            f"AI cache: {s['hits']} hit(s), {s['misses']} miss(es) ({rate:.0f}% hit rate), "
+            f"{s['writes']} write(s), {s['evictions']} eviction(s)"
+        )
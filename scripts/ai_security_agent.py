@@ -1,15 +1,275 @@
-import json
+import heapq
 import os
-import requests
 import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import ExitStack
+
+from ai_cache import FindingsDigest, ReportCache, cache_key
+from gemini_client import GEMINI_STREAM, TextStream, format_generation, gemini_url, stream_generate
+from http_client import get_client
+from instrumentation import get_tracer
+from prompt_builder import (
+    PRIORITY_CONTEXT, PRIORITY_CRITICAL, PRIORITY_FINDINGS, PRIORITY_SECRETS, PromptBuilder
+)
+from report_format import iter_report_items
+
+# Per-source deadlines (seconds) for concurrent input collection
+REPORT_TIMEOUT = int(os.getenv('AI_AGENT_REPORT_TIMEOUT', '300'))
+SOURCE_TIMEOUT = int(os.getenv('AI_AGENT_SOURCE_TIMEOUT', '30'))
+
+# SonarQube issue search paging
+SONAR_PAGE_SIZE = 500
+SONAR_RESULT_WINDOW = 10000
+SONAR_MAX_ISSUES = int(os.getenv('SONAR_MAX_ISSUES', str(SONAR_RESULT_WINDOW)))
+SONAR_PAGE_WORKERS = 4
+SONAR_SEVERITY_ORDER = ["BLOCKER", "CRITICAL", "MAJOR", "MINOR", "INFO"]
+
+# Findings listed per scanner in the prompt
+TOP_N_FINDINGS = 5
+SEVERITY_ORDER = ["CRITICAL", "HIGH", "MEDIUM", "LOW", "UNKNOWN"]
+
+# Bump whenever the dashboard prompt changes so cached reports are not reused
+PROMPT_VERSION = "security-dashboard-v2"
+
+PROMPT_HEADER = """You are a DevSecOps AI Assistant. Your task is to act as a post-scan intelligence layer.
+Analyze these results from TRIVY, SNYK, GITLEAKS, and SONARQUBE for 'BankApp'.
+"""
+
+PROMPT_FOOTER = """Generate a CONCISE 'Executive Security Dashboard' (Max 250 words):
+1. 🛡️ OVERALL STATUS: One sentence on the security posture.
+2. 🚨 TOP 3 RISKS: Very brief, human-readable explanations of the 3 most dangerous issues (including any exposed secrets).
+3. 💡 ACTIONABLE FIXES:
+   - Update [Library] to [Version] (pom.xml)
+   - Refactor [File] to fix [Sonar Issue]
+   - Remove/Rotate any exposed secrets found by Gitleaks
+   - Quick Dockerfile security tip.
+
+Use a clean Markdown Table or List format. Keep it punchy and professional for a high-level client demo.
+"""
+
+SOURCE_BITS = {"trivy": 1, "snyk": 2, "gitleaks": 4}
+SEVERITY_RANK = {sev: rank for rank, sev in enumerate(reversed(SEVERITY_ORDER))}
+# Exposed secrets rank alongside CRITICAL vulnerabilities
+RISK_RANK = dict(SEVERITY_RANK, SECRET=SEVERITY_RANK["CRITICAL"])
+
+
+class Finding:
+    """One normalized finding, possibly reported by several scanners."""
+
+    __slots__ = ("finding_id", "package", "version", "severity", "title",
+                 "sources", "fixed_version", "cvss", "entropy", "location")
+
+    def __init__(self, finding_id, package, version, severity, title, source,
+                 fixed_version=None, cvss=None, entropy=None, location=None):
+        self.finding_id = finding_id
+        self.package = package
+        self.version = version
+        self.severity = severity
+        self.title = title
+        self.sources = SOURCE_BITS[source]
+        self.fixed_version = fixed_version
+        self.cvss = cvss
+        self.entropy = entropy
+        self.location = location
+
+    @property
+    def key(self):
+        return (self.finding_id, self.package, self.version)
+
+    def merge(self, other):
+        """Fold a duplicate report of the same finding into this one"""
+        self.sources |= other.sources
+        if SEVERITY_RANK.get(other.severity, 0) > SEVERITY_RANK.get(self.severity, 0):
+            self.severity = other.severity
+        self.title = self.title or other.title
+        self.fixed_version = self.fixed_version or other.fixed_version
+        self.location = self.location or other.location
+        if other.cvss is not None and (self.cvss is None or other.cvss > self.cvss):
+            self.cvss = other.cvss
+        if other.entropy is not None and (self.entropy is None or other.entropy > self.entropy):
+            self.entropy = other.entropy
+
+    def source_names(self):
+        return [name for name, bit in SOURCE_BITS.items() if self.sources & bit]
+
+
+class FindingIndex:
+    """Hash index of findings keyed by (CVE/ID, package, version).
+
+    Duplicates across scanners are merged on insert with a single dict
+    lookup, so building the index is O(n) in the number of raw findings.
+    Deduplication has to remember every key it has seen, so memory is
+    O(unique findings): one merged Finding per key. The top-K lists are
+    ranked over the merged findings with top_findings() and are exact.
+    """
 
-def get_gemini_response(prompt, api_key):
-    url = (
-        "https://generativelanguage.googleapis.com/"
-        "v1/models/gemini-2.5-flash:generateContent"
-        f"?key={api_key}"
+    def __init__(self):
+        self._findings = {}
+        self.raw_counts = {}
+        self.targets = {}
+
+    def __len__(self):
+        return len(self._findings)
+
+    def __iter__(self):
+        return iter(self._findings.values())
+
+    def add(self, finding, target=None):
+        source = finding.source_names()[0]
+        self.raw_counts[source] = self.raw_counts.get(source, 0) + 1
+        if target is not None:
+            self.targets[target] = self.targets.get(target, 0) + 1
+        key = finding.key
+        existing = self._findings.get(key)
+        if existing is None:
+            self._findings[key] = finding
+        else:
+            existing.merge(finding)
+
+    def merge(self, other):
+        """Merge another index (e.g. built by a different scanner's loader) into this one"""
+        for source, count in other.raw_counts.items():
+            self.raw_counts[source] = self.raw_counts.get(source, 0) + count
+        for target, count in other.targets.items():
+            self.targets[target] = self.targets.get(target, 0) + count
+        findings = self._findings
+        for key, finding in other._findings.items():
+            existing = findings.get(key)
+            if existing is None:
+                findings[key] = finding
+            else:
+                existing.merge(finding)
+        return self
+
+    def select(self, source=None):
+        """Unique findings, optionally only those one scanner reported"""
+        if not source:
+            return self._findings.values()
+        bit = SOURCE_BITS[source]
+        return (f for f in self._findings.values() if f.sources & bit)
+
+    def count(self, source=None):
+        return sum(1 for _ in self.select(source)) if source else len(self._findings)
+
+    def severity_counts(self, source=None):
+        counts = {}
+        for f in self.select(source):
+            counts[f.severity] = counts.get(f.severity, 0) + 1
+        return counts
+
+    def severity_line(self, source=None):
+        counts = self.severity_counts(source)
+        return ", ".join(
+            f"{sev}: {counts[sev]}"
+            for sev in sorted(counts, key=lambda sev: -SEVERITY_RANK.get(sev, -1))
+        )
+
+    def shared_count(self, source):
+        """Findings from source that another scanner also reported"""
+        bit = SOURCE_BITS[source]
+        return sum(1 for f in self._findings.values() if f.sources & bit and f.sources != bit)
+
+    def duplicates(self):
+        return sum(self.raw_counts.values()) - len(self._findings)
+
+    def top(self, n=TOP_N_FINDINGS, source=None):
+        """Highest-risk findings, optionally limited to one scanner"""
+        return top_findings(self.select(source), n)
+
+    def digest(self):
+        """Order-independent digest of the unique findings, for cache keys"""
+        digest = FindingsDigest()
+        for f in self._findings.values():
+            digest.add(f.severity, f.sources, *f.key)
+        return digest
+
+
+def risk_key(finding):
+    """Sort key: severity, then CVSS, then fix availability, then secret entropy"""
+    return (
+        RISK_RANK.get(finding.severity, -1),
+        finding.cvss if finding.cvss is not None else 0.0,
+        finding.fixed_version is not None,
+        finding.entropy if finding.entropy is not None else 0.0
     )
 
+
+def top_findings(findings, k=TOP_N_FINDINGS):
+    """True top-k by risk_key in one pass over any iterable.
+
+    heapq.nlargest keeps a bounded heap of k items, so this is
+    O(n log k) time and O(k) extra memory; ties keep report order.
+    """
+    return heapq.nlargest(k, findings, key=risk_key)
+
+
+def _intern(value):
+    # Packages, versions and titles repeat heavily; share one copy of each
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _normalize(value):
+    return _intern(value.strip().lower()) if isinstance(value, str) else value
+
+
+def summarize_trivy_report(file_path):
+    index = FindingIndex()
+    for context, v in iter_report_items(file_path, ("Results", "*", "Vulnerabilities", "*")):
+        target = context.get("Target", "Unknown")
+        index.add(Finding(
+            v.get("VulnerabilityID"),
+            _normalize(v.get("PkgName")),
+            _intern(v.get("InstalledVersion")),
+            _intern((v.get("Severity") or "UNKNOWN").upper()),
+            _intern(v.get("Title")),
+            "trivy",
+            fixed_version=_intern(v.get("FixedVersion") or None),
+            location=target
+        ), target=target)
+    return index
+
+
+def summarize_snyk_report(file_path):
+    index = FindingIndex()
+    for _, v in iter_report_items(file_path, ("vulnerabilities", "*")):
+        # Key on the CVE when Snyk provides one so it lines up with Trivy
+        cves = (v.get("identifiers") or {}).get("CVE") or []
+        fixed_in = v.get("fixedIn") or []
+        index.add(Finding(
+            cves[0] if cves else v.get("id"),
+            _normalize(v.get("packageName")),
+            _intern(v.get("version")),
+            _intern((v.get("severity") or "UNKNOWN").upper()),
+            _intern(v.get("title")),
+            "snyk",
+            fixed_version=fixed_in[0] if fixed_in else ("upgrade" if v.get("isUpgradable") else None),
+            cvss=v.get("cvssScore")
+        ))
+    return index
+
+
+def summarize_gitleaks_report(file_path):
+    index = FindingIndex()
+    for _, secret in iter_report_items(file_path, ("*",)):
+        location = f"{secret.get('File') or 'Unknown file'}:{secret.get('StartLine') or 'N/A'}"
+        index.add(Finding(
+            secret.get("Fingerprint") or f"{secret.get('RuleID')}:{location}",
+            None,
+            None,
+            "SECRET",
+            secret.get("Description"),
+            "gitleaks",
+            entropy=secret.get("Entropy"),
+            location=location
+        ))
+    return index
+
+
+def get_gemini_response(prompt, api_key):
+    url = gemini_url(api_key)
+
     headers = {
         "Content-Type": "application/json"
     }
@@ -23,7 +283,7 @@ def get_gemini_response(prompt, api_key):
         ]
     }
 
-    response = requests.post(url, headers=headers, json=payload, timeout=60)
+    response = get_client().post(url, name="gemini_generate", headers=headers, json=payload, timeout=60)
 
     if response.status_code == 200:
         return response.json()["candidates"][0]["content"]["parts"][0]["text"]
@@ -31,171 +291,467 @@ def get_gemini_response(prompt, api_key):
         return f"Error from AI API: {response.text}"
 
 
+def stream_gemini_report(prompt, api_key, summary_file=None):
+    """Stream the Gemini report into AI_SECURITY_REPORT.md, the step summary and stdout as it arrives.
 
+    Returns (report, generation timings); generation is None when the
+    request failed before streaming started.
+    """
+    with ExitStack() as stack:
+        stream = TextStream(stack.enter_context(open('AI_SECURITY_REPORT.md', 'w', encoding='utf-8')))
+        if summary_file:
+            summary = stack.enter_context(open(summary_file, 'a', encoding='utf-8'))
+            summary.write("\n\n## 🤖 AI Security Intelligence Report\n")
+            stream.files.append(summary)
+        try:
+            report, generation = stream_generate(prompt, api_key, on_text=stream)
+        except Exception as e:
+            report, generation = f"Error from AI API: {e}", None
+            stream(report)
+        if generation and not generation["complete"]:
+            # Keep what arrived and say so, rather than losing the whole report
+            note = f"\n\n⚠️ AI report incomplete - stream interrupted: {generation.get('error')}\n"
+            stream(note)
+            report += note
+        print()
+    return report, generation
+
+
+def get_sonar_quality_gate(host_url, token, project_key, timeout=SOURCE_TIMEOUT):
+    status_url = f"{host_url}/api/qualitygates/project_status?projectKey={project_key}"
+    status_res = get_client().get(status_url, name="sonar_quality_gate", auth=(token, ''), timeout=timeout)
+    status_data = status_res.json()
+    return status_data.get('projectStatus', {}).get('status', 'UNKNOWN')
+
+
+class SonarIssueIndex:
+    """Compact, queryable index of SonarQube issues.
+
+    Issues are stored as tuples; per-severity counts come from the search
+    facets so they are exact even when only part of the issue bodies are
+    downloaded.
+    """
 
+    FIELDS = ("severity", "type", "rule", "component", "line", "message")
+
+    def __init__(self, severity_counts=None, type_counts=None, total=0):
+        self.severity_counts = severity_counts or {}
+        self.type_counts = type_counts or {}
+        self.total = total
+        self.issues = []
+        self._by_severity = {}
+
+    def add_issues(self, issues):
+        for issue in issues:
+            record = (
+                issue.get('severity', 'UNKNOWN'),
+                issue.get('type'),
+                issue.get('rule'),
+                issue.get('component'),
+                issue.get('line'),
+                issue.get('message')
+            )
+            self._by_severity.setdefault(record[0], []).append(len(self.issues))
+            self.issues.append(record)
+
+    def count(self, severity=None):
+        if severity is None:
+            return self.total
+        return self.severity_counts.get(severity, len(self._by_severity.get(severity, [])))
+
+    def top(self, n=5, severities=SONAR_SEVERITY_ORDER):
+        """First n issues, most severe first, as dicts"""
+        selected = []
+        for severity in severities:
+            for i in self._by_severity.get(severity, []):
+                selected.append(dict(zip(self.FIELDS, self.issues[i])))
+                if len(selected) >= n:
+                    return selected
+        return selected
+
+    def top_components(self, n=3):
+        counts = {}
+        for record in self.issues:
+            counts[record[3]] = counts.get(record[3], 0) + 1
+        return sorted(counts.items(), key=lambda kv: -kv[1])[:n]
+
+    def severity_line(self):
+        return ", ".join(
+            f"{sev}: {self.severity_counts[sev]}"
+            for sev in SONAR_SEVERITY_ORDER if self.severity_counts.get(sev)
+        )
+
+
+def _facet_counts(data, prop):
+    for facet in data.get('facets', []):
+        if facet.get('property') == prop:
+            return {v['val']: v['count'] for v in facet.get('values', [])}
+    return {}
+
+
+def _search_issues(host_url, token, params, timeout):
+    response = get_client().get(
+        f"{host_url}/api/issues/search", name="sonar_issues",
+        params=params, auth=(token, ''), timeout=timeout
+    )
+    response.raise_for_status()
+    return response.json()
 
-def get_sonar_data(host_url, token, project_key):
-    try:
-        auth = (token, '')
 
-        # Quality Gate Status
-        status_url = f"{host_url}/api/qualitygates/project_status?projectKey={project_key}"
-        status_res = requests.get(status_url, auth=auth)
-        status_data = status_res.json()
+def get_sonar_issues(host_url, token, project_key, timeout=SOURCE_TIMEOUT,
+                     max_issues=SONAR_MAX_ISSUES, page_workers=SONAR_PAGE_WORKERS):
+    """Fetch unresolved issues into a SonarIssueIndex.
 
-        # Top Critical / Blocker Issues
-        issues_url = (
-            f"{host_url}/api/issues/search?"
-            f"componentKeys={project_key}&severities=CRITICAL,BLOCKER&resolved=false"
+    A page-size-1 facet query gives per-severity/type counts for all open
+    issues without downloading their bodies. CRITICAL/BLOCKER issue bodies
+    are then paged at the maximum page size: the first page reveals the
+    total, and the remaining pages are fetched concurrently.
+    """
+    base = {"componentKeys": project_key, "resolved": "false"}
+
+    with ThreadPoolExecutor(max_workers=page_workers) as pool:
+        facets_future = pool.submit(_search_issues, host_url, token, {
+            **base, "ps": 1, "facets": "severities,types"
+        }, timeout)
+
+        detail_params = {**base, "severities": "CRITICAL,BLOCKER", "ps": SONAR_PAGE_SIZE}
+        first = _search_issues(host_url, token, {**detail_params, "p": 1}, timeout)
+        total = first.get('paging', {}).get('total', first.get('total', 0))
+
+        # Sonar refuses to page past its 10k result window
+        wanted = min(total, max_issues, SONAR_RESULT_WINDOW)
+        pages = -(-wanted // SONAR_PAGE_SIZE)
+        page_futures = [
+            pool.submit(_search_issues, host_url, token, {**detail_params, "p": page}, timeout)
+            for page in range(2, pages + 1)
+        ]
+
+        facets = facets_future.result()
+        index = SonarIssueIndex(
+            severity_counts=_facet_counts(facets, 'severities'),
+            type_counts=_facet_counts(facets, 'types'),
+            total=facets.get('paging', {}).get('total', facets.get('total', 0))
         )
-        issues_res = requests.get(issues_url, auth=auth)
-        issues_data = issues_res.json()
+        index.add_issues(first.get('issues', []))
+        for future in page_futures:
+            index.add_issues(future.result().get('issues', []))
 
-        return {
-            "status": status_data.get('projectStatus', {}).get('status', 'UNKNOWN'),
-            "issues": issues_data.get('issues', [])[:5]
-        }
+    # The facet query and page 1 are always sent, even when there are no issues
+    get_tracer().count("sonar_requests", 2 + len(page_futures))
+    get_tracer().count("sonar_issues", index.total)
+    return index
 
-    except Exception as e:
-        return {"error": str(e)}
 
+def load_report(summarize, file_path, label):
+    if not os.path.exists(file_path):
+        return None
+    try:
+        index = summarize(file_path)
+    except ValueError as e:
+        raise ValueError(f"Failed to parse {label} report: {e}") from e
+    get_tracer().count("bytes_read", os.path.getsize(file_path))
+    get_tracer().count("findings_parsed", sum(index.raw_counts.values()))
+    return index
 
-def main():
-    trivy_file = 'fs-report.json'
-    snyk_file = 'snyk-report.json'
-    gitleaks_file = 'gitleaks-report.json'
 
-    trivy_data = {}
-    snyk_data = {}
-    gitleaks_data = {}
+def collect_sources(sources):
+    """Run independent input loaders concurrently.
 
-    if os.path.exists(trivy_file):
-        with open(trivy_file, 'r') as f:
-            trivy_data = json.load(f)
+    ``sources`` maps a name to ``(callable, timeout_seconds)``. Each source
+    gets its own deadline measured from the common start, so one slow
+    source cannot stall the others. Returns ``(results, timings)`` where a
+    failed or timed-out source has ``{"error": ...}`` as its result.
 
-    if os.path.exists(snyk_file):
+    Sources run on daemon threads: a running thread cannot be cancelled,
+    and a hung source must not keep the process alive after its deadline.
+    """
+    results = {}
+    timings = {}
+    finished = {}
+    tracer = get_tracer()
+    parent = tracer.current()
+
+    def timed(name, fn):
+        start = time.perf_counter()
         try:
-            with open(snyk_file, 'r') as f:
-                snyk_data = json.load(f)
-        except Exception:
-            snyk_data = {"error": "Failed to parse Snyk report"}
+            with tracer.span(f"collect.{name}", parent=parent):
+                return fn()
+        finally:
+            finished[name] = time.perf_counter() - start
 
-    if os.path.exists(gitleaks_file):
+    def run(name, fn, future):
+        try:
+            future.set_result(timed(name, fn))
+        except BaseException as e:
+            future.set_exception(e)
+
+    start = time.perf_counter()
+    futures = {}
+    for name, (fn, _) in sources.items():
+        future = futures[name] = Future()
+        future.set_running_or_notify_cancel()
+        threading.Thread(target=run, args=(name, fn, future), name=f"source-{name}", daemon=True).start()
+
+    for name, future in futures.items():
+        timeout = sources[name][1]
+        remaining = max(0, timeout - (time.perf_counter() - start))
         try:
-            with open(gitleaks_file, 'r') as f:
-                gitleaks_data = json.load(f)
-        except Exception:
-            gitleaks_data = {"error": "Failed to parse Gitleaks report"}
+            results[name] = future.result(timeout=remaining)
+            status = "ok"
+        except FutureTimeoutError:
+            results[name] = {"error": f"Timed out after {timeout}s"}
+            status = "timeout"
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            status = "error"
+        timings[name] = {
+            "status": status,
+            "seconds": finished.get(name, time.perf_counter() - start)
+        }
 
-    # SonarQube
-    sonar_host = os.getenv('SONAR_HOST_URL')
-    sonar_token = os.getenv('SONAR_TOKEN')
-    sonar_project = "GC-Bank"
+    return results, timings
 
-    sonar_summary = "SONARQUBE ANALYSIS:\n"
 
-    if sonar_host and sonar_token:
-        sonar_data = get_sonar_data(sonar_host, sonar_token, sonar_project)
-        if 'error' in sonar_data:
-            sonar_summary += f"Error: {sonar_data['error']}\n"
-        else:
-            sonar_summary += f"- Quality Gate Status: {sonar_data['status']}\n"
-            for issue in sonar_data['issues']:
-                sonar_summary += (
-                    f"  * [{issue.get('severity')}] "
-                    f"{issue.get('message')} "
-                    f"(File: {issue.get('component')})\n"
-                )
-    else:
-        sonar_summary += "SonarQube credentials missing. Skipping analysis.\n"
+def format_timings(timings):
+    lines = [
+        "| Source | Status | Time (s) |",
+        "|--------|--------|----------|"
+    ]
+    for name, t in timings.items():
+        lines.append(f"| {name} | {t['status']} | {t['seconds']:.2f} |")
+    return "\n".join(lines) + "\n"
+
+
+def report_sources(trivy_file, snyk_file, gitleaks_file):
+    """collect_sources() entries that stream and summarize the three scanner reports"""
+    return {
+        "trivy": (lambda: load_report(summarize_trivy_report, trivy_file, "Trivy"), REPORT_TIMEOUT),
+        "snyk": (lambda: load_report(summarize_snyk_report, snyk_file, "Snyk"), REPORT_TIMEOUT),
+        "gitleaks": (lambda: load_report(summarize_gitleaks_report, gitleaks_file, "Gitleaks"), REPORT_TIMEOUT),
+    }
+
+
+def merge_scanner_results(inputs):
+    """One deduplicated FindingIndex across the loaded reports, plus per-scanner load errors"""
+    findings = FindingIndex()
+    scanner_errors = {}
+    for name in ("trivy", "snyk", "gitleaks"):
+        result = inputs[name]
+        if isinstance(result, FindingIndex):
+            findings.merge(result)
+        elif isinstance(result, dict):
+            scanner_errors[name] = result["error"]
+    return findings, scanner_errors
+
+
+def build_prompt(findings, scanner_errors, sonar=None):
+    """Dashboard prompt sections for the findings; returns (builder, sonar_section).
+
+    ``sonar`` is the (quality gate, issues) pair collected from SonarQube,
+    or None when it is not configured.
+    """
+    # Sections are budgeted by priority: secrets, then criticals, then the rest
+    builder = PromptBuilder(header=PROMPT_HEADER, footer=PROMPT_FOOTER)
 
     # Trivy Summary
-    vulnerabilities_summary = "TRIVY SCAN SUMMARY:\n"
-
-    if 'Results' in trivy_data:
-        for result in trivy_data['Results']:
-            target = result.get('Target', 'Unknown')
-            vulns = result.get('Vulnerabilities', [])
-            vulnerabilities_summary += f"- {target}: {len(vulns)} vulnerabilities found\n"
-            for v in vulns[:5]:
-                vulnerabilities_summary += (
-                    f"  * [{v.get('Severity')}] "
-                    f"{v.get('VulnerabilityID')} "
-                    f"{v.get('PkgName')} - {v.get('Title')}\n"
-                )
+    trivy_section = builder.section("TRIVY SCAN SUMMARY:", PRIORITY_FINDINGS)
+
+    if "trivy" in scanner_errors:
+        trivy_section.add(f"Error: {scanner_errors['trivy']}")
+    elif findings.raw_counts.get("trivy"):
+        for target, count in findings.targets.items():
+            trivy_section.add(f"- {target}: {count} vulnerabilities found")
+        trivy_section.add(f"By severity (unique): {findings.severity_line('trivy')}")
+        for f in findings.top(source="trivy"):
+            trivy_section.add(f"  * [{f.severity}] {f.finding_id} {f.package} - {f.title}")
     else:
-        vulnerabilities_summary += "No Trivy results found.\n"
+        trivy_section.add("No Trivy results found.")
 
     # Snyk Summary
-    vulnerabilities_summary += "\nSNYK SCAN SUMMARY:\n"
-
-    if 'vulnerabilities' in snyk_data:
-        vulns = snyk_data.get('vulnerabilities', [])
-        vulnerabilities_summary += f"Found {len(vulns)} vulnerabilities\n"
-        for v in vulns[:5]:
-            vulnerabilities_summary += (
-                f"  * [{v.get('severity', '').upper()}] "
-                f"{v.get('id')} "
-                f"{v.get('packageName')} - {v.get('title')}\n"
-            )
+    snyk_section = builder.section("SNYK SCAN SUMMARY:", PRIORITY_FINDINGS)
+
+    if "snyk" in scanner_errors:
+        snyk_section.add(f"Error: {scanner_errors['snyk']}")
+    elif findings.raw_counts.get("snyk"):
+        snyk_section.add(
+            f"Found {findings.count('snyk')} unique vulnerabilities "
+            f"({findings.severity_line('snyk')}), "
+            f"{findings.shared_count('snyk')} also reported by Trivy"
+        )
+        for f in findings.top(source="snyk"):
+            snyk_section.add(f"  * [{f.severity}] {f.finding_id} {f.package} - {f.title}")
     else:
-        vulnerabilities_summary += "No Snyk vulnerabilities found.\n"
+        snyk_section.add("No Snyk vulnerabilities found.")
 
     # Gitleaks Summary
-    vulnerabilities_summary += "\nGITLEAKS SECRET SCAN SUMMARY:\n"
-
-    if isinstance(gitleaks_data, list) and len(gitleaks_data) > 0:
-        vulnerabilities_summary += f"⚠️ Found {len(gitleaks_data)} potential secrets/credentials!\n"
-        for secret in gitleaks_data[:5]:
-            vulnerabilities_summary += (
-                f"  * [SECRET] {secret.get('Description', 'Unknown')} "
-                f"in {secret.get('File', 'Unknown file')} "
-                f"(Line: {secret.get('StartLine', 'N/A')})\n"
+    gitleaks_section = builder.section("GITLEAKS SECRET SCAN SUMMARY:", PRIORITY_SECRETS)
+
+    if "gitleaks" in scanner_errors:
+        gitleaks_section.add(f"Error: {scanner_errors['gitleaks']}")
+    elif findings.raw_counts.get("gitleaks"):
+        gitleaks_section.add(f"⚠️ Found {findings.count('gitleaks')} potential secrets/credentials!")
+        for f in findings.top(source="gitleaks"):
+            gitleaks_section.add(f"  * [SECRET] {f.title or 'Unknown'} in {f.location}")
+    else:
+        gitleaks_section.add("✅ No secrets or credentials detected.")
+
+    if len(findings):
+        risks_section = builder.section("TOP RISKS ACROSS ALL SCANNERS:", PRIORITY_CRITICAL)
+        for f in findings.top():
+            details = []
+            if f.cvss is not None:
+                details.append(f"CVSS {f.cvss}")
+            if f.fixed_version:
+                details.append(f"fix: {f.fixed_version}")
+            if f.entropy is not None:
+                details.append(f"entropy {f.entropy}")
+            risks_section.add(
+                f"  * [{f.severity}] {f.finding_id} "
+                f"{f.package or f.location} - {f.title} "
+                f"({', '.join(f.source_names() + details)})"
             )
-    elif 'error' in gitleaks_data:
-        vulnerabilities_summary += f"Error: {gitleaks_data['error']}\n"
+
+    if findings.duplicates():
+        builder.section("", PRIORITY_CONTEXT, name="deduplication").add(
+            f"DEDUPLICATION: {sum(findings.raw_counts.values())} raw findings, "
+            f"{len(findings)} unique ({findings.duplicates()} duplicates merged)"
+        )
+
+    sonar_section = builder.section("SONARQUBE ANALYSIS:", PRIORITY_CONTEXT)
+
+    if sonar:
+        sonar_status, sonar_issues = sonar
+        if isinstance(sonar_status, dict):
+            sonar_section.add(f"Error: {sonar_status['error']}")
+        else:
+            sonar_section.add(f"- Quality Gate Status: {sonar_status}")
+        if isinstance(sonar_issues, dict):
+            sonar_section.add(f"Error: {sonar_issues['error']}")
+        else:
+            sonar_section.add(f"- Open issues: {sonar_issues.count()} ({sonar_issues.severity_line()})")
+            for issue in sonar_issues.top(5):
+                sonar_section.add(
+                    f"  * [{issue.get('severity')}] "
+                    f"{issue.get('message')} "
+                    f"(File: {issue.get('component')})"
+                )
+            hotspots = sonar_issues.top_components(3)
+            if hotspots:
+                sonar_section.add("- Most affected files: " + ", ".join(
+                    f"{component} ({count})" for component, count in hotspots
+                ))
     else:
-        vulnerabilities_summary += "✅ No secrets or credentials detected.\n"
-
-    prompt = f"""
-    You are a DevSecOps AI Assistant. Your task is to act as a post-scan intelligence layer.
-    Analyze these results from TRIVY, SNYK, GITLEAKS, and SONARQUBE for 'BankApp'.
-    
-    {vulnerabilities_summary}
-    
-    {sonar_summary}
-    
-    Generate a CONCISE 'Executive Security Dashboard' (Max 250 words):
-    1. 🛡️ OVERALL STATUS: One sentence on the security posture.
-    2. 🚨 TOP 3 RISKS: Very brief, human-readable explanations of the 3 most dangerous issues (including any exposed secrets).
-    3. 💡 ACTIONABLE FIXES:
-       - Update [Library] to [Version] (pom.xml)
-       - Refactor [File] to fix [Sonar Issue]
-       - Remove/Rotate any exposed secrets found by Gitleaks
-       - Quick Dockerfile security tip.
-    
-    Use a clean Markdown Table or List format. Keep it punchy and professional for a high-level client demo.
-    """
+        sonar_section.add("SonarQube credentials missing. Skipping analysis.")
+
+    return builder, sonar_section
+
+
+def main():
+    trivy_file = 'fs-report.json'
+    snyk_file = 'snyk-report.json'
+    gitleaks_file = 'gitleaks-report.json'
+
+    # SonarQube
+    sonar_host = os.getenv('SONAR_HOST_URL')
+    sonar_token = os.getenv('SONAR_TOKEN')
+    sonar_project = "GC-Bank"
+
+    # Reports are streamed, so memory follows the number of unique findings, not the file size
+    sources = report_sources(trivy_file, snyk_file, gitleaks_file)
+    if sonar_host and sonar_token:
+        sources["sonar_quality_gate"] = (
+            lambda: get_sonar_quality_gate(sonar_host, sonar_token, sonar_project), SOURCE_TIMEOUT
+        )
+        sources["sonar_issues"] = (
+            lambda: get_sonar_issues(sonar_host, sonar_token, sonar_project), SOURCE_TIMEOUT
+        )
+
+    tracer = get_tracer()
+    print("📥 Collecting scan results and SonarQube data...")
+    with tracer.span("collect_sources"):
+        inputs, timings = collect_sources(sources)
+    for name, t in timings.items():
+        print(f"  - {name}: {t['status']} in {t['seconds']:.2f}s")
+
+    with tracer.span("build_prompt") as span:
+        # Every summary below is drawn from one deduplicated index across scanners
+        findings, scanner_errors = merge_scanner_results(inputs)
+        sonar = (inputs["sonar_quality_gate"], inputs["sonar_issues"]) if sonar_host and sonar_token else None
+        builder, sonar_section = build_prompt(findings, scanner_errors, sonar)
+        prompt = builder.build()
+        span.count("unique_findings", len(findings))
+        span.count("prompt_chars", len(prompt))
+    print(f"📝 {builder.format_stats()}")
 
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
         print("❌ GEMINI_API_KEY is missing")
         sys.exit(1)
 
-    print("🤖 Sending scan results to Gemini AI...")
-    ai_report = get_gemini_response(prompt, api_key)
-
+    # Same findings + same prompt template => reuse the previous report
+    cache = ReportCache()
+    report_key = cache_key(
+        PROMPT_VERSION,
+        findings.digest(),
+        scanner_errors,
+        sonar_section.text()
+    )
     summary_file = os.getenv('GITHUB_STEP_SUMMARY')
-    if summary_file:
-        with open(summary_file, 'a', encoding='utf-8') as f:
-            f.write("\n\n## 🤖 AI Security Intelligence Report\n")
-            f.write(ai_report)
-
-    with open('AI_SECURITY_REPORT.md', 'w', encoding='utf-8') as f:
-        f.write(ai_report)
+    generation = None
+    # A streamed report has already been written to both files
+    streamed = False
+
+    with tracer.span("ai_report") as span:
+        ai_report = cache.get(report_key)
+        if ai_report is not None:
+            print("♻️ Findings unchanged since a previous run - reusing cached AI report")
+            span.count("cache_hits")
+        elif GEMINI_STREAM:
+            print("🤖 Streaming scan results analysis from Gemini AI...")
+            ai_report, generation = stream_gemini_report(prompt, api_key, summary_file)
+            streamed = True
+            # An interrupted or empty stream would be served from the cache on every later run
+            if generation and generation["complete"] and ai_report.strip():
+                cache.put(report_key, ai_report)
+            span.set("streamed", True)
+        else:
+            print("🤖 Sending scan results to Gemini AI...")
+            ai_report = get_gemini_response(prompt, api_key)
+            if ai_report.strip() and not ai_report.startswith("Error from AI API"):
+                cache.put(report_key, ai_report)
+        span.count("response_chars", len(ai_report))
+        if generation:
+            span.set("ttfb_seconds", generation.get("ttfb_seconds"))
+            span.count("chunks", generation.get("chunks", 0))
+    print(f"📦 {cache.format_stats()}")
+    if generation:
+        print(f"⏱️ {format_generation(generation)}")
+
+    with tracer.span("write_reports"):
+        if summary_file:
+            with open(summary_file, 'a', encoding='utf-8') as f:
+                if not streamed:
+                    f.write("\n\n## 🤖 AI Security Intelligence Report\n")
+                    f.write(ai_report)
+                f.write("\n\n### ⏱️ Input Collection Timings\n\n")
+                f.write(format_timings(timings))
+                f.write("\n### 🌐 HTTP Calls\n\n")
+                f.write(get_client().format_stats())
+                f.write(f"\n{cache.format_stats()}\n")
+                f.write(f"\n{builder.format_stats()}\n")
+                if generation:
+                    f.write(f"\n{format_generation(generation)}\n")
+
+        if not streamed:
+            with open('AI_SECURITY_REPORT.md', 'w', encoding='utf-8') as f:
+                f.write(ai_report)
 
     print("✅ AI Security Report generated successfully")
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Also on sys.exit, so a failed run still shows where the time went
+        get_tracer().finish(os.getenv('GITHUB_STEP_SUMMARY'))
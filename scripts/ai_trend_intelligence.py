@@ -12,45 +12,67 @@ This script analyzes historical security scan data from Athena and provides:
 import json
 import os
 import sys
+import tempfile
 import time
-import boto3
-from datetime import datetime, timedelta
+from contextlib import ExitStack
+from datetime import date, datetime, timedelta, timezone
 
-def run_athena_query(query, database='security_analytics'):
-    """Execute Athena query and return results"""
-    athena = boto3.client('athena', region_name=os.getenv('AWS_REGION', 'us-east-1'))
-    
-    # Start query execution
-    response = athena.start_query_execution(
-        QueryString=query,
-        QueryExecutionContext={'Database': database},
-        ResultConfiguration={
-            'OutputLocation': f"s3://{os.getenv('S3_SECURITY_REPORTS_BUCKET')}/athena-results/"
-        }
-    )
-    
-    query_execution_id = response['QueryExecutionId']
-    
-    # Wait for query to complete
-    max_attempts = 30
-    for attempt in range(max_attempts):
-        result = athena.get_query_execution(QueryExecutionId=query_execution_id)
-        status = result['QueryExecution']['Status']['State']
-        
-        if status == 'SUCCEEDED':
-            break
-        elif status in ['FAILED', 'CANCELLED']:
-            raise Exception(f"Query failed: {result['QueryExecution']['Status'].get('StateChangeReason', 'Unknown error')}")
-        
-        time.sleep(2)
+from ai_cache import ReportCache, cache_key
+from gemini_client import GEMINI_STREAM, TextStream, format_generation, gemini_url, stream_generate
+from instrumentation import get_tracer
+from prompt_builder import PRIORITY_CRITICAL, PRIORITY_SECRETS, PRIORITY_TRENDS, PromptBuilder
+from trend_analytics import TrendSeries, analyze, calculate_risk_score, trend_direction as series_trend_direction
+from trend_backends import TREND_BACKEND, get_backend
+
+# Bump whenever the trend prompt changes so cached analyses are not reused
+TREND_PROMPT_VERSION = "trend-analysis-v3"
+
+TREND_PROMPT_FOOTER = """Generate a CONCISE report (Max 300 words) with:
+
+1. 🎯 EXECUTIVE SUMMARY: One sentence on overall security posture
+
+2. 📊 TREND ANALYSIS: What's the trend telling us? (2-3 sentences)
+
+3. 🚨 TOP 3 PRIORITIES: Most urgent issues to fix (be specific with CVE IDs and packages)
+
+4. 💡 REMEDIATION PLAN: Step-by-step fixes for top priorities
+
+5. 🔮 PREDICTIONS: What will happen if current trend continues?
+
+6. 🔍 ROOT CAUSE: Why is the trend going this direction?
+
+Be specific, actionable, and use the actual data provided. Focus on WHAT TO DO, not just describing the problem.
+"""
+
+# Lookback window (days before today) for the daily trend queries
+TREND_WINDOW_DAYS = int(os.getenv('TREND_WINDOW_DAYS', '30'))
+# 'rollup' reads the daily_security_summary table (days it has not summarized yet
+# come from 'raw'), 'raw' the JSON report tables, 'compacted' the Parquet *_findings tables.
+# The local backend only has the flat tables, so it defaults to 'compacted'.
+TREND_TABLES = os.getenv('TREND_TABLES', 'compacted' if TREND_BACKEND == 'local' else 'rollup')
+# Seconds between rewrites of the partial report while the AI analysis streams;
+# the finished report is always written at the end
+REPORT_SAVE_INTERVAL = float(os.getenv('REPORT_SAVE_INTERVAL', '1'))
+
+ai_cache = ReportCache()
+
+def run_athena_queries(queries, database='security_analytics'):
+    """Run several queries concurrently on the configured backend (TREND_BACKEND).
     
-    # Get query results
-    results = athena.get_query_results(QueryExecutionId=query_execution_id)
-    return results
+    On Athena all queries are started at once so they execute in
+    parallel, then a single polling loop waits for them. Returns a dict
+    of name -> query results, or name -> exception for a failed query.
+    """
+    return get_backend().run_queries(queries, database=database)
 
-def get_vulnerability_trends():
-    """Get vulnerability trends over last 30 days"""
-    query = """
+def run_athena_query(query, database='security_analytics'):
+    """Execute one query and return its rows as typed namedtuples"""
+    result = run_athena_queries({'query': query}, database=database)['query']
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+VULNERABILITY_TRENDS_QUERY = """
     SELECT 
       CONCAT(year, '-', month, '-', day) as scan_date,
       SUM(CASE WHEN vuln.Severity = 'CRITICAL' THEN 1 ELSE 0 END) as critical_count,
@@ -61,36 +83,12 @@ def get_vulnerability_trends():
     FROM security_analytics.trivy_scans
     CROSS JOIN UNNEST(Results) AS t(result)
     CROSS JOIN UNNEST(result.Vulnerabilities) AS v(vuln)
-    WHERE CAST(CONCAT(year, month, day) AS INTEGER) >= CAST(date_format(current_date - interval '30' day, '%Y%m%d') AS INTEGER)
+    WHERE {date_filter}
     GROUP BY year, month, day
     ORDER BY scan_date DESC
-    LIMIT 30
     """
-    
-    try:
-        results = run_athena_query(query)
-        rows = results['ResultSet']['Rows'][1:]  # Skip header
-        
-        trends = []
-        for row in rows:
-            data = row['Data']
-            trends.append({
-                'date': data[0].get('VarCharValue', ''),
-                'critical': int(data[1].get('VarCharValue', 0)),
-                'high': int(data[2].get('VarCharValue', 0)),
-                'medium': int(data[3].get('VarCharValue', 0)),
-                'low': int(data[4].get('VarCharValue', 0)),
-                'total': int(data[5].get('VarCharValue', 0))
-            })
-        
-        return trends
-    except Exception as e:
-        print(f"⚠️ Could not fetch trends from Athena: {e}")
-        return []
 
-def get_persistent_critical_issues():
-    """Get CRITICAL vulnerabilities that appear in multiple scans"""
-    query = """
+PERSISTENT_CRITICAL_QUERY = """
     SELECT 
       vuln.VulnerabilityID,
       vuln.PkgName,
@@ -103,136 +101,403 @@ def get_persistent_critical_issues():
     CROSS JOIN UNNEST(Results) AS t(result)
     CROSS JOIN UNNEST(result.Vulnerabilities) AS v(vuln)
     WHERE vuln.Severity = 'CRITICAL'
+      AND {date_filter}
     GROUP BY vuln.VulnerabilityID, vuln.PkgName, vuln.Title, vuln.FixedVersion
     HAVING COUNT(DISTINCT CONCAT(year, month, day)) > 1
     ORDER BY days_present DESC
     LIMIT 10
     """
-    
-    try:
-        results = run_athena_query(query)
-        rows = results['ResultSet']['Rows'][1:]
-        
-        issues = []
-        for row in rows:
-            data = row['Data']
-            issues.append({
-                'cve_id': data[0].get('VarCharValue', ''),
-                'package': data[1].get('VarCharValue', ''),
-                'title': data[2].get('VarCharValue', ''),
-                'fixed_version': data[3].get('VarCharValue', ''),
-                'days_present': int(data[4].get('VarCharValue', 0)),
-                'first_seen': data[5].get('VarCharValue', ''),
-                'last_seen': data[6].get('VarCharValue', '')
-            })
-        
-        return issues
-    except Exception as e:
-        print(f"⚠️ Could not fetch critical issues: {e}")
-        return []
 
-def get_secret_trends():
-    """Get secret leakage trends"""
-    query = """
+SECRET_TRENDS_QUERY = """
     SELECT 
       CONCAT(year, '-', month, '-', day) as scan_date,
       COUNT(*) as secret_count,
       COUNT(DISTINCT File) as affected_files
     FROM security_analytics.gitleaks_scans
-    WHERE CAST(CONCAT(year, month, day) AS INTEGER) >= CAST(date_format(current_date - interval '30' day, '%Y%m%d') AS INTEGER)
+    WHERE {date_filter}
+    GROUP BY year, month, day
+    ORDER BY scan_date DESC
+    """
+
+# Same queries over the flat tables written by compact_reports.py
+COMPACTED_VULNERABILITY_TRENDS_QUERY = """
+    SELECT 
+      CONCAT(year, '-', month, '-', day) as scan_date,
+      SUM(CASE WHEN severity = 'CRITICAL' THEN 1 ELSE 0 END) as critical_count,
+      SUM(CASE WHEN severity = 'HIGH' THEN 1 ELSE 0 END) as high_count,
+      SUM(CASE WHEN severity = 'MEDIUM' THEN 1 ELSE 0 END) as medium_count,
+      SUM(CASE WHEN severity = 'LOW' THEN 1 ELSE 0 END) as low_count,
+      COUNT(*) as total_count
+    FROM security_analytics.trivy_findings
+    WHERE {date_filter}
+    GROUP BY year, month, day
+    ORDER BY scan_date DESC
+    """
+
+COMPACTED_PERSISTENT_CRITICAL_QUERY = """
+    SELECT 
+      vulnerability_id as VulnerabilityID,
+      pkg_name as PkgName,
+      title as Title,
+      fixed_version as FixedVersion,
+      COUNT(DISTINCT CONCAT(year, month, day)) as days_present,
+      MIN(CONCAT(year, '-', month, '-', day)) as first_seen,
+      MAX(CONCAT(year, '-', month, '-', day)) as last_seen
+    FROM security_analytics.trivy_findings
+    WHERE severity = 'CRITICAL'
+      AND {date_filter}
+    GROUP BY vulnerability_id, pkg_name, title, fixed_version
+    HAVING COUNT(DISTINCT CONCAT(year, month, day)) > 1
+    ORDER BY days_present DESC
+    LIMIT 10
+    """
+
+COMPACTED_SECRET_TRENDS_QUERY = """
+    SELECT 
+      CONCAT(year, '-', month, '-', day) as scan_date,
+      COUNT(*) as secret_count,
+      COUNT(DISTINCT file) as affected_files
+    FROM security_analytics.gitleaks_findings
+    WHERE {date_filter}
     GROUP BY year, month, day
     ORDER BY scan_date DESC
     """
+
+# Per-day counts pre-aggregated by rollup_reports.py; one tiny record per day
+ROLLUP_VULNERABILITY_TRENDS_QUERY = """
+    SELECT 
+      scan_date,
+      critical_count,
+      high_count,
+      medium_count,
+      low_count,
+      total_count
+    FROM security_analytics.daily_security_summary
+    WHERE {date_filter}
+    ORDER BY scan_date DESC
+    """
+
+ROLLUP_SECRET_TRENDS_QUERY = """
+    SELECT 
+      scan_date,
+      secret_count,
+      affected_files
+    FROM security_analytics.daily_security_summary
+    WHERE {date_filter}
+      AND secret_count > 0
+    ORDER BY scan_date DESC
+    """
+
+# table layout -> name -> query template
+QUERY_SETS = {
+    'raw': {
+        'trends': VULNERABILITY_TRENDS_QUERY,
+        'critical_issues': PERSISTENT_CRITICAL_QUERY,
+        'secrets': SECRET_TRENDS_QUERY,
+    },
+    'compacted': {
+        'trends': COMPACTED_VULNERABILITY_TRENDS_QUERY,
+        'critical_issues': COMPACTED_PERSISTENT_CRITICAL_QUERY,
+        'secrets': COMPACTED_SECRET_TRENDS_QUERY,
+    },
+    # Persistent criticals need finding-level rows, which the rollup does not keep;
+    # the local backend only indexes the flat tables
+    'rollup': {
+        'trends': ROLLUP_VULNERABILITY_TRENDS_QUERY,
+        'critical_issues': COMPACTED_PERSISTENT_CRITICAL_QUERY if TREND_BACKEND == 'local' else PERSISTENT_CRITICAL_QUERY,
+        'secrets': ROLLUP_SECRET_TRENDS_QUERY,
+    },
+}
+
+def for_database(template, database='security_analytics'):
+    """Point a query template at another repository's Athena database"""
+    if database == 'security_analytics':
+        return template
+    return template.replace('security_analytics.', f'{database}.')
+
+def resolve_window(days=TREND_WINDOW_DAYS, today=None):
+    """(start, end) dates of the lookback window; partitions are written in UTC"""
+    end = today or datetime.now(timezone.utc).date()
+    return end - timedelta(days=days), end
+
+def date_filter(start, end):
+    """WHERE predicate selecting the year/month/day partitions from start to end.
+    
+    The partition columns are compared as plain strings, never wrapped in
+    functions, so partition projection only lists the matching prefixes.
+    One group is emitted per calendar month in the window, e.g.
+    (year = '2026' AND month = '10' AND day BETWEEN '01' AND '16').
+    """
+    groups = []
+    cursor = start
+    while cursor <= end:
+        next_month = (cursor.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        if cursor == last:
+            days = f"day = '{cursor:%d}'"
+        else:
+            days = f"day BETWEEN '{cursor:%d}' AND '{last:%d}'"
+        groups.append(f"(year = '{cursor:%Y}' AND month = '{cursor:%m}' AND {days})")
+        cursor = last + timedelta(days=1)
+    if not groups:
+        return "FALSE"
+    return groups[0] if len(groups) == 1 else "(" + " OR ".join(groups) + ")"
+
+def parse_vulnerability_trends(rows):
+    return [
+        {
+            'date': row.scan_date or '',
+            'critical': row.critical_count or 0,
+            'high': row.high_count or 0,
+            'medium': row.medium_count or 0,
+            'low': row.low_count or 0,
+            'total': row.total_count or 0
+        }
+        for row in rows
+    ]
+
+def parse_persistent_critical_issues(rows):
+    return [
+        {
+            'cve_id': row.vulnerabilityid or '',
+            'package': row.pkgname or '',
+            'title': row.title or '',
+            'fixed_version': row.fixedversion or '',
+            'days_present': row.days_present or 0,
+            'first_seen': row.first_seen or '',
+            'last_seen': row.last_seen or ''
+        }
+        for row in rows
+    ]
+
+def parse_secret_trends(rows):
+    return [
+        {
+            'date': row.scan_date or '',
+            'count': row.secret_count or 0,
+            'files': row.affected_files or 0
+        }
+        for row in rows
+    ]
+
+# name -> (parser, warning shown when the query fails,
+#          column holding the scan day for queries that return one row per day)
+TREND_QUERIES = {
+    'trends': (parse_vulnerability_trends, "Could not fetch trends from Athena", 'scan_date'),
+    'critical_issues': (parse_persistent_critical_issues, "Could not fetch critical issues", None),
+    'secrets': (parse_secret_trends, "Could not fetch secret trends", 'scan_date'),
+}
+
+def _day_range(start, end):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+def fetch_trend_data(names=tuple(TREND_QUERIES), window_days=TREND_WINDOW_DAYS, today=None, tables=TREND_TABLES,
+                     database='security_analytics', backend=None, errors=None):
+    """Run the trend queries in parallel and parse each result.
+    
+    Per-day queries read past days from the result cache - those
+    partitions never change - and only query the days still missing,
+    which after the first run is just today. A failed query yields an
+    empty list so the rest of the analysis continues, and its error is
+    recorded in `errors` when a dict is passed. With the rollup layout
+    on Athena, days the rollup has not summarized are read from the raw
+    tables (see _fill_rollup_gaps).
+    """
+    start, end = resolve_window(window_days, today)
+    backend = backend or get_backend()
+    result_cache = backend.result_cache
+    
+    queries = {}
+    cached = {}
+    for name in names:
+        template = for_database(QUERY_SETS[tables][name], database)
+        _, _, day_column = TREND_QUERIES[name]
+        if day_column is None or result_cache is None:
+            queries[name] = template.format(date_filter=date_filter(start, end))
+            continue
+        cached[name] = {}
+        for day in _day_range(start, end - timedelta(days=1)):
+            rows = result_cache.get(template, (day, day))
+            if rows is None:
+                break
+            cached[name][day] = rows
+        # Everything after the last contiguous cached day is queried in one go
+        first_missing = start + timedelta(days=len(cached[name]))
+        queries[name] = template.format(date_filter=date_filter(first_missing, end))
     
     try:
-        results = run_athena_query(query)
-        rows = results['ResultSet']['Rows'][1:]
-        
-        secrets = []
-        for row in rows:
-            data = row['Data']
-            secrets.append({
-                'date': data[0].get('VarCharValue', ''),
-                'count': int(data[1].get('VarCharValue', 0)),
-                'files': int(data[2].get('VarCharValue', 0))
-            })
-        
-        return secrets
+        raw = backend.run_queries(queries, database=database)
     except Exception as e:
-        print(f"⚠️ Could not fetch secret trends: {e}")
-        return []
+        raw = {name: e for name in names}
+    
+    filled = set()
+    if tables == 'rollup' and backend.name == 'athena':
+        filled = _fill_rollup_gaps(raw, names, cached, start, end, database, backend)
+    
+    data = {}
+    for name in names:
+        template = for_database(QUERY_SETS[tables][name], database)
+        parse, warning, day_column = TREND_QUERIES[name]
+        try:
+            result = raw[name]
+            if isinstance(result, Exception):
+                raise result
+            if day_column is not None and result_cache is not None:
+                # A day missing from the rollup may not be rolled up yet, so only raw days cache as empty
+                result = _merge_daily(template, day_column, cached[name], result, start, end, result_cache,
+                                      cache_empty=tables != 'rollup' or name in filled)
+            data[name] = parse(result)
+        except Exception as e:
+            print(f"⚠️ {warning}{'' if database == 'security_analytics' else f' ({database})'}: {e}")
+            data[name] = []
+            if errors is not None:
+                errors[name] = str(e)
+    return data
 
-def calculate_risk_score(trends, secrets):
-    """Calculate security risk score (0-100)"""
-    if not trends:
-        return 0, "UNKNOWN"
-    
-    latest = trends[0]
-    
-    # Weighted scoring
-    vuln_score = (
-        latest['critical'] * 10 +
-        latest['high'] * 5 +
-        latest['medium'] * 2 +
-        latest['low'] * 0.5
-    )
-    
-    # Add secret penalty
-    secret_score = 0
-    if secrets:
-        secret_score = secrets[0]['count'] * 15
-    
-    raw_score = vuln_score + secret_score
-    risk_score = min(100, raw_score)
-    
-    # Determine risk level
-    if risk_score <= 20:
-        risk_level = "LOW"
-    elif risk_score <= 50:
-        risk_level = "MEDIUM"
-    elif risk_score <= 80:
-        risk_level = "HIGH"
-    else:
-        risk_level = "CRITICAL"
-    
-    return risk_score, risk_level
+def _scan_days(rows, day_column):
+    return {date.fromisoformat(str(getattr(row, day_column))) for row in rows}
+
+def _fill_rollup_gaps(raw, names, cached, start, end, database, backend):
+    """Read the days daily_security_summary has no record for from the raw report tables.
+    
+    CI only rolls up the current day, so until rollup_reports.py has been
+    run over the whole window most days exist only in the raw tables. A
+    day counts as summarized when the rollup trends query returned it.
+    Missing days are read with one raw query per name over the span they
+    cover, and only rows for those days are appended to `raw`. A rollup
+    query that failed is replaced by the raw rows for its whole window.
+    Returns the names that were filled.
+    """
+    summarized = None
+    if 'trends' in names and not isinstance(raw.get('trends'), Exception):
+        summarized = _scan_days(raw['trends'], TREND_QUERIES['trends'][2])
+    
+    gaps = {}
+    queries = {}
+    for name in names:
+        _, _, day_column = TREND_QUERIES[name]
+        if day_column is None or QUERY_SETS['raw'][name] == QUERY_SETS['rollup'][name]:
+            continue
+        result = raw.get(name)
+        present = set() if isinstance(result, Exception) else _scan_days(result, day_column)
+        covered = present | (summarized or set())
+        first = start + timedelta(days=len(cached.get(name, {})))
+        missing = [day for day in _day_range(first, end) if day not in covered]
+        if missing:
+            gaps[name] = set(missing)
+            queries[name] = for_database(QUERY_SETS['raw'][name], database).format(
+                date_filter=date_filter(missing[0], missing[-1]))
+    if not queries:
+        return set()
+    
+    days = len(set().union(*gaps.values()))
+    print(f"ℹ️ {days} day(s) have no rollup summary in {database}; reading them from the raw report tables")
+    try:
+        fresh = backend.run_queries(queries, database=database)
+    except Exception as e:
+        fresh = {name: e for name in queries}
+    
+    filled = set()
+    for name, rows in fresh.items():
+        if isinstance(rows, Exception):
+            print(f"⚠️ Could not read un-summarized days for {name}: {rows}")
+            continue
+        day_column = TREND_QUERIES[name][2]
+        rows = [row for row in rows if date.fromisoformat(str(getattr(row, day_column))) in gaps[name]]
+        if not isinstance(raw[name], Exception):
+            rows = sorted(list(raw[name]) + rows, key=lambda row: str(getattr(row, day_column)), reverse=True)
+        raw[name] = rows
+        filled.add(name)
+    return filled
+
+def _merge_daily(template, day_column, cached, fresh, start, end, result_cache, cache_empty=True):
+    """Cache the fresh rows of each completed day and merge them with the cached days, newest first"""
+    by_day = {}
+    for row in fresh:
+        by_day.setdefault(date.fromisoformat(str(getattr(row, day_column))), []).append(row)
+    # Days with no scans are cached as empty so they are not queried again
+    for day in _day_range(start + timedelta(days=len(cached)), end - timedelta(days=1)):
+        if day in by_day or cache_empty:
+            result_cache.put(template, (day, day), by_day.get(day, []))
+    
+    rows = list(fresh)
+    for day_rows in cached.values():
+        rows.extend(day_rows)
+    rows.sort(key=lambda row: str(getattr(row, day_column)), reverse=True)
+    return rows
+
+def get_vulnerability_trends():
+    """Get vulnerability trends over last 30 days"""
+    return fetch_trend_data(('trends',))['trends']
+
+def get_persistent_critical_issues():
+    """Get CRITICAL vulnerabilities that appear in multiple scans"""
+    return fetch_trend_data(('critical_issues',))['critical_issues']
+
+def get_secret_trends():
+    """Get secret leakage trends"""
+    return fetch_trend_data(('secrets',))['secrets']
 
 def analyze_trend_direction(trends):
-    """Determine if security is improving or degrading"""
-    if len(trends) < 2:
-        return "INSUFFICIENT_DATA", 0
-    
-    recent = trends[:7]  # Last 7 days
-    older = trends[7:14] if len(trends) >= 14 else trends[7:]
-    
-    if not older:
+    """Determine if security is improving or degrading (last 7 days vs the 7 before)"""
+    series = TrendSeries.from_trends(trends)
+    directions, change = series_trend_direction(series.totals, series.present)
+    if not len(directions):
         return "INSUFFICIENT_DATA", 0
-    
-    recent_avg = sum(t['total'] for t in recent) / len(recent)
-    older_avg = sum(t['total'] for t in older) / len(older)
-    
-    change_pct = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
-    
-    if change_pct > 10:
-        return "DEGRADING", change_pct
-    elif change_pct < -10:
-        return "IMPROVING", change_pct
+    return str(directions[0]), float(change[0])
+
+def trend_statistics(trends, secrets):
+    """Rolling average, EWMA risk, slope and change point of the trend series"""
+    stats = analyze(TrendSeries.from_trends(trends, secrets))[0]
+    return {key: stats[key] for key in ("rolling_7d_total", "ewma_risk", "slope_per_day", "change_point")}
+
+def format_statistics(statistics):
+    """Prompt/report lines describing the trend statistics"""
+    lines = [
+        f"- 7-day average findings per scan: {statistics.get('rolling_7d_total', 'N/A')}",
+        f"- Exponentially weighted risk: {statistics.get('ewma_risk', 'N/A')}/100",
+        f"- Least-squares slope: {statistics.get('slope_per_day', 'N/A')} findings/day (last 30 days)"
+    ]
+    change_point = statistics.get('change_point')
+    if change_point:
+        lines.append(
+            f"- Change point: findings shifted by {change_point['shift']:+} per scan "
+            f"from {change_point['date']} (z={change_point['z']})"
+        )
     else:
-        return "STABLE", change_pct
+        lines.append("- Change point: none detected")
+    return "\n".join(lines)
 
-def generate_ai_analysis(trends, critical_issues, secrets, risk_score, risk_level, trend_direction, change_pct):
-    """Generate AI-powered analysis using Gemini"""
-    import requests
+def generate_ai_analysis(trends, critical_issues, secrets, risk_score, risk_level, trend_direction, change_pct,
+                         statistics=None, on_text=None, generation=None):
+    """Generate AI-powered analysis using Gemini.
+    
+    With on_text and GEMINI_STREAM on, the response is streamed and each
+    chunk is passed to on_text as it arrives; the timings are stored in
+    `generation` when a dict is passed, including streamed=True.
+    """
+    from http_client import get_client
     
     api_key = os.getenv('GEMINI_API_KEY')
     if not api_key:
         return "⚠️ GEMINI_API_KEY not set - skipping AI analysis"
     
+    # Identical trend data + prompt template => reuse the cached analysis
+    report_key = cache_key(
+        TREND_PROMPT_VERSION,
+        trends[:10], critical_issues[:3], secrets[:3],
+        risk_score, risk_level, trend_direction, round(change_pct, 1), statistics
+    )
+    cached = ai_cache.get(report_key)
+    if cached is not None:
+        print("♻️ Trend data unchanged - reusing cached AI analysis")
+        return cached
+
     # Prepare data summary
     latest_trend = trends[0] if trends else {}
     
-    prompt = f"""
-You are a DevSecOps AI Security Analyst. Analyze this security trend data and provide actionable insights.
+    builder = PromptBuilder(
+        header=f"""You are a DevSecOps AI Security Analyst. Analyze this security trend data and provide actionable insights.
 
 CURRENT STATUS:
 - Risk Score: {risk_score}/100 ({risk_level})
@@ -244,34 +509,41 @@ CURRENT STATUS:
   - LOW: {latest_trend.get('low', 0)}
   - Total: {latest_trend.get('total', 0)}
 
-PERSISTENT CRITICAL ISSUES (Not Fixed):
-{json.dumps(critical_issues[:3], indent=2) if critical_issues else "None"}
-
-SECRET LEAKAGE:
-{json.dumps(secrets[:3], indent=2) if secrets else "None"}
-
-TREND DATA (Last 30 Days):
-{json.dumps(trends[:10], indent=2) if trends else "None"}
-
-Generate a CONCISE report (Max 300 words) with:
-
-1. 🎯 EXECUTIVE SUMMARY: One sentence on overall security posture
-
-2. 📊 TREND ANALYSIS: What's the trend telling us? (2-3 sentences)
-
-3. 🚨 TOP 3 PRIORITIES: Most urgent issues to fix (be specific with CVE IDs and packages)
-
-4. 💡 REMEDIATION PLAN: Step-by-step fixes for top priorities
-
-5. 🔮 PREDICTIONS: What will happen if current trend continues?
-
-6. 🔍 ROOT CAUSE: Why is the trend going this direction?
-
-Be specific, actionable, and use the actual data provided. Focus on WHAT TO DO, not just describing the problem.
-"""
+TREND STATISTICS:
+{format_statistics(statistics or {})}
+""",
+        footer=TREND_PROMPT_FOOTER
+    )
+    
+    # Budget priority: secrets, then persistent criticals, then raw trend data
+    builder.section("PERSISTENT CRITICAL ISSUES (Not Fixed):", PRIORITY_CRITICAL).add_json(critical_issues[:3])
+    builder.section("SECRET LEAKAGE:", PRIORITY_SECRETS).add_json(secrets[:3])
+    builder.section("TREND DATA (Last 30 Days):", PRIORITY_TRENDS).add_json(trends[:10])
+    for section in builder.sections:
+        if not section.lines:
+            section.add("None")
+    
+    prompt = builder.build()
+    print(f"📝 {builder.format_stats()}")
+    
+    if on_text is not None and GEMINI_STREAM:
+        try:
+            analysis, timings = stream_generate(prompt, api_key, on_text=on_text)
+        except Exception as e:
+            return f"⚠️ AI API Error: {e}"
+        if generation is not None:
+            generation.update(timings, streamed=True)
+        if not timings["complete"]:
+            # Keep what arrived and say so, rather than losing the whole analysis
+            note = f"\n\n⚠️ AI analysis incomplete - stream interrupted: {timings.get('error')}\n"
+            on_text(note)
+            return analysis + note
+        if analysis.strip():
+            ai_cache.put(report_key, analysis)
+        return analysis
     
     try:
-        url = f"https://generativelanguage.googleapis.com/v1/models/gemini-2.5-flash:generateContent?key={api_key}"
+        url = gemini_url(api_key)
         
         payload = {
             "contents": [{
@@ -280,84 +552,162 @@ Be specific, actionable, and use the actual data provided. Focus on WHAT TO DO,
             }]
         }
         
-        response = requests.post(url, json=payload, timeout=60)
+        response = get_client().post(url, name="gemini_generate", json=payload, timeout=60)
         
         if response.status_code == 200:
-            return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            analysis = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            if analysis.strip():
+                ai_cache.put(report_key, analysis)
+            return analysis
         else:
             return f"⚠️ AI API Error: {response.text}"
     
     except Exception as e:
         return f"⚠️ AI Analysis failed: {e}"
 
+def save_report(report, path='ai-trend-report.json'):
+    """Write the report JSON atomically so a reader never sees a half-written file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(report, f, indent=2)
+        get_tracer().count("report_bytes_written", f.tell())
+    os.replace(tmp_path, path)
+    get_tracer().count("report_writes")
+
 def main():
     print("🤖 AI Trend Intelligence - Starting Analysis...")
     print("=" * 60)
     
-    # Fetch data from Athena
-    print("\n📊 Fetching vulnerability trends from Athena...")
-    trends = get_vulnerability_trends()
-    
-    print("🔍 Fetching persistent critical issues...")
-    critical_issues = get_persistent_critical_issues()
-    
-    print("🔐 Fetching secret leakage data...")
-    secrets = get_secret_trends()
+    # Fetch trend data - on Athena all three queries run in parallel
+    print(f"\n📊 Fetching vulnerability trends, persistent critical issues and secret leakage data ({TREND_BACKEND} backend)...")
+    tracer = get_tracer()
+    start = time.perf_counter()
+    with tracer.span("fetch_trend_data", backend=TREND_BACKEND) as span:
+        data = fetch_trend_data()
+        trends = data['trends']
+        critical_issues = data['critical_issues']
+        secrets = data['secrets']
+        backend = get_backend()
+        span.count("trend_days", len(trends))
+        span.count("critical_issues", len(critical_issues))
+        span.count("bytes_scanned", sum(s.get("bytes_scanned") or 0 for s in backend.stats.values()))
+    print(f"⏱️ {backend.name} queries finished in {time.perf_counter() - start:.1f}s")
+    for stats in backend.stats.values():
+        line = f"  - {stats['name']}: {stats.get('state')} in {stats.get('wall_seconds')}s"
+        if 'bytes_scanned' in stats:
+            line += (
+                f" (queue {stats.get('queue_ms')} ms, engine {stats.get('engine_ms')} ms, "
+                f"scanned {stats.get('bytes_scanned')} bytes{', reused' if stats.get('reused') else ''})"
+            )
+        elif 'rows' in stats:
+            line += f" ({stats['rows']} rows)"
+        print(line)
+    if backend.result_cache is not None:
+        print(f"📦 {backend.result_cache.format_stats()}")
     
     # Calculate risk score
     print("\n⚖️ Calculating security risk score...")
-    risk_score, risk_level = calculate_risk_score(trends, secrets)
+    with tracer.span("risk_score"):
+        risk_score, risk_level = calculate_risk_score(trends, secrets)
     
     # Analyze trend direction
     print("📈 Analyzing trend direction...")
-    trend_direction, change_pct = analyze_trend_direction(trends)
-    
-    # Generate AI analysis
-    print("\n🤖 Generating AI-powered insights...")
-    ai_analysis = generate_ai_analysis(
-        trends, critical_issues, secrets,
-        risk_score, risk_level, trend_direction, change_pct
-    )
+    with tracer.span("trend_analysis"):
+        trend_direction, change_pct = analyze_trend_direction(trends)
+        statistics = trend_statistics(trends, secrets)
     
-    # Output report
+    # Output report; the AI analysis is streamed into stdout and both files as it arrives
     print("\n" + "=" * 60)
     print("🛡️ SECURITY INTELLIGENCE REPORT")
     print("=" * 60)
     print(f"\n📊 RISK SCORE: {risk_score}/100 - {risk_level}")
     print(f"📈 TREND: {trend_direction} ({change_pct:+.1f}% change)")
+    print(format_statistics(statistics))
     print(f"📅 Analysis Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    print("\n" + "-" * 60)
-    print(ai_analysis)
-    print("-" * 60)
-    
-    # Save to file
     report = {
         "timestamp": datetime.now().isoformat(),
         "risk_score": risk_score,
         "risk_level": risk_level,
         "trend_direction": trend_direction,
         "change_percentage": change_pct,
+        "statistics": statistics,
         "latest_scan": trends[0] if trends else {},
         "persistent_critical_issues": critical_issues,
         "secret_trends": secrets[:5],
-        "ai_analysis": ai_analysis
+        "ai_analysis": "",
+        "ai_analysis_complete": False
     }
+    with tracer.span("save_report"):
+        save_report(report)
+    
+    generation = {}
+    with ExitStack() as stack:
+        summary = None
+        if os.getenv('GITHUB_STEP_SUMMARY'):
+            summary = stack.enter_context(open(os.getenv('GITHUB_STEP_SUMMARY'), 'a'))
+            summary.write(f"\n## 🤖 AI Trend Intelligence Report\n\n")
+            summary.write(f"**Risk Score:** {risk_score}/100 - {risk_level}\n\n")
+            summary.write(f"**Trend:** {trend_direction} ({change_pct:+.1f}% change)\n\n")
+            summary.write(f"{format_statistics(statistics)}\n\n")
+            summary.write("### AI Analysis\n\n")
+            summary.flush()
+        stream = TextStream(summary)
+        last_save = time.monotonic()
+        
+        def on_text(chunk):
+            nonlocal last_save
+            stream(chunk)
+            report["ai_analysis"] += chunk
+            tracer.count("chunks")
+            if time.monotonic() - last_save >= REPORT_SAVE_INTERVAL:
+                save_report(report)
+                last_save = time.monotonic()
+        
+        # Generate AI analysis
+        print("\n🤖 Generating AI-powered insights...")
+        print("-" * 60)
+        with tracer.span("ai_analysis") as span:
+            ai_analysis = generate_ai_analysis(
+                trends, critical_issues, secrets,
+                risk_score, risk_level, trend_direction, change_pct, statistics,
+                on_text=on_text, generation=generation
+            )
+            if not generation.get("streamed"):
+                stream(ai_analysis)
+            span.count("response_chars", len(ai_analysis))
+            if generation.get("ttfb_seconds") is not None:
+                span.set("ttfb_seconds", generation["ttfb_seconds"])
+        print("\n" + "-" * 60)
+        
+        print(f"📦 {ai_cache.format_stats()}")
+        if generation:
+            print(f"⏱️ {format_generation(generation)}")
+        
+        if summary:
+            summary.write("\n")
+            if generation:
+                summary.write(f"\n{format_generation(generation)}\n")
+            if backend.stats:
+                summary.write(f"\n### ⏱️ Trend Queries ({backend.name})\n\n{backend.format_stats()}")
+            if backend.result_cache is not None:
+                summary.write(f"\n{backend.result_cache.format_stats()}\n")
     
-    with open('ai-trend-report.json', 'w') as f:
-        json.dump(report, f, indent=2)
+    # Save to file
+    report["ai_analysis"] = ai_analysis
+    report["ai_analysis_complete"] = generation.get("complete", True)
+    if generation:
+        report["ai_generation"] = {key: value for key, value in generation.items() if key != "streamed"}
+    with tracer.span("save_report"):
+        save_report(report)
     
     print("\n✅ Report saved to: ai-trend-report.json")
     
-    # Write to GitHub Step Summary if available
-    if os.getenv('GITHUB_STEP_SUMMARY'):
-        with open(os.getenv('GITHUB_STEP_SUMMARY'), 'a') as f:
-            f.write(f"\n## 🤖 AI Trend Intelligence Report\n\n")
-            f.write(f"**Risk Score:** {risk_score}/100 - {risk_level}\n\n")
-            f.write(f"**Trend:** {trend_direction} ({change_pct:+.1f}% change)\n\n")
-            f.write(f"### AI Analysis\n\n{ai_analysis}\n")
-    
     print("\n🎉 Analysis complete!")
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        get_tracer().finish(os.getenv('GITHUB_STEP_SUMMARY'))
@@ -0,0 +1,463 @@
+"""
+Athena Query Executor
+
+Shared Athena client for the trend scripts. Queries are polled with
+exponential backoff starting well under a second, a deadline is
+enforced with a real timeout error, and per-query queue/engine/total
+times and bytes scanned are recorded from the Statistics block.
+
+Results for windows that lie entirely in the past can be kept in a
+local on-disk cache, and Athena's own result reuse is requested so an
+identical query inside the reuse window is answered without a scan.
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+
+import boto3
+from botocore.exceptions import ClientError
+
+from instrumentation import get_tracer
+
+# batch_get_query_execution accepts at most 50 ids per call
+BATCH_STATUS_LIMIT = 50
+# UnprocessedQueryExecutionIds codes that will not go away on a later poll; others (throttling, internal errors) are retried
+FATAL_STATUS_ERRORS = {'InvalidRequestException', 'ResourceNotFoundException', 'AccessDeniedException'}
+DEFAULT_QUERY_TIMEOUT = int(os.getenv('ATHENA_QUERY_TIMEOUT', '300'))
+# 'api' pages through GetQueryResults; 's3' reads the CSV result object in bulk
+DEFAULT_RESULT_READER = os.getenv('ATHENA_RESULT_READER', 'api')
+RESULT_PAGE_SIZE = 1000
+# Athena-side reuse of identical query results (engine v3 workgroups); 0 disables
+DEFAULT_RESULT_REUSE_MINUTES = int(os.getenv('ATHENA_RESULT_REUSE_MINUTES', '60'))
+DEFAULT_RESULT_CACHE_DIR = os.getenv('ATHENA_CACHE_DIR', '.athena-cache')
+RESULT_CACHE_ENABLED = os.getenv('ATHENA_RESULT_CACHE', '1') != '0'
+# Queries one process keeps in flight at once; stays under the account's active DML query quota
+MAX_CONCURRENT_QUERIES = int(os.getenv('ATHENA_MAX_CONCURRENT_QUERIES', '20'))
+
+# Athena column type -> decoder for the string values in results
+TYPE_DECODERS = {
+    'tinyint': int,
+    'smallint': int,
+    'integer': int,
+    'int': int,
+    'bigint': int,
+    'double': float,
+    'float': float,
+    'real': float,
+    'decimal': Decimal,
+    'boolean': lambda v: v.lower() == 'true',
+    'date': date.fromisoformat,
+}
+
+
+def _row_decoder(column_info):
+    """Build a namedtuple type and per-column decoders from ResultSetMetadata.ColumnInfo"""
+    # Athena reports column names lower-cased; normalize so fake/local backends match
+    names = [c['Name'].lower() for c in column_info]
+    row_type = namedtuple('Row', names, rename=True)
+    decoders = [TYPE_DECODERS.get(c.get('Type', 'varchar').lower()) for c in column_info]
+
+    def decode(values):
+        out = []
+        for value, decoder in zip(values, decoders):
+            if value is None or (value == '' and decoder is not None):
+                out.append(None)
+            else:
+                out.append(decoder(value) if decoder else value)
+        return row_type(*out)
+
+    return names, decode
+
+
+def normalize_sql(query):
+    """Collapse whitespace so formatting-only edits keep the same cache key"""
+    return " ".join(query.split())
+
+
+class AthenaResultCache:
+    """On-disk cache of query rows keyed on normalized SQL plus a date window.
+
+    Callers only store windows that lie entirely in the past; those
+    partitions no longer change, so entries never expire. Values are
+    kept as JSON, so date/decimal columns come back as strings.
+    """
+
+    def __init__(self, directory=DEFAULT_RESULT_CACHE_DIR, enabled=RESULT_CACHE_ENABLED):
+        self.directory = directory
+        self.enabled = enabled
+        self.stats = {"hits": 0, "misses": 0, "writes": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def key(self, query, window):
+        start, end = window
+        h = hashlib.sha256(normalize_sql(query).encode('utf-8'))
+        h.update(f"\x1e{start}..{end}".encode('utf-8'))
+        return h.hexdigest()
+
+    def _path(self, query, window):
+        return os.path.join(self.directory, f"{self.key(query, window)}.json")
+
+    def get(self, query, window):
+        """Cached rows for the window as namedtuples, or None"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(query, window), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+        self._count("hits")
+        if not entry["rows"]:
+            return []
+        row_type = namedtuple('Row', entry["columns"], rename=True)
+        return [row_type(*values) for values in entry["rows"]]
+
+    def put(self, query, window, rows):
+        if not self.enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            "columns": list(rows[0]._fields) if rows else [],
+            "rows": [list(row) for row in rows]
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, default=str)
+        os.replace(tmp_path, self._path(query, window))
+        self._count("writes")
+
+    def format_stats(self):
+        s = self.stats
+        return f"Athena result cache: {s['hits']} hit(s), {s['misses']} miss(es), {s['writes']} write(s)"
+
+
+class AthenaQueryError(Exception):
+    """An Athena query finished in FAILED or CANCELLED state"""
+
+
+class AthenaQueryTimeout(AthenaQueryError):
+    """An Athena query did not finish before its deadline"""
+
+
+class QuerySlots:
+    """Counting semaphore that hands out several slots at once.
+
+    A batch takes all of its slots together, so concurrent callers can
+    never each hold part of what they need and wait on one another.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, count):
+        count = min(count, self.limit)
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_use + count <= self.limit)
+            self.in_use += count
+            self.peak = max(self.peak, self.in_use)
+        return count
+
+    def release(self, count):
+        with self._cond:
+            self.in_use -= count
+            self._cond.notify_all()
+
+
+class AthenaQueryExecutor:
+    """Start, wait for and fetch Athena queries through one shared client"""
+
+    def __init__(self, database='security_analytics', output_location=None, client=None,
+                 poll_initial=0.2, poll_max=5.0, poll_multiplier=1.6, timeout=DEFAULT_QUERY_TIMEOUT,
+                 result_reuse_minutes=DEFAULT_RESULT_REUSE_MINUTES, max_concurrent_queries=MAX_CONCURRENT_QUERIES):
+        self.database = database
+        self.output_location = output_location or (
+            f"s3://{os.getenv('S3_SECURITY_REPORTS_BUCKET')}/athena-results/"
+        )
+        self.athena = client or boto3.client('athena', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self.poll_multiplier = poll_multiplier
+        self.timeout = timeout
+        self.result_reuse_minutes = result_reuse_minutes
+        # Shared by every thread using this executor
+        self.slots = QuerySlots(max_concurrent_queries)
+
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def start(self, query, name=None, database=None):
+        """Submit a query and return its execution id without waiting"""
+        params = {
+            'QueryString': query,
+            'QueryExecutionContext': {'Database': database or self.database},
+            'ResultConfiguration': {'OutputLocation': self.output_location}
+        }
+        if self.result_reuse_minutes > 0:
+            params['ResultReuseConfiguration'] = {
+                'ResultReuseByAgeConfiguration': {'Enabled': True, 'MaxAgeInMinutes': self.result_reuse_minutes}
+            }
+        try:
+            response = self.athena.start_query_execution(**params)
+        except ClientError as e:
+            # Workgroups on engine v2 reject result reuse; fall back to a plain query
+            if 'ResultReuseConfiguration' not in params or e.response['Error']['Code'] != 'InvalidRequestException':
+                raise
+            self.result_reuse_minutes = 0
+            del params['ResultReuseConfiguration']
+            response = self.athena.start_query_execution(**params)
+        query_execution_id = response['QueryExecutionId']
+        with self._lock:
+            self.stats[query_execution_id] = {
+                "name": name or query_execution_id,
+                "started": time.perf_counter(),
+                "state": "QUEUED"
+            }
+        return query_execution_id
+
+    def _record(self, execution):
+        query_execution_id = execution['QueryExecutionId']
+        statistics = execution.get('Statistics', {})
+        with self._lock:
+            entry = self.stats.setdefault(query_execution_id, {"name": query_execution_id})
+            entry["state"] = execution['Status']['State']
+            entry["wall_seconds"] = round(time.perf_counter() - entry.get("started", time.perf_counter()), 3)
+            entry["queue_ms"] = statistics.get('QueryQueueTimeInMillis')
+            entry["engine_ms"] = statistics.get('EngineExecutionTimeInMillis')
+            entry["total_ms"] = statistics.get('TotalExecutionTimeInMillis')
+            entry["bytes_scanned"] = statistics.get('DataScannedInBytes')
+            entry["reused"] = statistics.get('ResultReuseInformation', {}).get('ReusedPreviousResult', False)
+
+    def wait(self, execution_ids, timeout=None):
+        """Poll all executions together until each finishes or the deadline passes.
+
+        Returns a dict of execution id -> None on success, or the
+        AthenaQueryError / AthenaQueryTimeout for that query. Queries still
+        running at the deadline are stopped so they stop accruing cost.
+        Ids Athena could not report on (e.g. throttled) are polled again on
+        the next tick unless their ErrorCode is in FATAL_STATUS_ERRORS.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        delay = self.poll_initial
+        outcome = {}
+        unavailable = {}
+        pending = list(execution_ids)
+
+        while pending:
+            for i in range(0, len(pending), BATCH_STATUS_LIMIT):
+                response = self.athena.batch_get_query_execution(
+                    QueryExecutionIds=pending[i:i + BATCH_STATUS_LIMIT]
+                )
+                for execution in response.get('QueryExecutions', []):
+                    query_execution_id = execution['QueryExecutionId']
+                    unavailable.pop(query_execution_id, None)
+                    status = execution['Status']
+                    if status['State'] == 'SUCCEEDED':
+                        outcome[query_execution_id] = None
+                        self._record(execution)
+                    elif status['State'] in ('FAILED', 'CANCELLED'):
+                        outcome[query_execution_id] = AthenaQueryError(
+                            f"Query failed: {status.get('StateChangeReason', 'Unknown error')}"
+                        )
+                        self._record(execution)
+                for item in response.get('UnprocessedQueryExecutionIds', []):
+                    query_execution_id = item['QueryExecutionId']
+                    reason = f"{item.get('ErrorCode', 'Unknown')}: {item.get('ErrorMessage', 'Unknown error')}"
+                    if item.get('ErrorCode') in FATAL_STATUS_ERRORS:
+                        outcome[query_execution_id] = AthenaQueryError(f"Query status unavailable: {reason}")
+                    else:
+                        unavailable[query_execution_id] = reason
+
+            pending = [qid for qid in pending if qid not in outcome]
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for qid in pending:
+                    if qid in unavailable:
+                        message = f"Query {qid} status unavailable after {timeout or self.timeout}s ({unavailable[qid]})"
+                    else:
+                        message = f"Query {qid} still running after {timeout or self.timeout}s"
+                    outcome[qid] = AthenaQueryTimeout(message)
+                    with self._lock:
+                        self.stats.get(qid, {})["state"] = "TIMED_OUT"
+                    try:
+                        self.athena.stop_query_execution(QueryExecutionId=qid)
+                    except Exception:
+                        pass
+                break
+
+            time.sleep(min(delay, remaining))
+            delay = min(self.poll_max, delay * self.poll_multiplier)
+
+        return outcome
+
+    def iter_rows(self, query_execution_id, page_size=RESULT_PAGE_SIZE):
+        """Lazily yield typed namedtuple rows, following NextToken across pages"""
+        paginator = self.athena.get_paginator('get_query_results')
+        names = decode = None
+        for page in paginator.paginate(
+            QueryExecutionId=query_execution_id,
+            PaginationConfig={'PageSize': page_size}
+        ):
+            rows = page['ResultSet']['Rows']
+            if decode is None:
+                names, decode = _row_decoder(page['ResultSet']['ResultSetMetadata']['ColumnInfo'])
+                # SELECT results repeat the column names as the first row
+                if rows and [(d.get('VarCharValue') or '').lower() for d in rows[0]['Data']] == names:
+                    rows = rows[1:]
+            for row in rows:
+                yield decode([d.get('VarCharValue') for d in row['Data']])
+
+    def iter_rows_from_s3(self, query_execution_id, s3_client=None):
+        """Yield typed rows by streaming the CSV result object from the S3 output location.
+
+        One GetObject replaces a GetQueryResults round-trip per 1000 rows,
+        which is much faster for large results.
+        """
+        execution = self.athena.get_query_execution(QueryExecutionId=query_execution_id)['QueryExecution']
+        location = execution['ResultConfiguration']['OutputLocation']
+        bucket, _, key = location[len('s3://'):].partition('/')
+
+        # Column types are only in the API metadata; one row is enough to get them
+        metadata = self.athena.get_query_results(QueryExecutionId=query_execution_id, MaxResults=1)
+        _, decode = _row_decoder(metadata['ResultSet']['ResultSetMetadata']['ColumnInfo'])
+
+        s3 = s3_client or boto3.client('s3', region_name=os.getenv('AWS_REGION', 'us-east-1'))
+        body = s3.get_object(Bucket=bucket, Key=key)['Body']
+        reader = csv.reader(io.TextIOWrapper(body, encoding='utf-8', newline=''))
+        next(reader, None)  # header
+        for values in reader:
+            yield decode(values)
+
+    def fetch(self, query_execution_id, reader=None):
+        """All rows of a finished query as a list of namedtuples"""
+        if (reader or DEFAULT_RESULT_READER) == 's3':
+            return list(self.iter_rows_from_s3(query_execution_id))
+        return list(self.iter_rows(query_execution_id))
+
+    def run_queries(self, queries, database=None, timeout=None, reader=None):
+        """Run several queries concurrently.
+
+        At most max_concurrent_queries run at once across all threads
+        sharing this executor; larger batches run in chunks. Returns a
+        dict of name -> list of typed rows, or name -> exception for a
+        query that failed or timed out.
+        """
+        results = {}
+        names = list(queries)
+        for i in range(0, len(names), self.slots.limit):
+            chunk = names[i:i + self.slots.limit]
+            held = self.slots.acquire(len(chunk))
+            try:
+                execution_ids, outcome = self._start_and_wait(queries, chunk, results, database, timeout)
+            finally:
+                self.slots.release(held)
+            self._fetch_all(execution_ids, outcome, results, reader)
+        return results
+
+    def _start_and_wait(self, queries, names, results, database, timeout):
+        execution_ids = {}
+        for name in names:
+            try:
+                execution_ids[name] = self.start(queries[name], name=name, database=database)
+            except Exception as e:
+                results[name] = e
+
+        outcome = self.wait(list(execution_ids.values()), timeout=timeout) if execution_ids else {}
+        return execution_ids, outcome
+
+    def _fetch_all(self, execution_ids, outcome, results, reader):
+        for name, query_execution_id in execution_ids.items():
+            error = outcome.get(query_execution_id)
+            start = time.perf_counter()
+            if error is None:
+                try:
+                    results[name] = self.fetch(query_execution_id, reader=reader)
+                except Exception as e:
+                    error = e
+            if error is not None:
+                results[name] = error
+            self._trace(name, query_execution_id, results[name], time.perf_counter() - start)
+
+    def _trace(self, name, query_execution_id, result, fetch_seconds):
+        """Record one query as a span from submission until Athena reported it finished"""
+        with self._lock:
+            stats = dict(self.stats.get(query_execution_id, {}))
+        counters = {"bytes_scanned": stats.get("bytes_scanned") or 0}
+        if not isinstance(result, Exception):
+            counters["rows"] = len(result)
+        attributes = {key: stats[key] for key in ("state", "queue_ms", "engine_ms", "reused") if stats.get(key) is not None}
+        attributes["fetch_seconds"] = round(fetch_seconds, 4)
+        get_tracer().record(
+            f"athena.{name}", stats.get("started", time.perf_counter()), seconds=stats.get("wall_seconds"),
+            counters=counters, attributes=attributes, error=str(result) if isinstance(result, Exception) else None
+        )
+
+    def run_query(self, query, database=None, timeout=None):
+        """Run one query, raising AthenaQueryError/AthenaQueryTimeout on failure"""
+        result = self.run_queries({'query': query}, database=database, timeout=timeout)['query']
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def total_bytes_scanned(self):
+        with self._lock:
+            return sum(s.get("bytes_scanned") or 0 for s in self.stats.values())
+
+    def format_stats(self):
+        """Markdown table of per-query timings and bytes scanned"""
+        lines = [
+            "| Query | State | Wall (s) | Queue (ms) | Engine (ms) | Total (ms) | Scanned (MB) | Reused |",
+            "|-------|-------|----------|------------|-------------|------------|--------------|--------|"
+        ]
+        with self._lock:
+            for s in self.stats.values():
+                scanned = s.get("bytes_scanned")
+                lines.append(
+                    f"| {s['name']} | {s.get('state', '')} | {s.get('wall_seconds', '')} "
+                    f"| {s.get('queue_ms') or ''} | {s.get('engine_ms') or ''} | {s.get('total_ms') or ''} "
+                    f"| {'' if scanned is None else round(scanned / (1024 * 1024), 2)} "
+                    f"| {'yes' if s.get('reused') else ''} |"
+                )
+        return "\n".join(lines) + "\n"
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_result_cache = None
+
+
+def get_executor():
+    """Process-wide shared executor so every query reuses one boto3 client"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = AthenaQueryExecutor()
+        return _executor
+
+
+def get_result_cache():
+    """Process-wide shared result cache"""
+    global _result_cache
+    with _executor_lock:
+        if _result_cache is None:
+            _result_cache = AthenaResultCache()
+        return _result_cache
@@ -0,0 +1,671 @@
+"""
+Security Pipeline Benchmarks
+
+Benchmarks for the hot paths of the security intelligence scripts.
+
+Usage:
+    python scripts/benchmark_pipeline.py stream-parse --size-mb 1024
+    python scripts/benchmark_pipeline.py partition-pruning --window-days 7 30 90
+    python scripts/benchmark_pipeline.py compaction --days 30
+    python scripts/benchmark_pipeline.py report-format --days 30 --base-vulns 500
+    python scripts/benchmark_pipeline.py suite --findings 1000 10000 100000 1000000 \
+        --output suite.json --baseline previous-suite.json
+
+Each benchmark runs in a fresh child process so peak RSS is measured in
+isolation. Results are printed and optionally written as JSON; the suite
+benchmark also compares against a previous results file and fails on
+latency or memory regressions. CI runs the 1k and 10k suite against
+scripts/benchmark_baseline.json; regenerate it with --output when a change
+is expected to move those numbers.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ai_security_agent
+import report_format
+
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+PARTITION_BYTES = 1024 * 1024
+
+
+def write_synthetic_trivy_report(path, size_mb, targets=4):
+    """Write a Trivy report of roughly size_mb megabytes without holding it in memory"""
+    target_bytes = size_mb * 1024 * 1024
+    per_target = target_bytes // targets
+    rng = random.Random(42)
+    count = 0
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"SchemaVersion": 2, "ArtifactName": "bench", "ArtifactType": "filesystem", "Results": [')
+        for t in range(targets):
+            if t:
+                f.write(',')
+            f.write(f'{{"Target": "target-{t}/pom.xml", "Class": "lang-pkgs", "Type": "jar", "Vulnerabilities": [')
+            written = 0
+            first = True
+            while written < per_target:
+                vuln = json.dumps({
+                    "VulnerabilityID": f"CVE-2023-{rng.randint(10000, 99999)}",
+                    "PkgName": f"pkg-{rng.randint(0, 5000)}",
+                    "InstalledVersion": "1.0.0",
+                    "FixedVersion": "1.1.0",
+                    "Severity": rng.choice(SEVERITIES),
+                    "Title": "Synthetic vulnerability",
+                    "Description": "x" * rng.randint(100, 600),
+                    "PrimaryURL": "https://nvd.nist.gov/"
+                }, indent=2)
+                chunk = vuln if first else ',' + vuln
+                f.write(chunk)
+                written += len(chunk)
+                first = False
+                count += 1
+            f.write(']}')
+        f.write(']}')
+
+    return count
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _stream_parse(path):
+    index = ai_security_agent.summarize_trivy_report(path)
+    return index.raw_counts.get("trivy", 0)
+
+
+def _json_load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return sum(len(r.get('Vulnerabilities', [])) for r in data.get('Results', []))
+
+
+def _child(fn, path, queue):
+    start = time.perf_counter()
+    findings = fn(path)
+    queue.put({
+        "findings": findings,
+        "seconds": round(time.perf_counter() - start, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1)
+    })
+
+
+def run_isolated(fn, path):
+    """Run fn(path) in a fresh process and return its timing and peak RSS"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(fn, path, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        return {"error": f"exited with code {proc.exitcode}"}
+    return queue.get()
+
+
+def bench_stream_parse(args):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in args.size_mb:
+            path = os.path.join(tmp, f'trivy-{size_mb}mb.json')
+            print(f"📝 Writing synthetic {size_mb} MB Trivy report...")
+            count = write_synthetic_trivy_report(path, size_mb)
+            file_mb = os.path.getsize(path) / (1024 * 1024)
+
+            row = {"size_mb": round(file_mb, 1), "findings": count}
+            row["stream"] = run_isolated(_stream_parse, path)
+            if args.compare_json_load:
+                row["json_load"] = run_isolated(_json_load, path)
+            results.append(row)
+
+            print(f"  stream:    {row['stream']}")
+            if 'json_load' in row:
+                print(f"  json.load: {row['json_load']}")
+            os.remove(path)
+    return results
+
+
+def _partition_table(history_days, today):
+    """In-memory table with one row per year/month/day partition of history"""
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE partitions (year TEXT, month TEXT, day TEXT, bytes INTEGER)')
+    days = [today - timedelta(days=i) for i in range(history_days)]
+    conn.executemany(
+        'INSERT INTO partitions VALUES (?, ?, ?, ?)',
+        [(f"{d:%Y}", f"{d:%m}", f"{d:%d}", PARTITION_BYTES) for d in days]
+    )
+    return conn
+
+
+def bench_partition_pruning(args):
+    """Bytes the trend date predicate selects for each window, over growing history.
+
+    The predicate is evaluated against a table holding only the partition
+    columns, so it must be expressible on year/month/day alone - the same
+    condition partition projection needs to prune. Selected bytes must
+    equal the window and stay flat as history grows.
+    """
+    import ai_trend_intelligence
+
+    today = date.today()
+    results = []
+    for history_days in args.history_days:
+        conn = _partition_table(history_days, today)
+        for window_days in args.window_days:
+            start, end = ai_trend_intelligence.resolve_window(window_days, today)
+            predicate = ai_trend_intelligence.date_filter(start, end)
+            partitions, scanned = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM partitions WHERE {predicate}"
+            ).fetchone()
+            expected = min(window_days + 1, history_days)
+            row = {
+                "history_days": history_days,
+                "window_days": window_days,
+                "partitions": partitions,
+                "scanned_mb": round(scanned / (1024 * 1024), 1),
+                "history_fraction": round(partitions / history_days, 3),
+                "regression": partitions != expected
+            }
+            results.append(row)
+            status = "❌" if row["regression"] else "✅"
+            print(
+                f"  {status} history {history_days:>4}d, window {window_days:>3}d: "
+                f"{partitions} partition(s), {row['scanned_mb']} MB (expected {expected})"
+            )
+        conn.close()
+
+    if args.live:
+        results.extend(_live_partition_scan(args.window_days, today))
+    return results
+
+
+def _live_partition_scan(window_days_list, today):
+    """Run the vulnerability trend query on Athena for each window and record bytes scanned"""
+    import ai_trend_intelligence
+    from athena_client import AthenaQueryExecutor
+
+    # No result reuse so every window is actually scanned
+    executor = AthenaQueryExecutor(result_reuse_minutes=0)
+    queries = {}
+    for window_days in window_days_list:
+        start, end = ai_trend_intelligence.resolve_window(window_days, today)
+        queries[f"window-{window_days}d"] = ai_trend_intelligence.VULNERABILITY_TRENDS_QUERY.format(
+            date_filter=ai_trend_intelligence.date_filter(start, end)
+        )
+    outcome = executor.run_queries(queries)
+
+    results = []
+    for stats in executor.stats.values():
+        scanned = stats.get("bytes_scanned") or 0
+        window_days = int(stats["name"][len("window-"):-1])
+        row = {
+            "live": True,
+            "window_days": window_days,
+            "state": stats.get("state"),
+            "scanned_mb": round(scanned / (1024 * 1024), 2),
+            "mb_per_day": round(scanned / (1024 * 1024) / (window_days + 1), 3)
+        }
+        results.append(row)
+        print(f"  🛰️ Athena window {window_days:>3}d: {row['scanned_mb']} MB ({row['mb_per_day']} MB/day)")
+    for name, result in outcome.items():
+        if isinstance(result, Exception):
+            print(f"  ⚠️ {name}: {result}")
+    return results
+
+
+# Columns each trend query reads from the compacted tables
+COMPACTED_QUERY_COLUMNS = {
+    "vulnerability_trends": ("trivy_findings", {"severity"}),
+    "persistent_critical": ("trivy_findings", {"vulnerability_id", "pkg_name", "title", "fixed_version", "severity"}),
+    "secret_trends": ("gitleaks_findings", {"file"}),
+}
+# Raw report type each trend query scans in full through JsonSerDe
+RAW_QUERY_SOURCES = {
+    "vulnerability_trends": "trivy",
+    "persistent_critical": "trivy",
+    "secret_trends": "gitleaks",
+}
+
+
+def _column_bytes(directory):
+    """Compressed bytes per column across all Parquet files under directory"""
+    import pyarrow.parquet as pq
+
+    sizes = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith('.parquet'):
+                continue
+            metadata = pq.ParquetFile(os.path.join(root, name)).metadata
+            for rg in range(metadata.num_row_groups):
+                row_group = metadata.row_group(rg)
+                for i in range(row_group.num_columns):
+                    column = row_group.column(i)
+                    sizes[column.path_in_schema] = sizes.get(column.path_in_schema, 0) + column.total_compressed_size
+    return sizes
+
+
+def _tree_bytes(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(directory) for name in files
+    )
+
+
+def bench_compaction(args):
+    """Bytes each trend query would scan on the raw JSON tables vs the compacted Parquet tables"""
+    import compact_reports
+    import generate_test_data
+
+    if compact_reports.pa is None:
+        print("❌ pyarrow is required for the compaction benchmark")
+        return []
+
+    random.seed(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, 'raw')
+        out_dir = os.path.join(tmp, 'compacted')
+        start_date = date.today() - timedelta(days=args.days)
+        print(f"📝 Writing {args.days} days of synthetic reports...")
+        for day in range(args.days):
+            generate_test_data.save_to_directory(raw_dir, start_date + timedelta(days=day), day + 1, {
+                "trivy-report.json": generate_test_data.generate_trivy_report(day, base_vulns=args.base_vulns),
+                "gitleaks-report.json": generate_test_data.generate_gitleaks_report(day),
+                "snyk-report.json": generate_test_data.generate_snyk_report(day),
+            })
+
+        start = time.perf_counter()
+        stats, _ = compact_reports.compact_reports(raw_dir, out_dir)
+        seconds = round(time.perf_counter() - start, 3)
+        rows = sum(s["rows"] for s in stats.values())
+        print(f"🗜️ Compacted {rows} findings in {seconds}s")
+
+        results = []
+        for query, (table, columns) in COMPACTED_QUERY_COLUMNS.items():
+            raw_bytes = _tree_bytes(os.path.join(raw_dir, RAW_QUERY_SOURCES[query]))
+            column_sizes = _column_bytes(os.path.join(out_dir, table))
+            compacted_bytes = sum(size for column, size in column_sizes.items() if column in columns)
+            row = {
+                "query": query,
+                "days": args.days,
+                "raw_kb": round(raw_bytes / 1024, 1),
+                "compacted_table_kb": round(sum(column_sizes.values()) / 1024, 1),
+                "compacted_scan_kb": round(compacted_bytes / 1024, 1),
+                "reduction": round(raw_bytes / compacted_bytes, 1) if compacted_bytes else None
+            }
+            results.append(row)
+            print(
+                f"  {query:<22} raw {row['raw_kb']:>9} KB -> {row['compacted_scan_kb']:>7} KB scanned "
+                f"(table {row['compacted_table_kb']} KB, {row['reduction']}x less)"
+            )
+    return results
+
+
+def bench_report_format(args):
+    """Stored size and write/read throughput of each report storage format.
+
+    The same synthetic days are written in every format with the
+    generator's save_to_directory and read back through the scripts'
+    own readers; a format that reads back a different finding count is
+    flagged as a regression.
+    """
+    import compact_reports
+    import generate_test_data
+
+    random.seed(42)
+    start_date = date.today() - timedelta(days=args.days)
+    runs = []
+    for day in range(args.days):
+        runs.append((start_date + timedelta(days=day), day + 1, {
+            "trivy-report.json": generate_test_data.generate_trivy_report(day, base_vulns=args.base_vulns),
+            "gitleaks-report.json": generate_test_data.generate_gitleaks_report(day),
+            "snyk-report.json": generate_test_data.generate_snyk_report(day),
+            "metadata.json": generate_test_data.generate_metadata(day + 1, start_date + timedelta(days=day)),
+        }))
+
+    results = []
+    baseline = None
+    for fmt in report_format.REPORT_FORMATS:
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            for run_date, run_number, reports in runs:
+                generate_test_data.save_to_directory(tmp, run_date, run_number, reports, fmt)
+            write_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            findings = 0
+            for report_type in compact_reports.TABLES:
+                path_spec = report_format.FINDING_PATHS[report_type]
+                for reports in compact_reports.find_report_days(tmp, report_type).values():
+                    for _, path in reports:
+                        findings += sum(1 for _ in report_format.iter_report_items(path, path_spec))
+            read_seconds = time.perf_counter() - start
+            stored = _tree_bytes(tmp)
+
+        baseline = baseline or {"bytes": stored, "findings": findings}
+        row = {
+            "format": fmt,
+            "days": args.days,
+            "findings": findings,
+            "stored_kb": round(stored / 1024, 1),
+            "size_vs_json": round(stored / baseline["bytes"], 3),
+            "write_findings_per_s": round(findings / write_seconds) if write_seconds else None,
+            "read_findings_per_s": round(findings / read_seconds) if read_seconds else None,
+            "regression": findings != baseline["findings"]
+        }
+        results.append(row)
+        status = "❌" if row["regression"] else "✅"
+        print(
+            f"  {status} {fmt:<9} {row['stored_kb']:>10} KB ({row['size_vs_json']:.1%} of json), "
+            f"write {row['write_findings_per_s']:>9,} findings/s, read {row['read_findings_per_s']:>9,} findings/s"
+        )
+    return results
+
+
+# Suite defaults: findings per scan run, and allowed slowdown/growth against a baseline
+SUITE_FINDINGS = [1000, 10000, 100000, 1000000]
+SUITE_MAX_REGRESSION = 0.25
+# Fast cases are re-run until this much time is spent, so their best run is stable
+SUITE_MIN_TIMED_SECONDS = 1.0
+SUITE_MAX_RUNS = 1000
+# Changes below these are timer/allocator noise, not regressions
+SUITE_MIN_SECONDS_DELTA = 0.005
+SUITE_MIN_MB_DELTA = 1.0
+
+
+def _suite_dataset(directory, findings, seed):
+    """One scan run with ~findings Trivy findings from the load generator; returns report paths"""
+    import compact_reports
+    import generate_test_data
+
+    generator = generate_test_data.LoadGenerator(findings=findings, days=1, seed=seed, end_date=date(2026, 1, 1))
+    generate_test_data.write_load_data(generator, directory=directory)
+    return {
+        report_type: reports[0][1]
+        for report_type in ("trivy", "snyk", "gitleaks")
+        for reports in compact_reports.find_report_days(directory, report_type).values()
+    }
+
+
+def _load_findings(paths):
+    inputs, _ = ai_security_agent.collect_sources(
+        ai_security_agent.report_sources(paths["trivy"], paths["snyk"], paths["gitleaks"])
+    )
+    return ai_security_agent.merge_scanner_results(inputs)
+
+
+def _trend_rows(findings, days):
+    """Daily trend and secret rows, newest first as the Athena queries return them"""
+    end = date(2026, 1, 1)
+    trends, secrets = [], []
+    for i in range(days):
+        total = int(findings * (1.5 - 0.5 * i / max(1, days - 1)))
+        counts = [int(total * share) for share in (0.05, 0.25, 0.40)]
+        trends.append({
+            'date': (end - timedelta(days=i)).isoformat(),
+            'critical': counts[0], 'high': counts[1], 'medium': counts[2],
+            'low': total - sum(counts), 'total': total
+        })
+        secrets.append({'date': trends[-1]['date'], 'count': total // 200, 'files': 4})
+    return trends, secrets
+
+
+class _FakeResultPages:
+    """Paginator over GetQueryResults pages of persistent-critical rows.
+
+    A few distinct pages are built from the Trivy report and repeated up
+    to the requested row count, so large results cost no extra memory.
+    """
+
+    COLUMNS = [("vulnerabilityid", "varchar"), ("pkgname", "varchar"), ("title", "varchar"),
+               ("fixedversion", "varchar"), ("days_present", "bigint"), ("first_seen", "date"),
+               ("last_seen", "date")]
+
+    def __init__(self, trivy_path, rows, distinct_pages=8):
+        import athena_client
+
+        self.rows = rows
+        self.page_size = athena_client.RESULT_PAGE_SIZE
+        self.metadata = {"ColumnInfo": [{"Name": name, "Type": kind} for name, kind in self.COLUMNS]}
+        values = []
+        for _, v in report_format.iter_report_items(trivy_path, ("Results", "*", "Vulnerabilities", "*")):
+            days = len(values) % 30 + 1
+            values.append([v.get("VulnerabilityID"), v.get("PkgName"), v.get("Title"), v.get("FixedVersion"),
+                           str(days), "2026-01-01", f"2026-01-{days:02d}"])
+            if len(values) >= self.page_size * distinct_pages:
+                break
+        rows_data = [{"Data": [{"VarCharValue": value} for value in row]} for row in values]
+        self.pages = [rows_data[i:i + self.page_size] for i in range(0, len(rows_data), self.page_size)]
+        self.header = {"Data": [{"VarCharValue": name} for name, _ in self.COLUMNS]}
+
+    def get_paginator(self, operation):
+        return self
+
+    def paginate(self, QueryExecutionId, PaginationConfig):
+        remaining = self.rows
+        first = True
+        while remaining > 0:
+            for page in self.pages:
+                rows = page[:remaining]
+                remaining -= len(rows)
+                yield {"ResultSet": {"ResultSetMetadata": self.metadata,
+                                     "Rows": [self.header] + rows if first else rows}}
+                first = False
+                if remaining <= 0:
+                    return
+
+
+def _prepare_athena_decode(paths, findings, days):
+    from athena_client import AthenaQueryExecutor
+
+    return AthenaQueryExecutor(client=_FakeResultPages(paths["trivy"], findings))
+
+
+def _run_athena_decode(executor):
+    import ai_trend_intelligence
+
+    return len(ai_trend_intelligence.parse_persistent_critical_issues(executor.iter_rows("bench")))
+
+
+def _run_agent_load(paths):
+    findings, _ = _load_findings(paths)
+    return sum(findings.raw_counts.values())
+
+
+def _run_prompt_build(loaded):
+    findings, scanner_errors = loaded
+    builder, _ = ai_security_agent.build_prompt(findings, scanner_errors)
+    builder.build()
+    return len(findings)
+
+
+def _run_risk_score(rows):
+    import ai_trend_intelligence
+
+    ai_trend_intelligence.calculate_risk_score(*rows)
+    return len(rows[0])
+
+
+def _run_trend_direction(rows):
+    import ai_trend_intelligence
+
+    ai_trend_intelligence.analyze_trend_direction(rows[0])
+    return len(rows[0])
+
+
+# case -> (prepare(paths, findings, days) -> state, run(state) -> items processed); prepare is not timed
+SUITE_CASES = {
+    "agent_load": (lambda paths, findings, days: paths, _run_agent_load),
+    "prompt_build": (lambda paths, findings, days: _load_findings(paths), _run_prompt_build),
+    "risk_score": (lambda paths, findings, days: _trend_rows(findings, days), _run_risk_score),
+    "trend_direction": (lambda paths, findings, days: _trend_rows(findings, days), _run_trend_direction),
+    "athena_decode": (_prepare_athena_decode, _run_athena_decode),
+}
+
+
+def _suite_child(case, paths, findings, days, repeat, queue):
+    from instrumentation import get_tracer
+
+    # Stage spans would reset tracemalloc's peak and slow the code being measured
+    get_tracer().enabled = False
+    prepare, run = SUITE_CASES[case]
+    state = prepare(paths, findings, days)
+    # Best of at least `repeat` untraced runs (more for fast cases) for latency,
+    # then one traced run for allocations
+    best = None
+    runs = 0
+    spent = 0.0
+    while runs < repeat or (spent < SUITE_MIN_TIMED_SECONDS and runs < SUITE_MAX_RUNS):
+        start = time.perf_counter()
+        items = run(state)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        runs += 1
+        spent += elapsed
+    tracemalloc.start()
+    run(state)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queue.put({
+        "items": items,
+        "seconds": round(best, 4),
+        "items_per_s": round(items / best) if best else None,
+        "peak_alloc_mb": round(peak / (1024 * 1024), 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1)
+    })
+
+
+def run_case_isolated(case, paths, findings, days, repeat):
+    """Run one suite case in a fresh process and return its measurements"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_suite_child, args=(case, paths, findings, days, repeat, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        return {"error": f"exited with code {proc.exitcode}"}
+    return queue.get()
+
+
+def compare_to_baseline(row, baseline, max_regression=SUITE_MAX_REGRESSION):
+    """Names of the metrics in row that regressed beyond max_regression against the baseline row"""
+    regressed = []
+    for metric, min_delta in (("seconds", SUITE_MIN_SECONDS_DELTA), ("peak_alloc_mb", SUITE_MIN_MB_DELTA)):
+        old, new = baseline.get(metric), row.get(metric)
+        if old is None or new is None:
+            continue
+        if new > old * (1 + max_regression) and new - old > min_delta:
+            regressed.append(metric)
+    return regressed
+
+
+def bench_suite(args):
+    """Latency and peak allocations of the pipeline hot paths over growing report sets.
+
+    Each size is one scan run of that many Trivy findings (plus the load
+    generator's Snyk and Gitleaks share). Trend cases use --days daily
+    rows whose totals match the size, since the trend queries return one
+    row per day however many findings a day holds.
+    """
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(row["case"], row["findings"]): row for row in json.load(f)["results"]}
+
+    results = []
+    for findings in args.findings:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"📝 Generating a scan run with ~{findings:,} findings...")
+            paths = _suite_dataset(tmp, findings, args.seed)
+            for case in args.cases:
+                row = {"case": case, "findings": findings}
+                row.update(run_case_isolated(case, paths, findings, args.days, args.repeat))
+                previous = baseline.get((case, findings))
+                if previous and "error" not in row:
+                    row["baseline_seconds"] = previous.get("seconds")
+                    row["baseline_peak_alloc_mb"] = previous.get("peak_alloc_mb")
+                    row["regressed"] = compare_to_baseline(row, previous, args.max_regression)
+                row["regression"] = "error" in row or bool(row.get("regressed"))
+                results.append(row)
+
+                status = "❌" if row["regression"] else "✅"
+                if "error" in row:
+                    print(f"  {status} {case:<16} {row['error']}")
+                    continue
+                change = ""
+                if previous:
+                    change = f" (baseline {previous.get('seconds')}s, {previous.get('peak_alloc_mb')} MB)"
+                print(
+                    f"  {status} {case:<16} {row['items']:>9,} items in {row['seconds']:.4f}s, "
+                    f"peak alloc {row['peak_alloc_mb']} MB, RSS {row['peak_rss_mb']} MB{change}"
+                )
+    return results
+
+
+BENCHMARKS = {
+    "stream-parse": bench_stream_parse,
+    "partition-pruning": bench_partition_pruning,
+    "compaction": bench_compaction,
+    "report-format": bench_report_format,
+    "suite": bench_suite,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the security pipeline hot paths")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--size-mb', type=int, nargs='+', default=[16, 64, 256],
+                        help="Synthetic report sizes to generate (stream-parse)")
+    parser.add_argument('--compare-json-load', action='store_true',
+                        help="Also measure json.load on the same files (needs RAM for the whole report)")
+    parser.add_argument('--window-days', type=int, nargs='+', default=[1, 7, 30, 90],
+                        help="Lookback windows to check (partition-pruning)")
+    parser.add_argument('--history-days', type=int, nargs='+', default=[90, 365, 730],
+                        help="Days of partitioned history to simulate (partition-pruning)")
+    parser.add_argument('--live', action='store_true',
+                        help="Also run the trend query on Athena and record bytes scanned (partition-pruning)")
+    parser.add_argument('--days', type=int, default=30,
+                        help="Days of synthetic reports to compact or store, or of trend rows (compaction, report-format, suite)")
+    parser.add_argument('--base-vulns', type=int, default=50,
+                        help="Baseline Trivy findings per synthetic report (compaction, report-format)")
+    parser.add_argument('--findings', type=int, nargs='+', default=SUITE_FINDINGS,
+                        help="Findings per synthetic scan run (suite)")
+    parser.add_argument('--cases', nargs='+', choices=list(SUITE_CASES), default=list(SUITE_CASES),
+                        help="Cases to run (suite)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case; the fastest is kept (suite)")
+    parser.add_argument('--seed', type=int, default=42, help="Load generator seed (suite)")
+    parser.add_argument('--baseline', help="Previous suite results JSON to compare against (suite)")
+    parser.add_argument('--max-regression', type=float, default=SUITE_MAX_REGRESSION,
+                        help="Allowed slowdown / allocation growth over the baseline, as a fraction (suite)")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    print(f"⏱️ Running benchmark: {args.benchmark}")
+    results = BENCHMARKS[args.benchmark](args)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"benchmark": args.benchmark, "results": results}, f, indent=2)
+        print(f"✅ Results saved to: {args.output}")
+
+    if any(row.get("regression") for row in results):
+        print("❌ Regression detected")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Report Compaction
+
+Flattens the raw JSON scan reports into one row per finding and writes
+each day as a compressed Parquet file for the *_findings tables in
+athena/setup.sql. Queries on those tables read only the columns they use
+instead of parsing and UNNESTing every nested report.
+
+Input is a local directory laid out like the reports bucket
+(trivy/YYYY/MM/DD/run-NNN/trivy-report.json or .jsonl.gz, ...), so the job runs
+without AWS. Days whose Parquet file is newer than all of their reports
+are skipped; --upload-bucket copies the written files to S3.
+
+Usage:
+    python scripts/compact_reports.py --input reports/ --output compacted/
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from report_format import iter_report_items, report_filenames
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+COMPRESSION = os.getenv('COMPACT_COMPRESSION', 'zstd')
+# Rows buffered per Parquet row group; bounds memory for very large days
+BATCH_ROWS = 50000
+OUTPUT_FILE = 'findings.parquet'
+S3_PREFIX = 'compacted'
+
+
+def _trivy_rows(path, run_id):
+    for context, v in iter_report_items(path, ("Results", "*", "Vulnerabilities", "*")):
+        yield (
+            run_id,
+            context.get("Target"),
+            v.get("VulnerabilityID"),
+            v.get("PkgName"),
+            v.get("InstalledVersion"),
+            v.get("FixedVersion") or None,
+            (v.get("Severity") or "UNKNOWN").upper(),
+            v.get("Title"),
+        )
+
+
+def _snyk_rows(path, run_id):
+    for _, v in iter_report_items(path, ("vulnerabilities", "*")):
+        cves = (v.get("identifiers") or {}).get("CVE") or []
+        fixed_in = v.get("fixedIn") or []
+        yield (
+            run_id,
+            v.get("id"),
+            cves[0] if cves else None,
+            v.get("packageName"),
+            v.get("version"),
+            fixed_in[0] if fixed_in else None,
+            (v.get("severity") or "UNKNOWN").upper(),
+            v.get("title"),
+            v.get("cvssScore"),
+        )
+
+
+def _gitleaks_rows(path, run_id):
+    for _, secret in iter_report_items(path, ("*",)):
+        yield (
+            run_id,
+            secret.get("RuleID"),
+            secret.get("Description"),
+            secret.get("File"),
+            secret.get("StartLine"),
+            secret.get("Commit"),
+            secret.get("Entropy"),
+            secret.get("Fingerprint"),
+        )
+
+
+# report type -> (table, report file name, row generator, [(column, type)])
+TABLES = {
+    "trivy": ("trivy_findings", "trivy-report.json", _trivy_rows, [
+        ("run_id", "string"), ("target", "string"), ("vulnerability_id", "string"),
+        ("pkg_name", "string"), ("installed_version", "string"), ("fixed_version", "string"),
+        ("severity", "string"), ("title", "string"),
+    ]),
+    "snyk": ("snyk_findings", "snyk-report.json", _snyk_rows, [
+        ("run_id", "string"), ("snyk_id", "string"), ("cve_id", "string"),
+        ("package_name", "string"), ("version", "string"), ("fixed_version", "string"),
+        ("severity", "string"), ("title", "string"), ("cvss_score", "double"),
+    ]),
+    "gitleaks": ("gitleaks_findings", "gitleaks-report.json", _gitleaks_rows, [
+        ("run_id", "string"), ("rule_id", "string"), ("description", "string"),
+        ("file", "string"), ("start_line", "int"), ("commit", "string"),
+        ("entropy", "double"), ("fingerprint", "string"),
+    ]),
+}
+
+
+def _schema(columns):
+    types = {"string": pa.string(), "int": pa.int32(), "double": pa.float64()}
+    return pa.schema([(name, types[kind]) for name, kind in columns])
+
+
+def find_report_days(input_dir, report_type):
+    """Map (year, month, day) -> [(run_id, path)] for one report type"""
+    _, filename, _, _ = TABLES[report_type]
+    days = {}
+    # Reports may be stored in any of the formats in report_format
+    paths = []
+    for name in report_filenames(filename):
+        paths.extend(glob.glob(os.path.join(input_dir, report_type, '*', '*', '*', '*', name)))
+    for path in sorted(paths):
+        parts = os.path.normpath(path).split(os.sep)
+        year, month, day, run_id = parts[-5:-1]
+        days.setdefault((year, month, day), []).append((run_id, path))
+    return days
+
+
+def compact_day(report_type, reports, output_path):
+    """Write all findings of one day's reports to a Parquet file; returns rows written"""
+    _, _, rows_for, columns = TABLES[report_type]
+    schema = _schema(columns)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + '.tmp'
+
+    rows = 0
+    batch = [[] for _ in columns]
+    with pq.ParquetWriter(tmp_path, schema, compression=COMPRESSION) as writer:
+        for run_id, path in reports:
+            for row in rows_for(path, run_id):
+                for values, value in zip(batch, row):
+                    values.append(value)
+                rows += 1
+                if len(batch[0]) >= BATCH_ROWS:
+                    writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+                    batch = [[] for _ in columns]
+        if batch[0] or rows == 0:
+            writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def compact_reports(input_dir, output_dir, report_types=tuple(TABLES), force=False):
+    """Compact every new or changed day; returns (per-type stats, written paths)"""
+    stats = {}
+    written = []
+    for report_type in report_types:
+        table = TABLES[report_type][0]
+        s = stats.setdefault(report_type, {
+            "table": table, "days": 0, "skipped": 0, "rows": 0,
+            "input_bytes": 0, "output_bytes": 0, "seconds": 0.0
+        })
+        start = time.perf_counter()
+        for (year, month, day), reports in sorted(find_report_days(input_dir, report_type).items()):
+            output_path = os.path.join(output_dir, table, year, month, day, OUTPUT_FILE)
+            newest_input = max(os.path.getmtime(path) for _, path in reports)
+            if not force and os.path.exists(output_path) and os.path.getmtime(output_path) >= newest_input:
+                s["skipped"] += 1
+                continue
+
+            s["rows"] += compact_day(report_type, reports, output_path)
+            s["days"] += 1
+            s["input_bytes"] += sum(os.path.getsize(path) for _, path in reports)
+            s["output_bytes"] += os.path.getsize(output_path)
+            written.append(output_path)
+        s["seconds"] = round(time.perf_counter() - start, 3)
+    return stats, written
+
+
+def upload_compacted(bucket_name, output_dir, paths):
+    """Copy written Parquet files to s3://bucket/compacted/<table>/YYYY/MM/DD/"""
+    import boto3
+
+    s3 = boto3.client('s3')
+    for path in paths:
+        key = f"{S3_PREFIX}/{os.path.relpath(path, output_dir).replace(os.sep, '/')}"
+        try:
+            s3.upload_file(path, bucket_name, key)
+        except Exception as e:
+            print(f"⚠️ Failed to upload {key}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact raw JSON scan reports into partitioned Parquet")
+    parser.add_argument('--input', required=True, help="Directory laid out like the reports bucket")
+    parser.add_argument('--output', required=True, help="Directory for <table>/YYYY/MM/DD/findings.parquet")
+    parser.add_argument('--types', nargs='+', choices=sorted(TABLES), default=sorted(TABLES))
+    parser.add_argument('--force', action='store_true', help="Rewrite days that are already compacted")
+    parser.add_argument('--upload-bucket', help="Upload written files to this S3 bucket")
+    args = parser.parse_args()
+
+    if pa is None:
+        print("❌ Error: pyarrow is required for compaction (pip install pyarrow)")
+        sys.exit(1)
+
+    print("🗜️ Compacting security reports to Parquet...")
+    stats, written = compact_reports(args.input, args.output, args.types, force=args.force)
+    for report_type, s in stats.items():
+        ratio = s["input_bytes"] / s["output_bytes"] if s["output_bytes"] else 0
+        print(
+            f"  - {s['table']}: {s['days']} day(s) compacted, {s['skipped']} unchanged, "
+            f"{s['rows']} rows, {s['input_bytes'] / 1024:.0f} KB -> {s['output_bytes'] / 1024:.0f} KB "
+            f"({ratio:.1f}x) in {s['seconds']}s"
+        )
+
+    if args.upload_bucket and written:
+        print(f"📦 Uploading {len(written)} file(s) to s3://{args.upload_bucket}/{S3_PREFIX}/")
+        upload_compacted(args.upload_bucket, args.output, written)
+
+    print("✅ Compaction complete")
+
+
+if __name__ == "__main__":
+    main()
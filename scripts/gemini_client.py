@@ -0,0 +1,376 @@
+"""
+Gemini Client
+
+URL helper shared by every Gemini call, streaming generation, and a
+batching layer for fleet-wide analysis.
+
+stream_generate() uses the streamGenerateContent endpoint (server-sent
+events) and hands each text chunk to a callback as it arrives, so
+reports appear progressively and a stall near the end keeps everything
+received so far. Time to first byte and total generation time are
+recorded.
+
+GeminiBatchAnalyzer packs the condensed summaries of several
+repositories into one generateContent request, asks for structured JSON
+output matching BATCH_RESPONSE_SCHEMA and splits the answer back per
+repository. Independent batches run concurrently behind
+a shared RateLimiter; batches that fail or drop repositories are retried
+at half the size until single repositories remain.
+
+Input/output tokens from usageMetadata are apportioned to each
+repository of a batch, so per-repo cost and latency can be reported.
+GEMINI_BASE_URL points every call at another server, e.g. a local fake
+model for testing.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ai_cache import cache_key
+from prompt_builder import DEFAULT_TOKEN_BUDGET, compact_json, estimate_tokens
+
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com').rstrip('/')
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+# Single reports use streamGenerateContent unless GEMINI_STREAM=0
+GEMINI_STREAM = os.getenv('GEMINI_STREAM', '1') != '0'
+
+# Repositories per request, bounded again by the prompt token budget
+GEMINI_BATCH_SIZE = int(os.getenv('GEMINI_BATCH_SIZE', '10'))
+GEMINI_BATCH_CONCURRENCY = int(os.getenv('GEMINI_BATCH_CONCURRENCY', '4'))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60'))
+# USD per million tokens; thinking tokens are billed as output
+GEMINI_INPUT_PRICE = float(os.getenv('GEMINI_INPUT_PRICE_PER_MTOK', '0.30'))
+GEMINI_OUTPUT_PRICE = float(os.getenv('GEMINI_OUTPUT_PRICE_PER_MTOK', '2.50'))
+
+# Bump whenever the batch prompt or schema changes so cached analyses are not reused
+BATCH_PROMPT_VERSION = "fleet-analysis-v1"
+
+BATCH_PROMPT_HEADER = """You are a DevSecOps AI Security Analyst. Below are condensed security trend summaries for {count} repositories, one JSON object per line.
+
+Return one entry per repository, using its exact "repo" value, with:
+- executive_summary: one sentence on overall security posture
+- trend_analysis: what the trend is telling us (1-2 sentences)
+- top_priorities: up to 3 most urgent fixes, specific with CVE IDs and packages
+- remediation: step-by-step fixes for the top priorities
+- prediction: what will happen if the current trend continues
+- root_cause: why the trend is going this direction
+
+Be specific, actionable, and use only the data provided.
+
+REPOSITORIES:
+"""
+
+ANALYSIS_FIELDS = ("executive_summary", "trend_analysis", "top_priorities", "remediation", "prediction", "root_cause")
+
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "repo": {"type": "STRING"},
+            "executive_summary": {"type": "STRING"},
+            "trend_analysis": {"type": "STRING"},
+            "top_priorities": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "remediation": {"type": "STRING"},
+            "prediction": {"type": "STRING"},
+            "root_cause": {"type": "STRING"},
+        },
+        "required": ["repo", *ANALYSIS_FIELDS],
+    },
+}
+
+
+def gemini_url(api_key, method='generateContent', model=GEMINI_MODEL, version='v1'):
+    """Endpoint URL for a Gemini model method on GEMINI_BASE_URL.
+
+    Pass api_key=None and send the key in an x-goog-api-key header to
+    keep it out of URLs quoted in error messages.
+    """
+    url = f"{GEMINI_BASE_URL}/{version}/models/{model}:{method}"
+    return f"{url}?key={api_key}" if api_key else url
+
+
+def _chunk_text(event):
+    candidates = event.get("candidates") or [{}]
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+def stream_generate(prompt, api_key, on_text=None, client=None, timeout=60, name="gemini_stream"):
+    """Generate a response with streamGenerateContent, passing each text chunk to on_text.
+
+    Returns (text, generation) where generation holds ttfb_seconds (first
+    response byte), first_text_seconds, total_seconds, chunks and
+    complete. If the stream breaks off, the text received so far is
+    returned with complete=False and the error. Raises RuntimeError when
+    the API rejects the request before anything is streamed.
+    """
+    from http_client import get_client
+
+    url = gemini_url(None, method='streamGenerateContent') + "?alt=sse"
+    payload = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+    generation = {"ttfb_seconds": None, "first_text_seconds": None, "total_seconds": None,
+                  "chunks": 0, "complete": False}
+
+    start = time.perf_counter()
+    # The read timeout applies between chunks, so a stalled stream is detected
+    response = (client or get_client()).post(
+        url, name=name, headers={"x-goog-api-key": api_key}, json=payload, timeout=timeout, stream=True
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.status_code}: {response.text}")
+
+    text = []
+    try:
+        for line in response.iter_lines(chunk_size=None):
+            if generation["ttfb_seconds"] is None:
+                generation["ttfb_seconds"] = round(time.perf_counter() - start, 3)
+            if not line.startswith(b"data:"):
+                continue
+            chunk = _chunk_text(json.loads(line[5:]))
+            if not chunk:
+                continue
+            if generation["first_text_seconds"] is None:
+                generation["first_text_seconds"] = round(time.perf_counter() - start, 3)
+            generation["chunks"] += 1
+            text.append(chunk)
+            if on_text:
+                on_text(chunk)
+        generation["complete"] = True
+    except Exception as e:
+        generation["error"] = str(e)
+    finally:
+        response.close()
+        generation["total_seconds"] = round(time.perf_counter() - start, 3)
+    return "".join(text), generation
+
+
+def format_generation(generation):
+    """One-line summary of a streamed generation's timings"""
+    line = (
+        f"Gemini stream: first byte {generation['ttfb_seconds']}s, first text {generation['first_text_seconds']}s, "
+        f"total {generation['total_seconds']}s, {generation['chunks']} chunk(s)"
+    )
+    if not generation["complete"]:
+        line += f" - incomplete: {generation.get('error')}"
+    return line
+
+
+class TextStream:
+    """Callable that writes streamed text to stdout and open files, flushing every chunk"""
+
+    def __init__(self, *files, echo=True):
+        self.files = [f for f in files if f is not None]
+        self.echo = echo
+
+    def __call__(self, chunk):
+        for f in self.files:
+            f.write(chunk)
+            f.flush()
+        if self.echo:
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+
+
+class RateLimiter:
+    """Thread-safe token bucket: `rate_per_minute` requests, bursts of up to `burst`"""
+
+    def __init__(self, rate_per_minute=GEMINI_REQUESTS_PER_MINUTE, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst or max(1, int(rate_per_minute / 10))
+        self.waited = 0.0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent; returns the seconds waited"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Going negative reserves a future slot, so waiters are served in order
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+class GeminiBatchAnalyzer:
+    """Analyze many repositories with batched, structured-output Gemini calls"""
+
+    def __init__(self, api_key, model=GEMINI_MODEL, batch_size=GEMINI_BATCH_SIZE,
+                 token_budget=DEFAULT_TOKEN_BUDGET, concurrency=GEMINI_BATCH_CONCURRENCY,
+                 rate_limiter=None, client=None, cache=None, timeout=120):
+        from http_client import get_client
+
+        self.api_key = api_key
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.token_budget = token_budget
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.client = client or get_client()
+        self.cache = cache
+        self.timeout = timeout
+        self.stats = {"repos": 0, "cached": 0, "requests": 0, "failed_requests": 0,
+                      "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0, "seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def pack(self, items, batch_size=None):
+        """Group (repo, summary line) items into batches by count and token budget"""
+        batch_size = batch_size or self.batch_size
+        overhead = estimate_tokens(BATCH_PROMPT_HEADER) + 16
+        batches = []
+        batch = []
+        tokens = overhead
+        for item in items:
+            item_tokens = estimate_tokens(item[1]) + 1
+            if batch and (len(batch) >= batch_size or tokens + item_tokens > self.token_budget):
+                batches.append(batch)
+                batch = []
+                tokens = overhead
+            batch.append(item)
+            tokens += item_tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _request(self, batch):
+        """One generateContent call for a batch; returns (entries by repo, usage, seconds)"""
+        prompt = BATCH_PROMPT_HEADER.format(count=len(batch)) + "\n".join(line for _, line in batch)
+        payload = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": {
+                "responseMimeType": "application/json",
+                "responseSchema": BATCH_RESPONSE_SCHEMA,
+            }
+        }
+        self.rate_limiter.acquire()
+        start = time.perf_counter()
+        # responseSchema is only accepted by the v1beta endpoint
+        response = self.client.post(
+            gemini_url(None, model=self.model, version='v1beta'),
+            name="gemini_batch_generate", headers={"x-goog-api-key": self.api_key}, json=payload, timeout=self.timeout
+        )
+        seconds = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f"AI API Error {response.status_code}: {response.text[:200]}")
+
+        body = response.json()
+        text = body["candidates"][0]["content"]["parts"][0]["text"]
+        entries = {}
+        for entry in json.loads(text):
+            if isinstance(entry, dict) and entry.get("repo"):
+                entries[entry["repo"]] = {field: entry.get(field) for field in ANALYSIS_FIELDS}
+
+        usage = body.get("usageMetadata", {})
+        usage = {
+            "input_tokens": usage.get("promptTokenCount", estimate_tokens(prompt)),
+            "output_tokens": usage.get("candidatesTokenCount", estimate_tokens(text)) + usage.get("thoughtsTokenCount", 0)
+        }
+        return entries, usage, seconds
+
+    def _run_batch(self, batch):
+        try:
+            entries, usage, seconds = self._request(batch)
+        except Exception as e:
+            with self._lock:
+                self.stats["requests"] += 1
+                self.stats["failed_requests"] += 1
+            return {}, str(e)
+
+        # Input tokens are shared by prompt size, output tokens by answer size
+        input_weights = {repo: estimate_tokens(line) for repo, line in batch}
+        output_weights = {repo: len(compact_json(entries[repo])) for repo, _ in batch if repo in entries}
+        input_total = sum(input_weights.values()) or 1
+        output_total = sum(output_weights.values()) or 1
+
+        results = {}
+        for repo, _ in batch:
+            if repo not in entries:
+                continue
+            input_tokens = usage["input_tokens"] * input_weights[repo] / input_total
+            output_tokens = usage["output_tokens"] * output_weights[repo] / output_total
+            results[repo] = {
+                "analysis": entries[repo],
+                "input_tokens": round(input_tokens),
+                "output_tokens": round(output_tokens),
+                "cost_usd": round((input_tokens * GEMINI_INPUT_PRICE + output_tokens * GEMINI_OUTPUT_PRICE) / 1e6, 6),
+                "latency_seconds": round(seconds, 3),
+                "batch_size": len(batch),
+                "cached": False
+            }
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["input_tokens"] += usage["input_tokens"]
+            self.stats["output_tokens"] += usage["output_tokens"]
+            self.stats["cost_usd"] += (
+                usage["input_tokens"] * GEMINI_INPUT_PRICE + usage["output_tokens"] * GEMINI_OUTPUT_PRICE
+            ) / 1e6
+        return results, None if len(results) == len(batch) else "missing from batch response"
+
+    def analyze(self, summaries):
+        """Analyze {repo: condensed summary dict}.
+
+        Returns {repo: result} where result holds "analysis" (dict of
+        ANALYSIS_FIELDS, or None with an "error") and the repo's share
+        of tokens, cost and request latency.
+        """
+        start = time.perf_counter()
+        results = {}
+        keys = {}
+        pending = []
+        for repo, summary in summaries.items():
+            line = compact_json({"repo": repo, **summary})
+            keys[repo] = cache_key(BATCH_PROMPT_VERSION, self.model, line)
+            cached = self.cache.get(keys[repo]) if self.cache is not None else None
+            if cached is not None:
+                results[repo] = {"analysis": cached, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+                                 "latency_seconds": 0.0, "batch_size": 0, "cached": True}
+            else:
+                pending.append((repo, line))
+
+        batch_size = self.batch_size
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while pending:
+                batches = self.pack(pending, batch_size)
+                retry = []
+                for batch, (batch_results, error) in zip(batches, pool.map(self._run_batch, batches)):
+                    results.update(batch_results)
+                    for repo, line in batch:
+                        if repo in batch_results:
+                            continue
+                        if len(batch) > 1:
+                            retry.append((repo, line))
+                        else:
+                            results[repo] = {"analysis": None, "error": error, "input_tokens": 0, "output_tokens": 0,
+                                             "cost_usd": 0.0, "latency_seconds": 0.0, "batch_size": 1, "cached": False}
+                # Smaller batches isolate whatever made the model fail or drop entries
+                pending = retry
+                batch_size = max(1, batch_size // 2)
+
+        if self.cache is not None:
+            for repo, result in results.items():
+                if result["analysis"] is not None and not result["cached"]:
+                    self.cache.put(keys[repo], result["analysis"])
+
+        self.stats["repos"] += len(summaries)
+        self.stats["cached"] += sum(1 for r in results.values() if r["cached"])
+        self.stats["seconds"] += time.perf_counter() - start
+        return {repo: results[repo] for repo in summaries}
+
+    def format_stats(self):
+        s = self.stats
+        return (
+            f"Gemini batches: {s['repos']} repo(s) in {s['requests']} request(s) "
+            f"({s['failed_requests']} failed, {s['cached']} cached), "
+            f"{s['input_tokens']} in / {s['output_tokens']} out tokens, ${s['cost_usd']:.4f}, "
+            f"{s['seconds']:.1f}s, {self.rate_limiter.waited:.1f}s rate-limited"
+        )
@@ -4,15 +4,42 @@ Test Data Generator for S3 Security Reports
 This script generates realistic historical security scan data for demo purposes.
 It creates 30 days of fake reports with realistic vulnerability patterns and trends.
 
+With --load it instead generates capacity-test data for any number of repos,
+days, runs per day and findings per run. Findings are sampled in bulk from
+pre-rendered JSON fragments with a seeded NumPy generator, so the same seed
+always produces the same bytes, and each report is streamed out in chunks.
+
+--format jsonl.gz stores reports as gzip-compressed JSON Lines with one
+finding per line (see report_format.py) instead of pretty-printed JSON.
+
 ⚠️ FOR DEMO ONLY - Do not include in production deployment
 """
 
+import argparse
+import gzip
 import json
 import boto3
 import random
-from datetime import datetime, timedelta
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import os
 
+import numpy as np
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from report_format import CONTENT_TYPES, GZIP_LEVEL, REPORT_FORMAT, REPORT_FORMATS, encode_report, report_filename
+
+# Parallel puts; one shared client is sized to match
+UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '16'))
+UPLOAD_MAX_RETRIES = 5
+# S3 error codes that mean "slow down and try again"
+THROTTLE_CODES = {'SlowDown', 'Throttling', 'ThrottlingException', 'RequestLimitExceeded',
+                  'TooManyRequestsException', 'ServiceUnavailable', 'RequestTimeout'}
+
 # Realistic CVE database
 CRITICAL_CVES = [
     {"id": "CVE-2023-44487", "pkg": "netty", "title": "HTTP/2 Rapid Reset Attack", "fix": "4.1.100.Final"},
@@ -212,9 +239,10 @@ def generate_snyk_report(day_number):
     }
 
 
-def generate_metadata(day_number, date):
+def generate_metadata(day_number, date, fmt='json'):
     """Generate metadata file"""
     date_path = date.strftime('%Y/%m/%d')
+    run_path = f"{date_path}/run-{day_number:03d}"
     return {
         "run_id": f"{day_number:03d}",
         "commit_sha": f"abc{random.randint(100000, 999999)}def",
@@ -225,53 +253,425 @@ def generate_metadata(day_number, date):
         "event": "workflow_dispatch",
         "generated": True,
         "reports": {
-            "trivy": f"trivy/{date_path}/run-{day_number:03d}/trivy-report.json",
-            "snyk": f"snyk/{date_path}/run-{day_number:03d}/snyk-report.json",
-            "gitleaks": f"gitleaks/{date_path}/run-{day_number:03d}/gitleaks-report.json"
+            "trivy": f"trivy/{run_path}/{report_filename('trivy-report.json', fmt)}",
+            "snyk": f"snyk/{run_path}/{report_filename('snyk-report.json', fmt)}",
+            "gitleaks": f"gitleaks/{run_path}/{report_filename('gitleaks-report.json', fmt)}"
         }
     }
 
-def upload_to_s3(bucket_name, date, run_number, reports):
-    """Upload generated reports to S3 in structured folders"""
-    s3 = boto3.client('s3')
-    date_path = date.strftime('%Y/%m/%d')
+# Map report types to their dedicated subfolders
+REPORT_FOLDERS = {
+    "trivy-report.json": "trivy",
+    "gitleaks-report.json": "gitleaks",
+    "snyk-report.json": "snyk",
+    "metadata.json": "metadata"
+}
+
+def report_key(date, run_number, filename, fmt='json'):
+    """Object key of a report: <type>/YYYY/MM/DD/run-NNN/<file>, named for its storage format"""
+    type_folder = REPORT_FOLDERS.get(filename, "other")
+    return f"{type_folder}/{date.strftime('%Y/%m/%d')}/run-{run_number:03d}/{report_filename(filename, fmt)}"
+
+class S3Sink:
+    """Puts objects into a bucket through one shared, thread-safe client"""
     
-    # Map report types to their dedicated subfolders
-    type_map = {
-        "trivy-report.json": "trivy",
-        "gitleaks-report.json": "gitleaks",
-        "snyk-report.json": "snyk",
-        "metadata.json": "metadata"
-    }
+    def __init__(self, bucket_name, client=None, pool_size=UPLOAD_CONCURRENCY):
+        self.bucket_name = bucket_name
+        self.location = f"s3://{bucket_name}"
+        # Retries are done by BulkUploader so throttling shows up in its counters
+        self.s3 = client or boto3.client('s3', config=Config(
+            max_pool_connections=pool_size, retries={'mode': 'standard', 'max_attempts': 1}
+        ))
     
-    for filename, content in reports.items():
-        type_folder = type_map.get(filename, "other")
-        s3_key = f"{type_folder}/{date_path}/run-{run_number:03d}/{filename}"
-        
+    def put(self, key, body, content_type):
+        self.s3.put_object(Bucket=self.bucket_name, Key=key, Body=body, ContentType=content_type)
+
+class DirectorySink:
+    """Writes objects as files under a local directory, e.g. for offline runs and tests"""
+    
+    def __init__(self, directory):
+        self.directory = directory
+        self.location = directory
+    
+    def put(self, key, body, content_type):
+        path = os.path.join(self.directory, *key.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(body)
+
+class BulkUploader:
+    """Uploads objects to a sink on a bounded thread pool.
+    
+    At most `concurrency` puts run at once and at most twice that many
+    bodies wait in memory, so submit() blocks instead of buffering a
+    whole dataset. Throttled puts are retried with exponential backoff
+    and full jitter; counters give objects/sec and bytes/sec.
+    """
+    
+    def __init__(self, sink, concurrency=UPLOAD_CONCURRENCY, max_retries=UPLOAD_MAX_RETRIES,
+                 backoff_base=0.2, backoff_max=10.0):
+        self.sink = sink
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats = {"objects": 0, "bytes": 0, "retries": 0, "failed": 0, "seconds": 0.0}
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        self._slots = threading.BoundedSemaphore(self.concurrency * 2)
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+    
+    def _put(self, key, body, content_type):
         try:
-            s3.put_object(
-                Bucket=bucket_name,
-                Key=s3_key,
-                Body=json.dumps(content, indent=2),
-                ContentType='application/json'
-            )
+            for attempt in range(self.max_retries + 1):
+                try:
+                    self.sink.put(key, body, content_type)
+                    break
+                except ClientError as e:
+                    error = e.response.get('Error', {})
+                    status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+                    throttled = error.get('Code') in THROTTLE_CODES or status in (429, 503)
+                    if not throttled or attempt >= self.max_retries:
+                        raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+            with self._lock:
+                self.stats["objects"] += 1
+                self.stats["bytes"] += len(body)
         except Exception as e:
-            print(f"⚠️ Failed to upload {filename}: {e}")
+            with self._lock:
+                self.stats["failed"] += 1
+            print(f"⚠️ Failed to upload {key}: {e}")
+        finally:
+            self._slots.release()
+    
+    def submit(self, key, body, content_type='application/json'):
+        """Queue one object; blocks while the pool is saturated"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self._slots.acquire()
+        self._pool.submit(self._put, key, body, content_type)
+    
+    def close(self):
+        """Wait for every queued upload and return the counters"""
+        self._pool.shutdown(wait=True)
+        self.stats["seconds"] = round(time.perf_counter() - self._started, 3)
+        return self.stats
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def format_stats(self):
+        s = self.stats
+        seconds = s["seconds"] or (time.perf_counter() - self._started)
+        return (
+            f"{s['objects']} objects, {s['bytes'] / (1024 * 1024):.1f} MB in {seconds:.1f}s "
+            f"({s['objects'] / seconds if seconds else 0:.0f} objects/s, "
+            f"{s['bytes'] / (1024 * 1024) / seconds if seconds else 0:.1f} MB/s) "
+            f"with {self.concurrency} workers, {s['retries']} throttling retries, {s['failed']} failed"
+        )
+
+def upload_reports(uploader, date, run_number, reports, fmt=REPORT_FORMAT):
+    """Queue one run's reports on a BulkUploader; returns without waiting for the puts"""
+    for filename, content in reports.items():
+        body, content_type = encode_report(content, REPORT_FOLDERS.get(filename), fmt)
+        uploader.submit(report_key(date, run_number, filename, fmt), body, content_type)
+
+def upload_to_s3(bucket_name, date, run_number, reports, fmt=REPORT_FORMAT):
+    """Upload generated reports to S3 in structured folders"""
+    with BulkUploader(S3Sink(bucket_name)) as uploader:
+        upload_reports(uploader, date, run_number, reports, fmt)
+
+def save_to_directory(directory, date, run_number, reports, fmt=REPORT_FORMAT):
+    """Write generated reports to a local directory using the same layout as S3"""
+    sink = DirectorySink(directory)
+    for filename, content in reports.items():
+        body, content_type = encode_report(content, REPORT_FOLDERS.get(filename), fmt)
+        sink.put(report_key(date, run_number, filename, fmt), body, content_type)
+
+# Load mode: findings are drawn from pools of pre-rendered JSON fragments
+LOAD_POOL_SIZE = 8192
+# Findings joined per chunk; bounds memory however large a report is
+LOAD_CHUNK_FINDINGS = 20000
+LOAD_SEVERITY_MIX = (("CRITICAL", 0.05), ("HIGH", 0.25), ("MEDIUM", 0.40), ("LOW", 0.30))
+LOAD_PACKAGES = ["commons-lang", "guava", "slf4j", "jackson-databind", "netty", "spring-core",
+                 "commons-io", "bouncy-castle", "snakeyaml", "tomcat-embed-core", "h2", "postgresql"]
+SNYK_PACKAGES = ['lodash', 'axios', 'express', 'moment', 'react']
+
+def _compact(obj):
+    return json.dumps(obj, separators=(',', ':'))
+
+def build_load_pools(seed):
+    """Pre-rendered finding fragments per report type; the severity mix is baked into each pool"""
+    rng = random.Random(seed)
+    named = {"CRITICAL": CRITICAL_CVES, "HIGH": HIGH_CVES, "MEDIUM": MEDIUM_CVES, "LOW": []}
+    trivy, snyk = [], []
+    for severity, share in LOAD_SEVERITY_MIX:
+        for i in range(int(LOAD_POOL_SIZE * share)):
+            catalog = named[severity]
+            # A quarter of each severity are the well-known CVEs, the rest spread the distinct counts
+            if catalog and i % 4 == 0:
+                cve = catalog[(i // 4) % len(catalog)]
+            else:
+                pkg = rng.choice(LOAD_PACKAGES)
+                cve = {"id": f"CVE-{rng.randint(2019, 2025)}-{rng.randint(10000, 99999)}", "pkg": pkg,
+                       "title": f"{severity.capitalize()} severity issue in {pkg}",
+                       "fix": f"{rng.randint(1, 9)}.{rng.randint(0, 20)}.{rng.randint(0, 10)}"}
+            trivy.append(_compact({
+                "VulnerabilityID": cve["id"],
+                "PkgName": cve["pkg"],
+                "InstalledVersion": "1.0.0",
+                "FixedVersion": cve["fix"],
+                "Severity": severity,
+                "Title": cve["title"],
+                "Description": f"{severity.capitalize()} security vulnerability in {cve['pkg']}",
+                "PrimaryURL": f"https://nvd.nist.gov/vuln/detail/{cve['id']}"
+            }))
+            pkg = rng.choice(SNYK_PACKAGES)
+            snyk.append(_compact({
+                "id": f"SNYK-JS-{pkg.upper()}-{rng.randint(100000, 999999)}",
+                "title": f"{severity.capitalize()} severity vulnerability in {pkg}",
+                "severity": severity.lower(),
+                "packageName": pkg,
+                "version": f"{rng.randint(1, 5)}.{rng.randint(0, 20)}.{rng.randint(0, 10)}",
+                "fixedIn": [f"{rng.randint(2, 6)}.{rng.randint(0, 20)}.{rng.randint(0, 10)}"],
+                "cvssScore": round(rng.uniform(4.0, 9.5), 1)
+            }))
+    gitleaks = []
+    for i in range(LOAD_POOL_SIZE // 8):
+        secret_type = SECRET_TYPES[i % len(SECRET_TYPES)]
+        gitleaks.append(_compact({
+            "Description": secret_type["desc"],
+            "StartLine": rng.randint(10, 200),
+            "File": secret_type["file"],
+            "Commit": f"{rng.getrandbits(40):010x}",
+            "Entropy": round(rng.uniform(3.5, 5.5), 2),
+            "Author": rng.choice(["john.doe", "jane.smith", "dev.user"]),
+            "RuleID": secret_type["rule"],
+            "Fingerprint": f"fp{rng.randint(100000, 999999)}"
+        }))
+    return {name: np.array(pool, dtype=object) for name, pool in
+            (("trivy", trivy), ("snyk", snyk), ("gitleaks", gitleaks))}
+
+PERSISTENT_CRITICAL = _compact({
+    "VulnerabilityID": "CVE-2021-44228",
+    "PkgName": "log4j-core",
+    "InstalledVersion": "2.14.1",
+    "FixedVersion": "2.17.1",
+    "Severity": "CRITICAL",
+    "Title": "Apache Log4j2 Remote Code Execution (Log4Shell)",
+    "Description": "Apache Log4j2 <=2.14.1 JNDI features do not protect against attacker controlled LDAP endpoints.",
+    "PrimaryURL": "https://nvd.nist.gov/vuln/detail/CVE-2021-44228"
+})
+
+class LoadGenerator:
+    """Deterministic reports for repos x days x runs_per_day, ~`findings` Trivy findings per run.
+    
+    Every run draws from its own generator seeded with (seed, repo, day,
+    run), so output does not depend on order or on which subset is
+    generated. Counts grow ~50% over the window to give the trend queries
+    a slope. With more than one repo, keys are prefixed with repo-NNN/.
+    JSON Lines formats emit one finding per line, wrapped like
+    report_format.split_report does.
+    """
+    
+    def __init__(self, repos=1, days=30, runs_per_day=1, findings=1000, seed=42, end_date=None, fmt='json'):
+        self.repos = repos
+        self.days = days
+        self.runs_per_day = runs_per_day
+        self.findings = findings
+        self.seed = seed
+        self.end_date = end_date or date.today()
+        self.fmt = fmt
+        self.lines = fmt != 'json'
+        self.pools = build_load_pools(seed)
+        self.stats = {"objects": 0, "findings": 0, "bytes": 0}
+    
+    def repo_name(self, repo):
+        return f"repo-{repo + 1:0{max(3, len(str(self.repos)))}d}"
+    
+    def _array(self, rng, pool, count, first=None):
+        """A JSON array of `count` pool samples (after `first`), LOAD_CHUNK_FINDINGS at a time"""
+        yield "[" + (first or "")
+        separator = "," if first else ""
+        for start in range(0, count, LOAD_CHUNK_FINDINGS):
+            idx = rng.integers(0, len(pool), size=min(LOAD_CHUNK_FINDINGS, count - start))
+            yield separator + ",".join(pool[idx].tolist())
+            separator = ","
+        yield "]"
+        self.stats["findings"] += count + (1 if first else 0)
+    
+    def _lines(self, rng, pool, count, first=None, head="", tail=""):
+        """JSON Lines of `count` pool samples (after `first`), each wrapped in head/tail"""
+        separator = tail + "\n" + head
+        if first:
+            yield head + first + tail + "\n"
+        for start in range(0, count, LOAD_CHUNK_FINDINGS):
+            idx = rng.integers(0, len(pool), size=min(LOAD_CHUNK_FINDINGS, count - start))
+            yield head + separator.join(pool[idx].tolist()) + tail + "\n"
+        self.stats["findings"] += count + (1 if first else 0)
+    
+    def _findings(self, rng, pool, count, first=None, head="", tail=""):
+        if self.lines:
+            return self._lines(rng, pool, count, first, head + "[", "]" + tail)
+        return itertools.chain([head], self._array(rng, pool, count, first), [tail])
+    
+    def _trivy(self, rng, count):
+        head = ('{"SchemaVersion":"2.0.0","ArtifactName":"pom.xml","ArtifactType":"filesystem",'
+                '"Results":[{"Target":"pom.xml","Class":"lang-pkgs","Type":"jar","Vulnerabilities":')
+        # The persistent Log4Shell finding is in every run, as in the demo data
+        return self._findings(rng, self.pools["trivy"], count, PERSISTENT_CRITICAL, head, "}]}")
+    
+    def _snyk(self, rng, count, day):
+        fields = f'"ok":{"true" if count == 0 else "false"},"dependencyCount":{150 + day},"packageManager":"npm"'
+        if self.lines:
+            if count == 0:
+                return iter(['{' + fields + ',"vulnerabilities":[]}\n'])
+            return self._findings(rng, self.pools["snyk"], count, head='{' + fields + ',"vulnerabilities":', tail="}")
+        return self._findings(rng, self.pools["snyk"], count, head='{"vulnerabilities":', tail=',' + fields + '}')
+    
+    def _gitleaks(self, rng, count):
+        if self.lines:
+            return self._lines(rng, self.pools["gitleaks"], count)
+        return self._array(rng, self.pools["gitleaks"], count)
+    
+    def objects(self):
+        """Yield (key, chunk iterator) for every report object in repo/day/run order"""
+        start = self.end_date - timedelta(days=self.days - 1)
+        for repo in range(self.repos):
+            prefix = f"{self.repo_name(repo)}/" if self.repos > 1 else ""
+            for day in range(self.days):
+                current = start + timedelta(days=day)
+                growth = 1 + 0.5 * day / max(1, self.days - 1)
+                for run in range(self.runs_per_day):
+                    rng = np.random.default_rng([self.seed, repo, day, run])
+                    run_number = day * self.runs_per_day + run + 1
+                    vulns = max(0, int(self.findings * growth * rng.uniform(0.9, 1.1)) - 1)
+                    secrets = int(rng.poisson(self.findings * 0.005 * growth))
+                    keys = {
+                        filename: prefix + report_key(current, run_number, filename, self.fmt)
+                        for filename in REPORT_FOLDERS
+                    }
+                    metadata = _compact({
+                        "run_id": f"{run_number:03d}",
+                        "repo": self.repo_name(repo),
+                        "commit_sha": f"{int(rng.integers(1 << 40)):010x}",
+                        "branch": "main",
+                        "timestamp": f"{current.isoformat()}T{run * 24 // self.runs_per_day:02d}:00:00Z",
+                        "workflow": "Load Test",
+                        "generated": True,
+                        "reports": {REPORT_FOLDERS[f]: keys[f] for f in ("trivy-report.json", "snyk-report.json", "gitleaks-report.json")}
+                    })
+                    yield keys["trivy-report.json"], self._trivy(rng, vulns)
+                    yield keys["gitleaks-report.json"], self._gitleaks(rng, secrets)
+                    yield keys["snyk-report.json"], self._snyk(rng, vulns // 3, day)
+                    yield keys["metadata.json"], iter([metadata + "\n" if self.lines else metadata])
+
+def write_load_data(generator, directory=None, uploader=None):
+    """Stream every generated object to a directory chunk by chunk, or to a BulkUploader.
+    
+    Objects for S3 are joined one at a time before upload; the uploader
+    bounds how many wait in memory. Sizes in the stats are stored bytes,
+    i.e. after gzip for jsonl.gz.
+    """
+    made = set()
+    compress = generator.fmt.endswith('.gz')
+    for key, chunks in generator.objects():
+        if directory:
+            path = os.path.join(directory, *key.split('/'))
+            parent = os.path.dirname(path)
+            if parent not in made:
+                os.makedirs(parent, exist_ok=True)
+                made.add(parent)
+            with open(path, 'wb') as raw:
+                # mtime=0 so the same seed gives the same compressed bytes
+                out = gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0) if compress else raw
+                for chunk in chunks:
+                    out.write(chunk.encode('ascii'))
+                if compress:
+                    out.close()
+                size = raw.tell()
+        else:
+            body = "".join(chunks).encode('ascii')
+            if compress:
+                body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            size = len(body)
+            uploader.submit(key, body, CONTENT_TYPES[generator.fmt])
+        generator.stats["objects"] += 1
+        generator.stats["bytes"] += size
+    return generator.stats
+
+def generate_load(args, local_dir, bucket_name):
+    """--load: capacity-test data for many repos and long histories"""
+    end_date = date.fromisoformat(args.end_date) if args.end_date else None
+    generator = LoadGenerator(args.repos, args.days, args.runs_per_day, args.findings, args.seed, end_date, args.format)
+    runs = args.repos * args.days * args.runs_per_day
+    print(f"🏋️ Load data: {args.repos} repo(s) x {args.days} day(s) x {args.runs_per_day} run(s) = {runs} runs, "
+          f"~{args.findings} findings per run, seed {args.seed}, format {args.format}")
+    
+    start = time.perf_counter()
+    if local_dir:
+        print(f"📁 Target Directory: {local_dir}")
+        stats = write_load_data(generator, directory=local_dir)
+    else:
+        print(f"📦 Target S3 Bucket: {bucket_name}")
+        uploader = BulkUploader(S3Sink(bucket_name, pool_size=args.concurrency), concurrency=args.concurrency)
+        stats = write_load_data(generator, uploader=uploader)
+        uploader.close()
+        print(f"📤 {uploader.format_stats()}")
+    seconds = time.perf_counter() - start
+    
+    print(
+        f"✅ {stats['objects']} objects, {stats['findings']:,} findings, {stats['bytes'] / (1024 * 1024):.1f} MB "
+        f"in {seconds:.1f}s ({stats['findings'] / seconds * 60 / 1e6:.1f}M findings/min, "
+        f"{stats['bytes'] / (1024 * 1024) / seconds:.1f} MB/s)"
+    )
 
 def main():
-    print("🎭 Test Data Generator - Creating 30 Days of Demo Data")
-    print("=" * 60)
+    parser = argparse.ArgumentParser(description="Generate demo or load-test security reports")
+    parser.add_argument('--load', action='store_true', help="Generate capacity-test data instead of the 30-day demo")
+    parser.add_argument('--repos', type=int, default=1, help="Repositories (--load)")
+    parser.add_argument('--days', type=int, default=30, help="Days of history (--load)")
+    parser.add_argument('--runs-per-day', type=int, default=1, help="Scan runs per day (--load)")
+    parser.add_argument('--findings', type=int, default=1000, help="Trivy findings per run (--load)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (--load)")
+    parser.add_argument('--end-date', help="Last day generated, YYYY-MM-DD (--load, default today)")
+    parser.add_argument('--concurrency', type=int, default=UPLOAD_CONCURRENCY, help="Parallel S3 uploads (--load)")
+    parser.add_argument('--format', choices=REPORT_FORMATS, default=REPORT_FORMAT,
+                        help="Report storage format; jsonl.gz is compact gzip JSON Lines, one finding per line")
+    args = parser.parse_args()
     
-    # Get S3 bucket name
+    # LOCAL_REPORTS_DIR writes the same layout to disk for offline use
+    local_dir = os.getenv('LOCAL_REPORTS_DIR')
     bucket_name = os.getenv('S3_SECURITY_REPORTS_BUCKET')
-    if not bucket_name:
+    if not bucket_name and not local_dir:
         print("❌ Error: S3_SECURITY_REPORTS_BUCKET environment variable not set")
         print("   Set it to your S3 bucket name from Terraform output")
+        print("   (or set LOCAL_REPORTS_DIR to write the reports to a local directory)")
         return
     
-    print(f"📦 Target S3 Bucket: {bucket_name}")
+    if args.load:
+        generate_load(args, local_dir, bucket_name)
+        return
+    
+    print("🎭 Test Data Generator - Creating 30 Days of Demo Data")
+    print("=" * 60)
+    
+    if local_dir:
+        print(f"📁 Target Directory: {local_dir}")
+    else:
+        print(f"📦 Target S3 Bucket: {bucket_name}")
+    print(f"🗂️ Report format: {args.format}")
     print(f"📅 Generating 30 days of historical data...\n")
     
+    # One uploader for the whole run: a shared client and a bounded pool of puts
+    sink = DirectorySink(local_dir) if local_dir else S3Sink(bucket_name)
+    uploader = BulkUploader(sink)
+    
     # Generate data for last 30 days
     start_date = datetime.now() - timedelta(days=30)
     
@@ -285,7 +685,7 @@ def main():
         trivy_report = generate_trivy_report(day)
         gitleaks_report = generate_gitleaks_report(day)
         snyk_report = generate_snyk_report(day)
-        metadata = generate_metadata(run_number, current_date)
+        metadata = generate_metadata(run_number, current_date, args.format)
         
         reports = {
             "trivy-report.json": trivy_report,
@@ -294,14 +694,17 @@ def main():
             "metadata.json": metadata
         }
         
-        # Upload to S3
-        upload_to_s3(bucket_name, current_date, run_number, reports)
+        # Upload to S3 (or write locally); puts run in the background
+        upload_reports(uploader, current_date, run_number, reports, args.format)
         
         # Show summary
         vuln_count = len(trivy_report['Results'][0]['Vulnerabilities'])
         secret_count = len(gitleaks_report)
         print(f"✅ {vuln_count} vulns, {secret_count} secrets")
     
+    uploader.close()
+    print(f"\n📤 Uploaded to {sink.location}: {uploader.format_stats()}")
+    
     print("\n" + "=" * 60)
     print("🎉 Test data generation complete!")
     print("\nNext steps:")
@@ -0,0 +1,148 @@
+"""
+Shared HTTP Client
+
+Pooled, keep-alive HTTP session used by the security scripts for the
+Gemini and SonarQube APIs. Retries 429/5xx responses and connection
+errors with bounded exponential backoff and full jitter, honours
+Retry-After, and keeps per-call latency/retry counters. A read timeout
+is only retried for idempotent methods: a timed-out POST may still be
+running (and billed) on the server.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods that are safe to resend after the server may already have acted on them
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class HttpClient:
+    """requests.Session wrapper with connection pooling and retry/backoff"""
+
+    def __init__(self, max_retries=3, backoff_base=0.5, backoff_max=30.0,
+                 pool_size=10, timeout=60):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        # Retries are handled here so Retry-After and the counters see every attempt
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        """Seconds to wait from a Retry-After header, or None"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                when = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            if when.tzinfo is None:
+                when = when.replace(tzinfo=timezone.utc)
+            seconds = (when - datetime.now(timezone.utc)).total_seconds()
+        return min(self.backoff_max, max(0.0, seconds))
+
+    def _record(self, name, retries, seconds, failed):
+        with self._lock:
+            entry = self.stats.setdefault(name, {
+                "calls": 0, "retries": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0
+            })
+            entry["calls"] += 1
+            entry["retries"] += retries
+            entry["errors"] += 1 if failed else 0
+            entry["seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+
+    def request(self, method, url, name=None, **kwargs):
+        """Send a request, retrying 429/5xx and connection errors.
+
+        Read timeouts are retried only for IDEMPOTENT_METHODS.
+
+        ``name`` labels the call in the stats; it defaults to the URL path so
+        query strings (and API keys in them) never end up in the counters.
+        """
+        name = name or requests.utils.urlparse(url).path
+        kwargs.setdefault('timeout', self.timeout)
+        # ConnectTimeout is a ConnectionError, ReadTimeout is not
+        retry_errors = (
+            (requests.ConnectionError, requests.Timeout) if method.upper() in IDEMPOTENT_METHODS
+            else requests.ConnectionError
+        )
+
+        attempt = 0
+        failed = True
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except retry_errors:
+                    if attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt)
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        failed = response.status_code >= 400
+                        return response
+                    delay = self._retry_after(response)
+                    if delay is None:
+                        delay = self._backoff(attempt)
+                    response.close()
+                attempt += 1
+                time.sleep(delay)
+        finally:
+            self._record(name, attempt, time.perf_counter() - start, failed)
+
+    def get(self, url, name=None, **kwargs):
+        return self.request('GET', url, name=name, **kwargs)
+
+    def post(self, url, name=None, **kwargs):
+        return self.request('POST', url, name=name, **kwargs)
+
+    def format_stats(self):
+        """Markdown table of per-call counters"""
+        lines = [
+            "| Call | Calls | Retries | Errors | Avg (s) | Max (s) |",
+            "|------|-------|---------|--------|---------|---------|"
+        ]
+        with self._lock:
+            for name, s in sorted(self.stats.items()):
+                avg = s["seconds"] / s["calls"] if s["calls"] else 0
+                lines.append(
+                    f"| {name} | {s['calls']} | {s['retries']} | {s['errors']} "
+                    f"| {avg:.2f} | {s['max_seconds']:.2f} |"
+                )
+        return "\n".join(lines) + "\n"
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide shared client so every call reuses the same connection pool"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
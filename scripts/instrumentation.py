@@ -0,0 +1,281 @@
+"""
+Stage Instrumentation
+
+Lightweight spans for the analysis scripts. Each stage runs inside
+``get_tracer().span(name)`` and records wall time, counters such as
+findings parsed or bytes scanned, and optionally the peak traced memory
+(tracemalloc) while it was open. finish() writes the spans as a JSON trace and
+appends a stage table to GITHUB_STEP_SUMMARY.
+
+Spans opened on a worker thread have no parent unless one is passed
+explicitly. Tracing memory slows allocation-heavy stages such as
+report parsing several times over, so it is off unless TRACE_MEMORY=1;
+tracemalloc is process-wide, so a span's peak includes allocations made
+by other threads while it was open. TRACE_ENABLED=0 turns spans off.
+
+When OTEL_EXPORTER_OTLP_ENDPOINT is set and the OpenTelemetry SDK is
+installed, the spans are also exported over OTLP/HTTP, e.g. to a local
+collector on http://localhost:4318.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', '1') != '0'
+TRACE_MEMORY = os.getenv('TRACE_MEMORY', '0') != '0'
+TRACE_FILE = os.getenv('TRACE_FILE')
+OTLP_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')
+
+
+class Span:
+    """One timed stage; counters add up, attributes keep the last value set"""
+
+    __slots__ = ("span_id", "parent", "name", "thread", "started", "seconds",
+                 "peak_bytes", "counters", "attributes", "error")
+
+    def __init__(self, span_id, name, parent=None, attributes=None):
+        self.span_id = span_id
+        self.parent = parent
+        self.name = name
+        self.thread = threading.current_thread().name
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.peak_bytes = None
+        self.counters = {}
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def count(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def depth(self):
+        depth, parent = 0, self.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        return depth
+
+
+class _NullSpan:
+    def count(self, key, n=1):
+        pass
+
+    def set(self, key, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects spans for one script run"""
+
+    def __init__(self, service, enabled=TRACE_ENABLED, memory=TRACE_MEMORY):
+        self.service = service
+        self.enabled = enabled
+        self.memory = memory and enabled
+        self.spans = []
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._next_id = 1
+        self._open = set()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self):
+        """Innermost open span on this thread, or None"""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _observe_peak(self):
+        # Called with the lock held: fold the peak since the last reset into every open span
+        peak = tracemalloc.get_traced_memory()[1]
+        for span in self._open:
+            span.peak_bytes = max(span.peak_bytes or 0, peak)
+
+    @contextmanager
+    def span(self, name, parent=None, **attributes):
+        """Time a stage; yields the Span so the stage can add counters"""
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        with self._lock:
+            span = Span(self._next_id, name, parent or self.current(), attributes)
+            self._next_id += 1
+            if self.memory:
+                self._observe_peak()
+                tracemalloc.reset_peak()
+                span.peak_bytes = tracemalloc.get_traced_memory()[0]
+                self._open.add(span)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            with self._lock:
+                if self.memory:
+                    self._observe_peak()
+                    self._open.discard(span)
+                span.seconds = time.perf_counter() - span.started
+                self.spans.append(span)
+
+    def record(self, name, started, seconds=None, parent=None, counters=None, attributes=None, error=None):
+        """Add a span timed elsewhere, e.g. an Athena query: from `started` (a perf_counter value)
+        for `seconds`, or until now"""
+        if not self.enabled:
+            return
+        with self._lock:
+            span = Span(self._next_id, name, parent or self.current(), attributes)
+            self._next_id += 1
+            span.started = started
+            span.seconds = time.perf_counter() - started if seconds is None else seconds
+            span.counters.update(counters or {})
+            span.error = error
+            self.spans.append(span)
+
+    def count(self, key, n=1):
+        """Add to a counter on the innermost open span of this thread"""
+        span = self.current()
+        if span is not None:
+            span.count(key, n)
+
+    def _ordered(self):
+        with self._lock:
+            return sorted(self.spans, key=lambda s: (s.started, s.span_id))
+
+    def to_dict(self):
+        spans = []
+        for s in self._ordered():
+            spans.append({
+                "id": s.span_id,
+                "parent": s.parent.span_id if s.parent else None,
+                "name": s.name,
+                "thread": s.thread,
+                "start_seconds": round(s.started - self._started, 4),
+                "seconds": round(s.seconds, 4),
+                "peak_memory_mb": None if s.peak_bytes is None else round(s.peak_bytes / (1024 * 1024), 2),
+                "counters": s.counters,
+                "attributes": s.attributes,
+                "error": s.error
+            })
+        return {
+            "service": self.service,
+            "started_at": self.started_at.isoformat(),
+            "seconds": round(time.perf_counter() - self._started, 4),
+            "memory_traced": self.memory,
+            "spans": spans
+        }
+
+    def format_table(self):
+        """Markdown table of stages in start order, nested stages indented; peak memory only when traced"""
+        lines = [
+            "| Stage | Time (s) |" + (" Peak memory (MB) |" if self.memory else "") + " Counters |",
+            "|-------|----------|" + ("------------------|" if self.memory else "") + "----------|"
+        ]
+        for s in self._ordered():
+            name = "&nbsp;&nbsp;" * s.depth() + s.name + (" ❌" if s.error else "")
+            peak = "" if s.peak_bytes is None else f"{s.peak_bytes / (1024 * 1024):.1f}"
+            counters = ", ".join(f"{key}={value:,}" for key, value in s.counters.items())
+            lines.append(f"| {name} | {s.seconds:.3f} |" + (f" {peak} |" if self.memory else "") + f" {counters} |")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def export_otlp(self):
+        """Replay the spans to an OTLP/HTTP collector; returns False if the SDK is missing"""
+        try:
+            from opentelemetry import trace
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            return False
+
+        provider = TracerProvider(resource=Resource.create({"service.name": self.service}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        otel = provider.get_tracer("bankapp.security")
+        # perf_counter offsets -> epoch nanoseconds
+        epoch_ns = int(self.started_at.timestamp() * 1e9) - int(self._started * 1e9)
+        exported = {}
+        for s in self._ordered():
+            attributes = {f"count.{key}": value for key, value in s.counters.items()}
+            attributes.update({key: value for key, value in s.attributes.items()
+                               if isinstance(value, (str, bool, int, float))})
+            if s.peak_bytes is not None:
+                attributes["memory.peak_bytes"] = s.peak_bytes
+            parent = exported.get(s.parent.span_id) if s.parent else None
+            otel_span = otel.start_span(
+                s.name,
+                context=trace.set_span_in_context(parent) if parent else None,
+                start_time=epoch_ns + int(s.started * 1e9),
+                attributes=attributes
+            )
+            if s.error:
+                otel_span.set_status(trace.Status(trace.StatusCode.ERROR, s.error))
+            otel_span.end(end_time=epoch_ns + int((s.started + s.seconds) * 1e9))
+            exported[s.span_id] = otel_span
+        provider.shutdown()
+        return True
+
+    def finish(self, summary_file=None, path=None):
+        """Write the JSON trace, the step summary table and the optional OTLP export (once)"""
+        if not self.enabled or self._finished:
+            return
+        self._finished = True
+        path = path or TRACE_FILE or f"{self.service}-trace.json"
+        try:
+            self.write(path)
+            print(f"🧭 Trace: {len(self.spans)} span(s) written to {path}")
+        except OSError as e:
+            print(f"⚠️ Could not write trace {path}: {e}")
+        if summary_file:
+            with open(summary_file, 'a', encoding='utf-8') as f:
+                f.write(f"\n### 🧭 Stage Timings ({self.service})\n\n")
+                f.write(self.format_table())
+        if OTLP_ENDPOINT:
+            try:
+                if self.export_otlp():
+                    print(f"🧭 Trace exported to {OTLP_ENDPOINT}")
+                else:
+                    print("⚠️ OpenTelemetry SDK not installed - skipping OTLP export")
+            except Exception as e:
+                print(f"⚠️ OTLP export failed: {e}")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Process-wide tracer named after the running script"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            service = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0] or "python"
+            _tracer = Tracer(service.replace('_', '-'))
+        return _tracer
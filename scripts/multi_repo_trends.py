@@ -0,0 +1,319 @@
+"""
+Multi-Repository Trend Intelligence
+
+Runs the query -> risk score -> trend pipeline of ai_trend_intelligence.py
+for many repositories in one process. Repositories are processed by a
+bounded thread pool that shares one Athena client, its query slots
+(ATHENA_MAX_CONCURRENT_QUERIES) and the result cache, so hundreds of
+services finish in a few query round-trips instead of one script run
+each.
+
+Each repository is described by a spec:
+    name                 Athena database security_analytics_<name>
+    name=database        Athena database given explicitly
+With TREND_BACKEND=local the right-hand side is the report directory
+instead (default LOCAL_REPORTS_DIR/<name>).
+
+A repository that fails is reported as failed and does not stop the
+others. When GEMINI_API_KEY is set, condensed summaries of all
+repositories are analyzed with batched Gemini calls (see
+gemini_client.py) and each report carries its share of the cost and
+latency. Writes <output>/<repo>.json per repository plus
+<output>/ranked-report.json with every repository ranked by risk.
+
+Usage:
+    python scripts/multi_repo_trends.py payments-api checkout=checkout_db
+    python scripts/multi_repo_trends.py --repos-file repos.txt --output trend-reports/
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from ai_cache import ReportCache
+from ai_trend_intelligence import TREND_QUERIES, TREND_WINDOW_DAYS, fetch_trend_data
+from gemini_client import GeminiBatchAnalyzer
+from instrumentation import get_tracer
+from trend_analytics import TrendSeries, analyze, plain_number
+from trend_backends import LOCAL_REPORTS_DIR, TREND_BACKEND, LocalBackend, get_backend
+
+REPO_CONCURRENCY = int(os.getenv('TREND_REPO_CONCURRENCY', '8'))
+RANKED_REPORT = 'ranked-report.json'
+RISK_ORDER = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3, "UNKNOWN": 4}
+
+RepoSpec = namedtuple('RepoSpec', ['name', 'database', 'reports_dir'])
+
+
+def _safe_name(name):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+
+
+def parse_repo_spec(spec, backend=TREND_BACKEND):
+    """RepoSpec from 'name' or 'name=database' ('name=directory' on the local backend)"""
+    name, _, target = spec.strip().partition('=')
+    name = name.strip()
+    target = target.strip()
+    if not name:
+        raise ValueError(f"Invalid repository spec '{spec}'")
+    if backend == 'local':
+        # Each local repo has its own index, which always uses the default schema name
+        return RepoSpec(name, 'security_analytics', target or os.path.join(LOCAL_REPORTS_DIR, name))
+    database = target or 'security_analytics_' + re.sub(r'[^a-z0-9_]', '_', name.lower())
+    return RepoSpec(name, database, None)
+
+
+def load_repo_specs(path):
+    """Specs from a file with one spec per line; blank lines and # comments are ignored"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def fetch_repo(spec, window_days=TREND_WINDOW_DAYS, today=None):
+    """Trend data of one repository; raises if every query failed"""
+    backend = LocalBackend(spec.reports_dir) if spec.reports_dir else get_backend()
+    if spec.reports_dir and not os.path.isdir(spec.reports_dir):
+        raise FileNotFoundError(f"Report directory not found: {spec.reports_dir}")
+    errors = {}
+    data = fetch_trend_data(window_days=window_days, today=today, database=spec.database,
+                            backend=backend, errors=errors)
+    if len(errors) == len(TREND_QUERIES):
+        raise RuntimeError("; ".join(f"{name}: {error}" for name, error in errors.items()))
+    return data, errors
+
+
+def run_fanout(specs, concurrency=REPO_CONCURRENCY, window_days=TREND_WINDOW_DAYS, today=None):
+    """Fetch every repository with bounded concurrency.
+
+    Returns (results, failures): name -> {"data", "warnings", "seconds"}
+    for repositories that produced data, name -> error message for the rest.
+    """
+    def timed(spec):
+        start = time.perf_counter()
+        data, warnings = fetch_repo(spec, window_days, today)
+        return {"data": data, "warnings": warnings, "seconds": round(time.perf_counter() - start, 3)}
+
+    results = {}
+    failures = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {spec.name: pool.submit(timed, spec) for spec in specs}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                failures[name] = str(e)
+    return results, failures
+
+
+def build_reports(specs, results):
+    """Per-repo reports (statistics computed for all repos in one pass) and the ranked list"""
+    repos = [spec for spec in specs if spec.name in results]
+    series = TrendSeries.from_repos({
+        spec.name: (results[spec.name]["data"]["trends"], results[spec.name]["data"]["secrets"])
+        for spec in repos
+    })
+
+    reports = {}
+    for spec, stats in zip(repos, analyze(series)):
+        data = results[spec.name]["data"]
+        trends = data["trends"]
+        has_score = bool(trends) and stats["risk_score"] is not None
+        reports[spec.name] = {
+            "repo": spec.name,
+            "source": spec.reports_dir or spec.database,
+            "timestamp": datetime.now().isoformat(),
+            "risk_score": plain_number(stats["risk_score"]) if has_score else 0,
+            "risk_level": stats["risk_level"] if has_score else "UNKNOWN",
+            "trend_direction": stats["trend_direction"],
+            "change_percentage": stats["change_pct"],
+            "statistics": {
+                key: stats[key] for key in ("rolling_7d_total", "ewma_risk", "slope_per_day", "change_point")
+            },
+            "latest_scan": trends[0] if trends else {},
+            "persistent_critical_issues": data["critical_issues"],
+            "secret_trends": data["secrets"][:5],
+            "query_warnings": results[spec.name]["warnings"],
+            "seconds": results[spec.name]["seconds"]
+        }
+
+    ranked = sorted(
+        reports.values(),
+        key=lambda r: (RISK_ORDER.get(r["risk_level"], 5), -r["risk_score"], -(r["statistics"]["ewma_risk"] or 0), r["repo"])
+    )
+    return reports, ranked
+
+
+def condensed_summary(report):
+    """The few fields of a repo report that go into a batched AI prompt"""
+    return {
+        "risk": f"{report['risk_score']}/100 {report['risk_level']}",
+        "trend": f"{report['trend_direction']} ({report['change_percentage']:+.1f}%)",
+        "statistics": report["statistics"],
+        "latest_scan": report["latest_scan"],
+        "persistent_critical_issues": report["persistent_critical_issues"][:3],
+        "secrets": report["secret_trends"][:3]
+    }
+
+
+def add_ai_analysis(ranked, analyzer):
+    """Analyze every repo with batched Gemini calls, highest risk first"""
+    results = analyzer.analyze({r["repo"]: condensed_summary(r) for r in ranked})
+    for report in ranked:
+        result = results[report["repo"]]
+        report["ai_analysis"] = result["analysis"] or f"⚠️ AI Analysis failed: {result.get('error')}"
+        report["ai_usage"] = {
+            key: result[key]
+            for key in ("input_tokens", "output_tokens", "cost_usd", "latency_seconds", "batch_size", "cached")
+        }
+
+
+def write_reports(output_dir, reports, ranked, failures, ai_stats=None):
+    """Write <repo>.json per repository and the consolidated ranked report"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, report in reports.items():
+        with open(os.path.join(output_dir, f"{_safe_name(name)}.json"), 'w') as f:
+            json.dump(report, f, indent=2)
+
+    consolidated = {
+        "timestamp": datetime.now().isoformat(),
+        "repositories": len(reports) + len(failures),
+        "succeeded": len(reports),
+        "failed": len(failures),
+        "ranking": [
+            {
+                "rank": i + 1,
+                "repo": r["repo"],
+                "risk_score": r["risk_score"],
+                "risk_level": r["risk_level"],
+                "trend_direction": r["trend_direction"],
+                "change_percentage": r["change_percentage"],
+                "ewma_risk": r["statistics"]["ewma_risk"],
+                "slope_per_day": r["statistics"]["slope_per_day"],
+                "change_point": r["statistics"]["change_point"],
+                "ai_cost_usd": r.get("ai_usage", {}).get("cost_usd"),
+                "ai_latency_seconds": r.get("ai_usage", {}).get("latency_seconds"),
+                "report": f"{_safe_name(r['repo'])}.json"
+            }
+            for i, r in enumerate(ranked)
+        ],
+        "ai_usage": ai_stats,
+        "failures": failures
+    }
+    path = os.path.join(output_dir, RANKED_REPORT)
+    with open(path, 'w') as f:
+        json.dump(consolidated, f, indent=2)
+    return path
+
+
+def format_ranking(ranked, failures, limit=50):
+    """Markdown table of the highest-risk repositories and any failures"""
+    lines = [
+        "| # | Repository | Risk | Level | Trend | EWMA Risk | Slope/day | AI Cost ($) | AI Latency (s) |",
+        "|---|------------|------|-------|-------|-----------|-----------|-------------|----------------|"
+    ]
+    for i, r in enumerate(ranked[:limit]):
+        usage = r.get("ai_usage", {})
+        lines.append(
+            f"| {i + 1} | {r['repo']} | {r['risk_score']} | {r['risk_level']} "
+            f"| {r['trend_direction']} ({r['change_percentage']:+.1f}%) "
+            f"| {r['statistics']['ewma_risk'] if r['statistics']['ewma_risk'] is not None else ''} "
+            f"| {r['statistics']['slope_per_day'] if r['statistics']['slope_per_day'] is not None else ''} "
+            f"| {usage.get('cost_usd', '')} | {usage.get('latency_seconds', '')} |"
+        )
+    if len(ranked) > limit:
+        lines.append(f"\n_{len(ranked) - limit} more repositories in {RANKED_REPORT}_")
+    if failures:
+        lines.append("\n**Failed repositories:**\n")
+        lines.extend(f"- {name}: {error}" for name, error in failures.items())
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run trend intelligence for many repositories")
+    parser.add_argument('repos', nargs='*', help="Repository specs: name or name=database (name=directory when local)")
+    parser.add_argument('--repos-file', help="File with one repository spec per line")
+    parser.add_argument('--output', default='trend-reports', help="Directory for per-repo and ranked reports")
+    parser.add_argument('--concurrency', type=int, default=REPO_CONCURRENCY, help="Repositories processed at once")
+    parser.add_argument('--window-days', type=int, default=TREND_WINDOW_DAYS, help="Lookback window in days")
+    parser.add_argument('--no-ai', action='store_true', help="Skip the batched Gemini analysis")
+    args = parser.parse_args()
+
+    raw_specs = list(args.repos)
+    if args.repos_file:
+        raw_specs.extend(load_repo_specs(args.repos_file))
+    try:
+        specs = [parse_repo_spec(spec) for spec in raw_specs]
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    if not specs:
+        print("❌ Error: no repositories given (pass specs or --repos-file)")
+        sys.exit(1)
+    duplicates = sorted({s.name for s in specs if [t.name for t in specs].count(s.name) > 1})
+    if duplicates:
+        print(f"❌ Error: duplicate repositories: {', '.join(duplicates)}")
+        sys.exit(1)
+
+    print(f"🤖 AI Trend Intelligence - {len(specs)} repositories ({TREND_BACKEND} backend, {args.concurrency} at a time)")
+    print("=" * 60)
+    start = time.perf_counter()
+    results, failures = run_fanout(specs, args.concurrency, args.window_days)
+    fetch_seconds = time.perf_counter() - start
+
+    reports, ranked = build_reports(specs, results)
+
+    analyzer = None
+    api_key = os.getenv('GEMINI_API_KEY')
+    if args.no_ai or not ranked:
+        pass
+    elif not api_key:
+        print("⚠️ GEMINI_API_KEY not set - skipping AI analysis")
+    else:
+        print(f"\n🤖 Generating AI-powered insights for {len(ranked)} repositories in batches...")
+        analyzer = GeminiBatchAnalyzer(api_key, cache=ReportCache())
+        add_ai_analysis(ranked, analyzer)
+        print(f"📦 {analyzer.format_stats()}")
+
+    path = write_reports(args.output, reports, ranked, failures, analyzer.stats if analyzer else None)
+
+    print(f"\n⏱️ Fetched {len(results)}/{len(specs)} repositories in {fetch_seconds:.1f}s")
+    if TREND_BACKEND == 'athena':
+        backend = get_backend()
+        print(f"  - Peak concurrent Athena queries: {backend.executor.slots.peak}/{backend.executor.slots.limit}")
+        print(f"📦 {backend.result_cache.format_stats()}")
+    for name, error in failures.items():
+        print(f"❌ {name}: {error}")
+
+    print("\n" + "=" * 60)
+    print("🛡️ SECURITY RISK RANKING")
+    print("=" * 60)
+    for i, r in enumerate(ranked[:20]):
+        print(f"{i + 1:>3}. {r['repo']}: {r['risk_score']}/100 - {r['risk_level']}, {r['trend_direction']} ({r['change_percentage']:+.1f}%)")
+    if len(ranked) > 20:
+        print(f"     ... {len(ranked) - 20} more")
+
+    print(f"\n✅ Reports saved to: {args.output}/ (ranking in {path})")
+
+    if os.getenv('GITHUB_STEP_SUMMARY'):
+        with open(os.getenv('GITHUB_STEP_SUMMARY'), 'a') as f:
+            f.write(f"\n## 🤖 AI Trend Intelligence - Repository Ranking\n\n")
+            f.write(f"**Repositories:** {len(results)} analyzed, {len(failures)} failed in {fetch_seconds:.1f}s\n\n")
+            if analyzer:
+                f.write(f"**AI:** {analyzer.format_stats()}\n\n")
+            f.write(format_ranking(ranked, failures))
+
+    if failures and not results:
+        sys.exit(1)
+    print("\n🎉 Analysis complete!")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        get_tracer().finish(os.getenv('GITHUB_STEP_SUMMARY'))
@@ -0,0 +1,178 @@
+"""
+Prompt Builder
+
+Token-budgeted prompt assembly shared by the security scripts.
+
+Sections collect their lines in lists and keep a running token estimate,
+so nothing is re-concatenated while the prompt is built. At build time
+the fixed header/footer are always kept, and the remaining budget is
+handed to sections in priority order (lower number first); a section
+that does not fit is cut line by line. Sections are emitted in the
+order they were declared so the prompt still reads naturally.
+"""
+
+import io
+import json
+import os
+import time
+
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = int(os.getenv('AI_PROMPT_TOKEN_BUDGET', '6000'))
+
+# Section priorities: secrets first, then criticals, then trends
+PRIORITY_SECRETS = 0
+PRIORITY_CRITICAL = 10
+PRIORITY_FINDINGS = 20
+PRIORITY_TRENDS = 30
+PRIORITY_CONTEXT = 40
+
+PRIORITY_NAMES = {
+    PRIORITY_SECRETS: "secrets",
+    PRIORITY_CRITICAL: "critical",
+    PRIORITY_FINDINGS: "findings",
+    PRIORITY_TRENDS: "trends",
+    PRIORITY_CONTEXT: "context",
+}
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English/JSON)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def omitted_note(count):
+    return f"... ({count} more lines omitted to fit the prompt budget)"
+
+
+def compact_json(data):
+    """Single-line JSON for data blocks; no indentation whitespace to pay for"""
+    return json.dumps(data, separators=(',', ':'), default=str)
+
+
+class Section:
+    """A titled block of prompt lines with a running token estimate"""
+
+    __slots__ = ("title", "priority", "name", "lines", "tokens")
+
+    def __init__(self, title, priority, name=None):
+        self.title = title
+        self.priority = priority
+        self.name = name
+        self.lines = []
+        self.tokens = estimate_tokens(title) + 1 if title else 0
+
+    @property
+    def label(self):
+        """Title for diagnostics, falling back to the name or priority of untitled sections"""
+        return self.title or self.name or PRIORITY_NAMES.get(self.priority, f"priority {self.priority}")
+
+    def add(self, line):
+        self.lines.append(line)
+        self.tokens += estimate_tokens(line) + 1
+        return self
+
+    def add_json(self, records):
+        """Add one compact JSON line per record so truncation drops whole records"""
+        for record in records:
+            self.add(compact_json(record))
+        return self
+
+    def text(self):
+        return "\n".join(([self.title] if self.title else []) + self.lines)
+
+
+class PromptBuilder:
+    """Assemble header + prioritized sections + footer within a token budget"""
+
+    def __init__(self, header="", footer="", token_budget=DEFAULT_TOKEN_BUDGET):
+        self.header = header
+        self.footer = footer
+        self.token_budget = token_budget
+        self.sections = []
+        self.stats = {}
+
+    def section(self, title, priority=PRIORITY_CONTEXT, name=None):
+        section = Section(title, priority, name)
+        self.sections.append(section)
+        return section
+
+    def _fit(self):
+        """Number of lines of each section that fit, by priority"""
+        remaining = self.token_budget - estimate_tokens(self.header) - estimate_tokens(self.footer)
+        allowed = {}
+        for section in sorted(self.sections, key=lambda s: s.priority):
+            if section.tokens <= remaining:
+                allowed[id(section)] = len(section.lines)
+                remaining -= section.tokens
+                continue
+
+            # Partial fit: the title plus as many leading lines as the budget allows,
+            # keeping room for the omitted-lines note (sized for the largest count)
+            used = estimate_tokens(section.title) + 1 if section.title else 0
+            used += estimate_tokens(omitted_note(len(section.lines))) + 1
+            count = 0
+            for line in section.lines:
+                cost = estimate_tokens(line) + 1
+                if used + cost > remaining:
+                    break
+                used += cost
+                count += 1
+            if count == 0:
+                allowed[id(section)] = -1
+            else:
+                allowed[id(section)] = count
+                remaining -= used
+        return allowed
+
+    def build(self):
+        start = time.perf_counter()
+        allowed = self._fit()
+
+        out = io.StringIO()
+        out.write(self.header)
+        truncated = []
+        dropped = []
+        for section in self.sections:
+            if not section.lines and not section.title:
+                continue
+            keep = allowed[id(section)]
+            if keep < 0:
+                dropped.append(section.label)
+                continue
+            out.write("\n")
+            if section.title:
+                out.write(section.title)
+                out.write("\n")
+            for line in section.lines[:keep]:
+                out.write(line)
+                out.write("\n")
+            omitted = len(section.lines) - keep
+            if omitted:
+                truncated.append(section.label)
+                out.write(omitted_note(omitted))
+                out.write("\n")
+        out.write("\n")
+        out.write(self.footer)
+
+        prompt = out.getvalue()
+        self.stats = {
+            "chars": len(prompt),
+            "estimated_tokens": estimate_tokens(prompt),
+            "token_budget": self.token_budget,
+            "build_ms": round((time.perf_counter() - start) * 1000, 2),
+            "truncated_sections": truncated,
+            "dropped_sections": dropped
+        }
+        return prompt
+
+    def format_stats(self):
+        s = self.stats
+        line = (
+            f"Prompt: {s.get('chars', 0)} chars, ~{s.get('estimated_tokens', 0)}/"
+            f"{s.get('token_budget', self.token_budget)} tokens, built in {s.get('build_ms', 0)} ms"
+        )
+        if s.get("truncated_sections"):
+            line += f"; truncated: {', '.join(s['truncated_sections'])}"
+        if s.get("dropped_sections"):
+            line += f"; dropped: {', '.join(s['dropped_sections'])}"
+        return line
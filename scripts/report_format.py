@@ -0,0 +1,304 @@
+"""
+Report Storage Formats
+
+Scan reports are stored either as the scanners write them ("json") or as
+compact JSON Lines with one finding per line ("jsonl", and gzip-compressed
+"jsonl.gz"). Each line is a copy of the report that holds a single
+finding, e.g. a Trivy line keeps SchemaVersion, the Result's Target and
+a one-item Vulnerabilities array, so the JsonSerDe tables in
+athena/setup.sql read every line as a row with their existing schemas
+and UNNEST queries count the same findings. Athena decompresses .gz
+objects by their extension.
+
+Readers go through iter_report_items(), which picks the format from
+the file name and streams (context, finding) pairs either way, so the
+agent and the batch jobs share one parser without loading whole reports.
+"""
+
+import gzip
+import json
+import os
+import re
+
+REPORT_FORMATS = ("json", "jsonl", "jsonl.gz")
+REPORT_FORMAT = os.getenv('REPORT_FORMAT', 'json')
+GZIP_LEVEL = int(os.getenv('REPORT_GZIP_LEVEL', '6'))
+# Read size of the streaming JSON parser
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Path of the findings array in each report type; "*" at the root means the report is an array
+FINDING_PATHS = {
+    "trivy": ("Results", "*", "Vulnerabilities", "*"),
+    "snyk": ("vulnerabilities", "*"),
+    "gitleaks": ("*",),
+    "metadata": (),
+}
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "jsonl": "application/x-ndjson",
+    "jsonl.gz": "application/gzip",
+}
+
+
+def report_filename(filename, fmt):
+    """Stored file name of a report, e.g. trivy-report.json -> trivy-report.jsonl.gz"""
+    if fmt == "json":
+        return filename
+    stem = filename[:-len(".json")] if filename.endswith(".json") else filename
+    return f"{stem}.{fmt}"
+
+
+def report_filenames(filename):
+    """Every stored name a report may have, in REPORT_FORMATS order"""
+    return [report_filename(filename, fmt) for fmt in REPORT_FORMATS]
+
+
+def is_json_lines(path):
+    return path[:-len(".gz")].endswith(".jsonl") if path.endswith(".gz") else path.endswith(".jsonl")
+
+
+def open_report(path):
+    """Open a report for reading as text, decompressing .gz files"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def split_report(doc, path):
+    """Yield copies of doc that each hold one finding under path.
+
+    Siblings of every array on the path are kept, with the array moved
+    last so streaming readers see them first. A level with no findings
+    is kept as one record so report metadata is not lost.
+    """
+    if not path:
+        yield doc
+        return
+    if path[0] == "*":
+        # Root-level array: its items are the records
+        for item in doc:
+            yield from split_report(item, path[1:])
+        return
+    key, rest = path[0], path[2:]
+    items = doc.get(key) if isinstance(doc, dict) else None
+    if not items:
+        yield doc
+        return
+    base = {k: v for k, v in doc.items() if k != key}
+    for item in items:
+        for part in split_report(item, rest):
+            record = dict(base)
+            record[key] = [part]
+            yield record
+
+
+def encode_report(content, report_type, fmt):
+    """Serialize a report for storage; returns (bytes, content type)"""
+    if fmt == "json":
+        body = json.dumps(content, indent=2).encode("utf-8")
+    else:
+        records = split_report(content, FINDING_PATHS.get(report_type, ()))
+        body = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+        if fmt == "jsonl.gz":
+            # mtime=0 keeps the bytes reproducible for the same report
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body, CONTENT_TYPES[fmt]
+
+
+_NON_WHITESPACE = re.compile(r"[^ \t\n\r]")
+_NUMBER_CHARS = "0123456789+-.eE"
+# Longest partial token a decode error can point into, e.g. a cut-off \uXXXX escape or "fals"
+_TRUNCATION_SLACK = 6
+_JSON_DECODER = json.JSONDecoder()
+
+
+class JsonArrayStream:
+    """Incrementally walk a JSON document and yield items of a nested array.
+
+    Only the items under ``path`` are ever decoded; everything else is
+    skipped character by character, so memory stays bounded by the size of
+    one item plus one read chunk regardless of the document size.
+    """
+
+    def __init__(self, fp, chunk_size=STREAM_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def _peek(self):
+        while True:
+            match = _NON_WHITESPACE.search(self.buf, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def _decode(self):
+        self._peek()
+        while True:
+            try:
+                value, end = _JSON_DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError as e:
+                # Only a value cut off by the end of the buffer can be completed by reading on;
+                # anything else is malformed, and reading on would pull the rest of the file in
+                truncated = e.msg.startswith("Unterminated string") or e.pos >= len(self.buf) - _TRUNCATION_SLACK
+                if not truncated or not self._fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if (not self.eof and len(self.buf) - end < 64
+                    and not self.buf[end:].strip(_NUMBER_CHARS) and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+    def _skip(self):
+        """Skip one JSON value without building it."""
+        if self._peek() not in "[{":
+            self._decode()
+            return
+        depth = 0
+        in_string = False
+        escaped = False
+        while True:
+            if self.pos >= len(self.buf) and not self._fill():
+                raise ValueError("Unexpected end of JSON document")
+            buf = self.buf
+            i = self.pos
+            n = len(buf)
+            while i < n:
+                c = buf[i]
+                i += 1
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif c == "\\":
+                        escaped = True
+                    elif c == '"':
+                        in_string = False
+                elif c == '"':
+                    in_string = True
+                elif c in "[{":
+                    depth += 1
+                elif c in "]}":
+                    depth -= 1
+                    if depth == 0:
+                        self.pos = i
+                        return
+            self.pos = i
+
+    def _walk(self, path, context):
+        if not path:
+            yield context, self._decode()
+            return
+
+        head, rest = path[0], path[1:]
+        c = self._peek()
+
+        if head == "*":
+            if c != "[":
+                self._skip()
+                return
+            self.pos += 1
+            if self._peek() == "]":
+                self.pos += 1
+                return
+            while True:
+                yield from self._walk(rest, context)
+                if self._peek() == ",":
+                    self.pos += 1
+                    continue
+                self._expect("]")
+                return
+
+        if c != "{":
+            self._skip()
+            return
+        self.pos += 1
+        if self._peek() == "}":
+            self.pos += 1
+            return
+        # Scalar siblings seen before the array (e.g. Trivy's "Target") are passed down as context
+        scalars = dict(context)
+        while True:
+            key = self._decode()
+            self._expect(":")
+            if key == head:
+                yield from self._walk(rest, scalars)
+            elif self._peek() in "[{":
+                self._skip()
+            else:
+                scalars[key] = self._decode()
+            if self._peek() == ",":
+                self.pos += 1
+                continue
+            self._expect("}")
+            return
+
+    def items(self, path):
+        """Yield (context, item) pairs for every item found under path."""
+        if self._peek() in "[{":
+            yield from self._walk(tuple(path), {})
+
+
+def _walk_value(value, path, context):
+    """(context, item) pairs under path in an already decoded document, as JsonArrayStream yields them"""
+    if not path:
+        yield context, value
+        return
+    head, rest = path[0], path[1:]
+    if head == "*":
+        if isinstance(value, list):
+            for item in value:
+                yield from _walk_value(item, rest, context)
+        return
+    if isinstance(value, dict) and head in value:
+        scalars = dict(context)
+        scalars.update((k, v) for k, v in value.items() if k != head and not isinstance(v, (dict, list)))
+        yield from _walk_value(value[head], rest, scalars)
+
+
+def iter_json_lines(fp, path):
+    """Yield (context, item) pairs from a JSON Lines report, one small document per line.
+
+    A report whose root is an array stores one item per line, so a
+    leading "*" in path is matched by the lines themselves.
+    """
+    path = tuple(path)
+    if path[:1] == ("*",):
+        path = path[1:]
+    for line in fp:
+        if line.strip():
+            yield from _walk_value(json.loads(line), path, {})
+
+
+def iter_report_items(file_path, path):
+    """Stream (context, item) pairs from a JSON or JSON Lines (optionally .gz) report file"""
+    with open_report(file_path) as f:
+        if is_json_lines(file_path):
+            yield from iter_json_lines(f, path)
+        else:
+            yield from JsonArrayStream(f).items(path)
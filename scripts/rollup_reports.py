@@ -0,0 +1,143 @@
+"""
+Daily Security Summary Rollup
+
+Maintains the daily_security_summary table: one small JSON record per
+day with per-severity counts, secret counts, distinct affected files and
+the risk score. The trend script reads these records instead of
+UNNESTing every raw report, so its cost stays flat as history grows.
+
+Input is a local directory laid out like the reports bucket
+(trivy/YYYY/MM/DD/run-NNN/trivy-report.json, ...). Only days whose
+summary is missing or older than their reports are recomputed;
+--upload-bucket copies the written summaries to S3.
+
+Usage:
+    python scripts/rollup_reports.py --input reports/ --output rollup/
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from compact_reports import find_report_days
+from report_format import iter_report_items
+from trend_analytics import calculate_risk_score
+
+SUMMARY_TABLE = 'daily_security_summary'
+SUMMARY_FILE = 'summary.json'
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+
+def summarize_day(scan_date, trivy_reports, gitleaks_reports):
+    """Summary record for one day from all of that day's runs"""
+    counts = dict.fromkeys(SEVERITIES, 0)
+    total = 0
+    for _, path in trivy_reports:
+        for _, v in iter_report_items(path, ("Results", "*", "Vulnerabilities", "*")):
+            severity = (v.get("Severity") or "UNKNOWN").upper()
+            if severity in counts:
+                counts[severity] += 1
+            total += 1
+
+    secret_count = 0
+    files = set()
+    for _, path in gitleaks_reports:
+        for _, secret in iter_report_items(path, ("*",)):
+            secret_count += 1
+            if secret.get("File"):
+                files.add(secret["File"])
+
+    day = {
+        'date': scan_date,
+        'critical': counts["CRITICAL"],
+        'high': counts["HIGH"],
+        'medium': counts["MEDIUM"],
+        'low': counts["LOW"],
+        'total': total
+    }
+    risk_score, risk_level = calculate_risk_score([day], [{'date': scan_date, 'count': secret_count}] if secret_count else [])
+
+    return {
+        "scan_date": scan_date,
+        "runs": len({run_id for run_id, _ in trivy_reports} | {run_id for run_id, _ in gitleaks_reports}),
+        "critical_count": counts["CRITICAL"],
+        "high_count": counts["HIGH"],
+        "medium_count": counts["MEDIUM"],
+        "low_count": counts["LOW"],
+        "total_count": total,
+        "secret_count": secret_count,
+        "affected_files": len(files),
+        "risk_score": risk_score,
+        "risk_level": risk_level,
+        "generated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def rollup_reports(input_dir, output_dir, force=False):
+    """Write summaries for new or changed days; returns (stats, written paths)"""
+    trivy_days = find_report_days(input_dir, "trivy")
+    gitleaks_days = find_report_days(input_dir, "gitleaks")
+    stats = {"days": 0, "skipped": 0, "seconds": 0.0}
+    written = []
+
+    start = time.perf_counter()
+    for key in sorted(set(trivy_days) | set(gitleaks_days)):
+        year, month, day = key
+        trivy_reports = trivy_days.get(key, [])
+        gitleaks_reports = gitleaks_days.get(key, [])
+        output_path = os.path.join(output_dir, SUMMARY_TABLE, year, month, day, SUMMARY_FILE)
+
+        newest_input = max(os.path.getmtime(path) for _, path in trivy_reports + gitleaks_reports)
+        if not force and os.path.exists(output_path) and os.path.getmtime(output_path) >= newest_input:
+            stats["skipped"] += 1
+            continue
+
+        record = summarize_day(f"{year}-{month}-{day}", trivy_reports, gitleaks_reports)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        tmp_path = output_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            # One record per line, as the JsonSerDe table expects
+            f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, output_path)
+        stats["days"] += 1
+        written.append(output_path)
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    return stats, written
+
+
+def upload_summaries(bucket_name, output_dir, paths):
+    """Copy written summaries to s3://bucket/daily_security_summary/YYYY/MM/DD/"""
+    import boto3
+
+    s3 = boto3.client('s3')
+    for path in paths:
+        key = os.path.relpath(path, output_dir).replace(os.sep, '/')
+        try:
+            s3.upload_file(path, bucket_name, key, ExtraArgs={'ContentType': 'application/json'})
+        except Exception as e:
+            print(f"⚠️ Failed to upload {key}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the daily security summary rollup")
+    parser.add_argument('--input', required=True, help="Directory laid out like the reports bucket")
+    parser.add_argument('--output', required=True, help="Directory for daily_security_summary/YYYY/MM/DD/summary.json")
+    parser.add_argument('--force', action='store_true', help="Recompute days that are already summarized")
+    parser.add_argument('--upload-bucket', help="Upload written summaries to this S3 bucket")
+    args = parser.parse_args()
+
+    print("📊 Updating daily security summary...")
+    stats, written = rollup_reports(args.input, args.output, force=args.force)
+    print(f"  - {stats['days']} day(s) summarized, {stats['skipped']} unchanged in {stats['seconds']}s")
+
+    if args.upload_bucket and written:
+        print(f"📦 Uploading {len(written)} summary file(s) to s3://{args.upload_bucket}/{SUMMARY_TABLE}/")
+        upload_summaries(args.upload_bucket, args.output, written)
+
+    print("✅ Rollup complete")
+
+
+if __name__ == "__main__":
+    main()
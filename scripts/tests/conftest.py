@@ -0,0 +1,95 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+# The scripts import their siblings directly, as they do when run from CI
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubServer:
+    """Local HTTP server that answers from a queue of (status, headers, body, delay) responses"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                stub.requests.append((self.command, self.path, self.rfile.read(length)))
+                status, headers, body, delay = stub.responses.pop(0) if len(stub.responses) > 1 else stub.responses[0]
+                time.sleep(delay)
+                try:
+                    self.send_response(status)
+                    for key, value in headers.items():
+                        self.send_header(key, value)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # the client gave up waiting
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reply(self, status, body=b'', delay=0, **headers):
+        """Queue a response, sent after `delay` seconds; the last one repeats"""
+        self.responses.append((status, {k.replace('_', '-'): v for k, v in headers.items()}, body, delay))
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def athena_stub():
+    """Real boto3 Athena client with a Stubber, so calls are checked against the service model"""
+    client = boto3.client(
+        'athena', region_name='us-east-1',
+        aws_access_key_id='testing', aws_secret_access_key='testing'
+    )
+    with Stubber(client) as stubber:
+        yield client, stubber
+        stubber.assert_no_pending_responses()
+
+
+def execution(query_execution_id, state, **statistics):
+    """QueryExecution entry of a BatchGetQueryExecution/GetQueryExecution response"""
+    return {
+        'QueryExecutionId': query_execution_id,
+        'Status': {'State': state},
+        'Statistics': statistics
+    }
+
+
+def result_page(columns, rows, next_token=None):
+    """GetQueryResults response; columns are (name, type) pairs, None values are NULL cells"""
+    page = {
+        'ResultSet': {
+            'Rows': [{'Data': [{} if v is None else {'VarCharValue': v} for v in row]} for row in rows],
+            'ResultSetMetadata': {'ColumnInfo': [{'Name': n, 'Type': t} for n, t in columns]}
+        }
+    }
+    if next_token:
+        page['NextToken'] = next_token
+    return page
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from ai_security_agent import (
+    get_sonar_issues, load_report, merge_scanner_results, summarize_gitleaks_report, summarize_snyk_report,
+    summarize_trivy_report, top_findings
+)
+from instrumentation import get_tracer
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def trivy_vuln(cve, pkg, severity="LOW", fixed=None):
+    return {"VulnerabilityID": cve, "PkgName": pkg, "InstalledVersion": "1.0", "Severity": severity,
+            "Title": f"{cve} in {pkg}", "FixedVersion": fixed}
+
+
+def snyk_vuln(cve, pkg, severity="low", cvss=None):
+    return {"id": f"SNYK-{cve}", "identifiers": {"CVE": [cve]}, "packageName": pkg, "version": "1.0",
+            "severity": severity, "title": f"Snyk {cve}", "cvssScore": cvss}
+
+
+def load(tmp_path, trivy=(), snyk=(), gitleaks=()):
+    inputs = {
+        "trivy": summarize_trivy_report(write_json(tmp_path / "fs-report.json", {
+            "Results": [{"Target": "pom.xml", "Vulnerabilities": list(trivy)}]})),
+        "snyk": summarize_snyk_report(write_json(tmp_path / "snyk-report.json", {"vulnerabilities": list(snyk)})),
+        "gitleaks": summarize_gitleaks_report(write_json(tmp_path / "gitleaks-report.json", list(gitleaks))),
+    }
+    return merge_scanner_results(inputs)
+
+
+def test_same_cve_on_the_same_package_is_counted_once(tmp_path):
+    findings, errors = load(
+        tmp_path,
+        trivy=[trivy_vuln("CVE-1", "Guava", "HIGH"), trivy_vuln("CVE-2", "netty")],
+        snyk=[snyk_vuln("CVE-1", "guava", "critical", cvss=9.8)],
+        gitleaks=[{"Fingerprint": "abc", "Description": "AWS key", "File": "app.env", "StartLine": 3,
+                   "Entropy": 4.5}],
+    )
+
+    assert errors == {}
+    assert len(findings) == 3 and findings.duplicates() == 1
+    assert findings.count("trivy") == 2 and findings.shared_count("snyk") == 1
+    # Merged: highest severity and the CVSS only Snyk reported
+    merged = findings.top(1, source="trivy")[0]
+    assert (merged.severity, merged.cvss, merged.source_names()) == ("CRITICAL", 9.8, ["trivy", "snyk"])
+    assert findings.severity_counts() == {"CRITICAL": 1, "LOW": 1, "SECRET": 1}
+
+
+def test_top_k_is_exact_across_scanners_on_large_reports(tmp_path):
+    # Thousands of LOW Trivy findings; one only ranks once Snyk's HIGH record with a CVSS is merged in
+    trivy = [trivy_vuln(f"CVE-{i}", f"pkg-{i}") for i in range(5000)]
+    snyk = [snyk_vuln("CVE-4321", "pkg-4321", "high", cvss=8.1)]
+    snyk += [snyk_vuln(f"CVE-S{i}", f"lib-{i}", "low", cvss=i / 1000) for i in range(3000)]
+    findings, _ = load(tmp_path, trivy=trivy, snyk=snyk)
+
+    for source in (None, "trivy", "snyk"):
+        expected = top_findings(f for f in findings if not source or source in f.source_names())
+        assert [f.key for f in findings.top(source=source)] == [f.key for f in expected]
+    top = findings.top(source="trivy")[0]
+    assert (top.finding_id, top.severity, top.cvss) == ("CVE-4321", "HIGH", 8.1)
+    assert [f.cvss for f in findings.top(source="snyk")] == [8.1, 2.999, 2.998, 2.997, 2.996]
+
+
+def test_sonar_request_counter_includes_the_facet_query(stub_server):
+    stub_server.reply(200, json.dumps({"paging": {"total": 0}, "issues": [], "facets": []}).encode())
+
+    with get_tracer().span("sonar_issues") as span:
+        index = get_sonar_issues(stub_server.url, "token", "GC-Bank")
+
+    assert index.total == 0
+    assert len(stub_server.requests) == 2
+    assert span.counters["sonar_requests"] == 2
+
+
+def test_parse_errors_keep_the_parser_message(tmp_path):
+    path = tmp_path / "snyk-report.json"
+    path.write_text('{"vulnerabilities": [{"id": nope}]}')
+
+    with pytest.raises(ValueError, match=r"Failed to parse Snyk report: Expecting value.*char 28") as info:
+        load_report(summarize_snyk_report, str(path), "Snyk")
+    assert isinstance(info.value.__cause__, json.JSONDecodeError)
@@ -0,0 +1,106 @@
+from datetime import date
+
+import pytest
+from botocore.stub import ANY
+
+from athena_client import AthenaQueryError, AthenaQueryExecutor, AthenaQueryTimeout
+from conftest import execution, result_page
+
+
+def make_executor(client, **kwargs):
+    kwargs.setdefault('poll_initial', 0)
+    return AthenaQueryExecutor(client=client, output_location='s3://bucket/results/',
+                               result_reuse_minutes=0, **kwargs)
+
+
+def unprocessed(query_execution_id, code, message="Rate exceeded"):
+    return {'QueryExecutionId': query_execution_id, 'ErrorCode': code, 'ErrorMessage': message}
+
+
+def test_wait_repolls_throttled_ids(athena_stub):
+    client, stubber = athena_stub
+    stubber.add_response('batch_get_query_execution', {
+        'QueryExecutions': [execution('q1', 'RUNNING')],
+        'UnprocessedQueryExecutionIds': [unprocessed('q2', 'ThrottlingException')]
+    }, {'QueryExecutionIds': ['q1', 'q2']})
+    stubber.add_response('batch_get_query_execution', {
+        'QueryExecutions': [execution('q1', 'SUCCEEDED'), execution('q2', 'SUCCEEDED')],
+        'UnprocessedQueryExecutionIds': []
+    }, {'QueryExecutionIds': ['q1', 'q2']})
+
+    assert make_executor(client).wait(['q1', 'q2']) == {'q1': None, 'q2': None}
+
+
+def test_wait_fails_fatal_status_errors_at_once(athena_stub):
+    client, stubber = athena_stub
+    stubber.add_response('batch_get_query_execution', {
+        'QueryExecutions': [],
+        'UnprocessedQueryExecutionIds': [unprocessed('q1', 'InvalidRequestException', "Unknown id")]
+    }, {'QueryExecutionIds': ['q1']})
+
+    outcome = make_executor(client).wait(['q1'])
+
+    assert isinstance(outcome['q1'], AthenaQueryError)
+    assert not isinstance(outcome['q1'], AthenaQueryTimeout)
+    assert "Unknown id" in str(outcome['q1'])
+
+
+def test_wait_times_out_ids_that_stay_unavailable(athena_stub):
+    client, stubber = athena_stub
+    stubber.add_response('batch_get_query_execution', {
+        'QueryExecutions': [],
+        'UnprocessedQueryExecutionIds': [unprocessed('q1', 'ThrottlingException')]
+    }, {'QueryExecutionIds': ['q1']})
+    stubber.add_response('stop_query_execution', {}, {'QueryExecutionId': 'q1'})
+
+    outcome = make_executor(client).wait(['q1'], timeout=-1)
+
+    assert isinstance(outcome['q1'], AthenaQueryTimeout)
+    assert "ThrottlingException" in str(outcome['q1'])
+
+
+def test_run_query_reports_failed_state(athena_stub):
+    client, stubber = athena_stub
+    stubber.add_response('start_query_execution', {'QueryExecutionId': 'q1'}, {
+        'QueryString': 'SELECT 1', 'QueryExecutionContext': ANY, 'ResultConfiguration': ANY
+    })
+    failed = execution('q1', 'FAILED')
+    failed['Status']['StateChangeReason'] = "SYNTAX_ERROR"
+    stubber.add_response('batch_get_query_execution', {
+        'QueryExecutions': [failed], 'UnprocessedQueryExecutionIds': []
+    }, {'QueryExecutionIds': ['q1']})
+
+    with pytest.raises(AthenaQueryError, match="SYNTAX_ERROR"):
+        make_executor(client).run_query('SELECT 1')
+
+
+def test_iter_rows_follows_next_token_and_types_columns(athena_stub):
+    client, stubber = athena_stub
+    columns = [('scan_date', 'date'), ('critical_count', 'bigint'), ('risk', 'double'), ('package', 'varchar')]
+    stubber.add_response('get_query_results', result_page(columns, [
+        ['scan_date', 'critical_count', 'risk', 'package'],
+        ['2026-10-16', '3', '41.5', 'log4j-core'],
+    ], next_token='page-2'), {'QueryExecutionId': 'q1', 'MaxResults': 2})
+    stubber.add_response('get_query_results', result_page(columns, [
+        ['2026-10-15', None, '12.0', None],
+    ]), {'QueryExecutionId': 'q1', 'MaxResults': 2, 'NextToken': 'page-2'})
+
+    rows = list(make_executor(client).iter_rows('q1', page_size=2))
+
+    assert [tuple(row) for row in rows] == [
+        (date(2026, 10, 16), 3, 41.5, 'log4j-core'),
+        (date(2026, 10, 15), None, 12.0, None),
+    ]
+    assert rows[0].critical_count == 3
+
+
+def test_iter_rows_is_lazy(athena_stub):
+    client, stubber = athena_stub
+    columns = [('n', 'integer')]
+    stubber.add_response('get_query_results', result_page(columns, [['n'], ['1']], next_token='more'),
+                         {'QueryExecutionId': 'q1', 'MaxResults': 1000})
+
+    rows = make_executor(client).iter_rows('q1')
+
+    # Only the first page is requested until the caller reads past it
+    assert next(rows).n == 1
@@ -0,0 +1,65 @@
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from generate_test_data import BulkUploader, DirectorySink, S3Sink
+
+
+def put_params(key, body):
+    return {'Bucket': 'reports', 'Key': key, 'Body': body, 'ContentType': 'application/json'}
+
+
+def test_slowdown_is_retried_until_the_put_succeeds():
+    client = boto3.client('s3', region_name='us-east-1',
+                          aws_access_key_id='testing', aws_secret_access_key='testing')
+    with Stubber(client) as stubber:
+        for _ in range(2):
+            stubber.add_client_error('put_object', service_error_code='SlowDown', http_status_code=503,
+                                     expected_params=put_params('trivy/report.json', b'{}'))
+        stubber.add_response('put_object', {}, put_params('trivy/report.json', b'{}'))
+
+        with BulkUploader(S3Sink('reports', client=client), concurrency=1, backoff_base=0.001) as uploader:
+            uploader.submit('trivy/report.json', '{}')
+
+        stubber.assert_no_pending_responses()
+    assert uploader.stats["objects"] == 1
+    assert uploader.stats["retries"] == 2
+    assert uploader.stats["failed"] == 0
+
+
+class RefusingSink(DirectorySink):
+    """DirectorySink that fails the first `failures` puts with an S3 error code"""
+
+    def __init__(self, directory, code, failures):
+        super().__init__(directory)
+        self.code = code
+        self.failures = failures
+
+    def put(self, key, body, content_type):
+        if self.failures:
+            self.failures -= 1
+            raise ClientError({'Error': {'Code': self.code, 'Message': self.code}}, 'PutObject')
+        super().put(key, body, content_type)
+
+
+def test_throttled_puts_still_land_in_the_sink(tmp_path):
+    sink = RefusingSink(str(tmp_path), 'SlowDown', failures=3)
+    key = 'trivy/2026/10/16/run-001/trivy-report.json'
+
+    with BulkUploader(sink, concurrency=1, max_retries=5, backoff_base=0.001) as uploader:
+        uploader.submit(key, b'{"Results": []}')
+
+    assert (tmp_path / key).read_bytes() == b'{"Results": []}'
+    assert uploader.stats["retries"] == 3 and uploader.stats["failed"] == 0
+
+
+def test_other_errors_are_not_retried(tmp_path):
+    sink = RefusingSink(str(tmp_path), 'AccessDenied', failures=1)
+
+    with BulkUploader(sink, concurrency=1, backoff_base=0.001) as uploader:
+        uploader.submit('trivy/denied.json', '{}')
+        uploader.submit('trivy/allowed.json', '{}')
+
+    assert uploader.stats["retries"] == 0
+    assert uploader.stats["failed"] == 1 and uploader.stats["objects"] == 1
+    assert (tmp_path / 'trivy/allowed.json').exists()
@@ -0,0 +1,55 @@
+import json
+
+import gemini_client
+from gemini_client import ANALYSIS_FIELDS, GeminiBatchAnalyzer, RateLimiter
+from http_client import HttpClient
+
+
+def batch_response(*repos):
+    entries = [{"repo": repo, **{field: f"{field} of {repo}" for field in ANALYSIS_FIELDS}} for repo in repos]
+    body = {
+        "candidates": [{"content": {"parts": [{"text": json.dumps(entries)}]}}],
+        "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 40}
+    }
+    return json.dumps(body).encode()
+
+
+def prompt_repos(request):
+    _, _, body = request
+    prompt = json.loads(body)["contents"][0]["parts"][0]["text"]
+    return [json.loads(line)["repo"] for line in prompt.splitlines() if line.startswith('{"repo"')]
+
+
+def test_repository_dropped_from_a_batch_is_retried_at_half_the_size(stub_server, monkeypatch):
+    monkeypatch.setattr(gemini_client, 'GEMINI_BASE_URL', stub_server.url)
+    # The model answers for three of the four repositories, then for the one it dropped
+    stub_server.reply(200, batch_response('app-a', 'app-b', 'app-c'))
+    stub_server.reply(200, batch_response('app-d'))
+    analyzer = GeminiBatchAnalyzer('key', batch_size=4, concurrency=1,
+                                   rate_limiter=RateLimiter(rate_per_minute=6000),
+                                   client=HttpClient(backoff_base=0.001, timeout=5))
+
+    results = analyzer.analyze({repo: {"total": 1} for repo in ('app-a', 'app-b', 'app-c', 'app-d')})
+
+    assert [prompt_repos(request) for request in stub_server.requests] == [
+        ['app-a', 'app-b', 'app-c', 'app-d'], ['app-d']
+    ]
+    assert all(result["analysis"] is not None for result in results.values())
+    assert [results[repo]["batch_size"] for repo in results] == [4, 4, 4, 1]
+    assert analyzer.stats["requests"] == 2 and analyzer.stats["failed_requests"] == 0
+
+
+def test_repository_still_missing_on_its_own_gets_an_error(stub_server, monkeypatch):
+    monkeypatch.setattr(gemini_client, 'GEMINI_BASE_URL', stub_server.url)
+    stub_server.reply(200, batch_response('app-a'))
+    stub_server.reply(500, b'internal error')
+    analyzer = GeminiBatchAnalyzer('key', batch_size=2, concurrency=1,
+                                   rate_limiter=RateLimiter(rate_per_minute=6000),
+                                   client=HttpClient(backoff_base=0.001, timeout=5, max_retries=0))
+
+    results = analyzer.analyze({"app-a": {"total": 1}, "app-b": {"total": 2}})
+
+    assert len(stub_server.requests) == 2
+    assert results["app-a"]["analysis"]["executive_summary"] == "executive_summary of app-a"
+    assert results["app-b"]["analysis"] is None
+    assert "500" in results["app-b"]["error"]
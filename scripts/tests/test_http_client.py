@@ -0,0 +1,101 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from http_client import HttpClient
+
+
+def make_client(**kwargs):
+    kwargs.setdefault('backoff_base', 0.001)
+    kwargs.setdefault('timeout', 5)
+    return HttpClient(**kwargs)
+
+
+def test_retries_after_retry_after_header(stub_server):
+    stub_server.reply(429, Retry_After='0')
+    stub_server.reply(200, b'{"ok": true}')
+    client = make_client()
+
+    response = client.get(stub_server.url + '/api', name="api")
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert len(stub_server.requests) == 2
+    assert client.stats["api"]["retries"] == 1
+    assert client.stats["api"]["errors"] == 0
+
+
+def test_retry_after_seconds_and_http_date():
+    client = make_client(backoff_max=30.0)
+    response = requests.Response()
+
+    response.headers['Retry-After'] = '7'
+    assert client._retry_after(response) == 7.0
+
+    # Capped at backoff_max
+    response.headers['Retry-After'] = '3600'
+    assert client._retry_after(response) == 30.0
+
+    when = datetime.now(timezone.utc) + timedelta(seconds=10)
+    response.headers['Retry-After'] = format_datetime(when, usegmt=True)
+    assert 8.0 <= client._retry_after(response) <= 10.0
+
+    response.headers['Retry-After'] = 'soon'
+    assert client._retry_after(response) is None
+
+
+def test_gives_up_and_returns_last_response(stub_server):
+    stub_server.reply(503, b'busy')
+    client = make_client(max_retries=2)
+
+    response = client.post(stub_server.url + '/generate', name="generate", json={})
+
+    assert response.status_code == 503
+    assert len(stub_server.requests) == 3
+    assert client.stats["generate"] == {
+        "calls": 1, "retries": 2, "errors": 1,
+        "seconds": client.stats["generate"]["seconds"],
+        "max_seconds": client.stats["generate"]["max_seconds"]
+    }
+
+
+def test_client_errors_are_not_retried(stub_server):
+    stub_server.reply(404, b'missing')
+    client = make_client()
+
+    assert client.get(stub_server.url + '/nope').status_code == 404
+    assert len(stub_server.requests) == 1
+    assert client.stats["/nope"]["retries"] == 0
+
+
+def test_connection_errors_raise_after_retries(stub_server):
+    url = stub_server.url
+    stub_server.close()
+    client = make_client(max_retries=1)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(url + '/down', name="down")
+    assert client.stats["down"]["retries"] == 1
+    assert client.stats["down"]["errors"] == 1
+
+
+def test_post_is_not_resent_after_a_read_timeout(stub_server):
+    stub_server.reply(200, b'{}', delay=0.5)
+    client = make_client(timeout=0.1)
+
+    with pytest.raises(requests.ReadTimeout):
+        client.post(stub_server.url + '/generate', name="generate", json={})
+    assert len(stub_server.requests) == 1
+    assert client.stats["generate"]["retries"] == 0
+
+
+def test_get_is_retried_after_a_read_timeout(stub_server):
+    stub_server.reply(200, b'slow', delay=0.5)
+    stub_server.reply(200, b'{"ok": true}')
+    client = make_client(timeout=0.1)
+
+    assert client.get(stub_server.url + '/api', name="api").json() == {"ok": True}
+    assert len(stub_server.requests) == 2
+    assert client.stats["api"]["retries"] == 1
@@ -0,0 +1,36 @@
+import io
+import json
+
+import pytest
+
+from report_format import JsonArrayStream
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def test_items_split_across_chunks_are_completed():
+    items = [{"Target": "pom.xml", "Vulnerabilities": [{"id": i, "ok": True, "no": False, "fix": None, "t": "é" * i}
+                                                     for i in range(50)]}]
+    stream = JsonArrayStream(io.StringIO(json.dumps({"Results": items})), chunk_size=7)
+
+    found = [v["id"] for _, v in stream.items(("Results", "*", "Vulnerabilities", "*"))]
+
+    assert found == list(range(50))
+
+
+def test_malformed_item_fails_without_reading_the_rest_of_the_file():
+    good = ",".join(json.dumps({"id": i}) for i in range(10000))
+    reader = CountingReader('[{"id": 1, "bad": nope}, ' + good + ']')
+    stream = JsonArrayStream(reader, chunk_size=4096)
+
+    with pytest.raises(json.JSONDecodeError, match="Expecting value"):
+        list(stream.items(("*",)))
+    assert reader.reads == 1
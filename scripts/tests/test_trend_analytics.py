@@ -0,0 +1,205 @@
+import math
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from ai_trend_intelligence import analyze_trend_direction
+from trend_analytics import (
+    CHANGE_POINT_MIN_DAYS, CHANGE_POINT_Z, EWMA_HALFLIFE_DAYS, SLOPE_WINDOW, TREND_WINDOW,
+    TrendSeries, analyze, calculate_risk_score
+)
+
+END = date(2026, 10, 16)
+
+
+# The per-dict implementations the NumPy module replaced, as they were in ai_trend_intelligence.py
+
+def old_calculate_risk_score(trends, secrets):
+    if not trends:
+        return 0, "UNKNOWN"
+    latest = trends[0]
+    vuln_score = latest['critical'] * 10 + latest['high'] * 5 + latest['medium'] * 2 + latest['low'] * 0.5
+    secret_score = secrets[0]['count'] * 15 if secrets else 0
+    risk_score = min(100, vuln_score + secret_score)
+    if risk_score <= 20:
+        return risk_score, "LOW"
+    elif risk_score <= 50:
+        return risk_score, "MEDIUM"
+    elif risk_score <= 80:
+        return risk_score, "HIGH"
+    return risk_score, "CRITICAL"
+
+
+def old_analyze_trend_direction(trends):
+    if len(trends) < 2:
+        return "INSUFFICIENT_DATA", 0
+    recent = trends[:7]
+    older = trends[7:14] if len(trends) >= 14 else trends[7:]
+    if not older:
+        return "INSUFFICIENT_DATA", 0
+    recent_avg = sum(t['total'] for t in recent) / len(recent)
+    older_avg = sum(t['total'] for t in older) / len(older)
+    change_pct = ((recent_avg - older_avg) / older_avg * 100) if older_avg > 0 else 0
+    if change_pct > 10:
+        return "DEGRADING", change_pct
+    elif change_pct < -10:
+        return "IMPROVING", change_pct
+    return "STABLE", change_pct
+
+
+def history(seed, days=60, scan_rate=1.0, gap=None, secret_rate=0.3):
+    """Newest-first trend and secret rows like the Athena queries return; gap is a (start, stop) day range"""
+    rng = random.Random(seed)
+    level = rng.randint(5, 60)
+    trends, secrets = [], []
+    for offset in range(days):
+        day = END - timedelta(days=offset)
+        if gap and gap[0] <= offset < gap[1] or rng.random() >= scan_rate:
+            continue
+        if offset == days // 2:
+            level += rng.choice([-30, 30])
+        counts = {sev: max(0, level // n + rng.randint(-3, 3)) for sev, n in
+                  (("critical", 12), ("high", 6), ("medium", 3), ("low", 2))}
+        trends.append({"date": day.isoformat(), **counts, "total": sum(counts.values())})
+        if rng.random() < secret_rate:
+            secrets.append({"date": day.isoformat(), "count": rng.randint(0, 2), "files": 1})
+    return trends, secrets
+
+
+def calendar_days(trends):
+    """{day offset before the newest day: total}, the reference model of the day axis"""
+    days = {date.fromisoformat(t['date']): t['total'] for t in trends}
+    last = max(days)
+    return {(last - day).days: total for day, total in days.items()}
+
+
+def reference_risk_by_day(trends, secrets):
+    risks = {}
+    secret_counts = {s['date']: s['count'] for s in secrets}
+    for t in trends:
+        score = t['critical'] * 10 + t['high'] * 5 + t['medium'] * 2 + t['low'] * 0.5
+        risks[t['date']] = min(100, score + secret_counts.get(t['date'], 0) * 15)
+    return risks
+
+
+def reference_ewma(trends, secrets):
+    alpha = 1.0 - 0.5 ** (1.0 / EWMA_HALFLIFE_DAYS)
+    risks = reference_risk_by_day(trends, secrets)
+    state = None
+    for day in sorted(risks):
+        state = risks[day] if state is None else state + alpha * (risks[day] - state)
+    return state
+
+
+def reference_rolling(trends):
+    days = calendar_days(trends)
+    window = [total for offset, total in days.items() if offset < TREND_WINDOW]
+    return sum(window) / len(window)
+
+
+def reference_slope(trends, secrets):
+    axis_end = max(date.fromisoformat(r['date']) for r in trends + secrets)
+    points = [((date.fromisoformat(t['date']) - axis_end).days, t['total']) for t in trends]
+    points = [(x, y) for x, y in points if x > -SLOPE_WINDOW]
+    if len({x for x, _ in points}) < 2:
+        return None
+    n = len(points)
+    mx = sum(x for x, _ in points) / n
+    my = sum(y for _, y in points) / n
+    return sum((x - mx) * (y - my) for x, y in points) / sum((x - mx) ** 2 for x, _ in points)
+
+
+def reference_change_point(trends):
+    """Best split of the scanned days by a two-sample z score; (first day of the new level, shift) or None"""
+    series = sorted((date.fromisoformat(t['date']), t['total']) for t in trends)
+    best = None
+    for k in range(CHANGE_POINT_MIN_DAYS, len(series) - CHANGE_POINT_MIN_DAYS + 1):
+        left = [y for _, y in series[:k]]
+        right = [y for _, y in series[k:]]
+        mean_l, mean_r = sum(left) / len(left), sum(right) / len(right)
+        sse = sum((y - mean_l) ** 2 for y in left) + sum((y - mean_r) ** 2 for y in right)
+        sigma = math.sqrt(sse / max(len(series) - 2, 1))
+        z = abs(mean_r - mean_l) / (max(sigma, 1e-9) * math.sqrt(1 / len(left) + 1 / len(right)))
+        if best is None or z > best[0]:
+            best = (z, series[k][0], mean_r - mean_l)
+    if best is None or best[0] < CHANGE_POINT_Z:
+        return None
+    return best[1].isoformat(), best[2]
+
+
+HISTORIES = {
+    "daily": dict(),
+    "sparse": dict(scan_rate=0.35),
+    "gapped": dict(gap=(8, 25)),
+    "recent gap": dict(gap=(0, 9)),
+    "short": dict(days=9),
+}
+
+
+def test_repository_without_scans_has_no_statistics():
+    # No dated rows at all leaves a zero-length day axis
+    results = analyze(TrendSeries.from_repos({"app": ([], [])}))
+
+    assert results == [{
+        "repo": "app", "risk_score": None, "risk_level": "UNKNOWN", "trend_direction": "INSUFFICIENT_DATA",
+        "change_pct": 0.0, "rolling_7d_total": None, "ewma_risk": None, "slope_per_day": None,
+        "change_point": None
+    }]
+    assert calculate_risk_score([], []) == (0, "UNKNOWN")
+
+
+def test_latest_risk_uses_the_latest_scan_and_latest_secret_scan():
+    trends = [
+        {"date": "2026-10-16", "critical": 1, "high": 2, "medium": 0, "low": 0, "total": 3},
+        {"date": "2026-10-15", "critical": 9, "high": 9, "medium": 9, "low": 9, "total": 36},
+    ]
+    secrets = [{"date": "2026-10-14", "count": 1, "files": 1}]
+
+    assert calculate_risk_score(trends, secrets) == (35, "MEDIUM")
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_daily_history_matches_the_old_per_dict_functions(seed):
+    trends, secrets = history(seed)
+
+    assert calculate_risk_score(trends, secrets) == old_calculate_risk_score(trends, secrets)
+    direction, change = analyze_trend_direction(trends)
+    old_direction, old_change = old_analyze_trend_direction(trends)
+    assert direction == old_direction and change == pytest.approx(old_change)
+
+
+@pytest.mark.parametrize("shape", HISTORIES)
+@pytest.mark.parametrize("seed", range(10))
+def test_statistics_match_per_day_reference_loops(shape, seed):
+    trends, secrets = history(seed, **HISTORIES[shape])
+    if not trends:
+        pytest.skip("no scans drawn")
+
+    # The risk score only ever looked at the newest rows, so gaps do not change it
+    assert calculate_risk_score(trends, secrets) == old_calculate_risk_score(trends, secrets)
+
+    stats = analyze(TrendSeries.from_trends(trends, secrets))[0]
+    assert stats["ewma_risk"] == pytest.approx(reference_ewma(trends, secrets), abs=0.051)
+    assert stats["rolling_7d_total"] == pytest.approx(reference_rolling(trends), abs=0.051)
+    slope = reference_slope(trends, secrets)
+    assert stats["slope_per_day"] == (None if slope is None else pytest.approx(slope, abs=0.0051))
+
+    change_point = reference_change_point(trends)
+    if change_point is None:
+        assert stats["change_point"] is None
+    else:
+        assert stats["change_point"]["date"] == change_point[0]
+        assert stats["change_point"]["shift"] == pytest.approx(change_point[1], abs=0.051)
+
+    # Trend direction compares calendar weeks, so a gap leaves older scans out instead of sliding them in
+    days = calendar_days(trends)
+    recent = [total for offset, total in days.items() if offset < TREND_WINDOW]
+    older = [total for offset, total in days.items() if TREND_WINDOW <= offset < 2 * TREND_WINDOW]
+    direction, change = analyze_trend_direction(trends)
+    if not older:
+        assert direction == "INSUFFICIENT_DATA"
+    else:
+        older_avg = sum(older) / len(older)
+        expected = (sum(recent) / len(recent) - older_avg) / older_avg * 100 if older_avg > 0 else 0
+        assert change == pytest.approx(expected)
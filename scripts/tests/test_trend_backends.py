@@ -0,0 +1,61 @@
+import shutil
+from datetime import date
+
+from generate_test_data import save_to_directory
+from trend_backends import LocalBackend, local_index_file
+
+TRENDS = """
+    SELECT scan_date, critical_count, total_count, secret_count
+    FROM security_analytics.daily_security_summary ORDER BY scan_date
+    """
+
+
+def write_run(directory, day, run_number, severities, secrets=1):
+    save_to_directory(str(directory), day, run_number, {
+        "trivy-report.json": {"Results": [{"Target": "pom.xml", "Vulnerabilities": [
+            {"VulnerabilityID": f"CVE-{i}", "PkgName": "guava", "InstalledVersion": "1.0", "Severity": severity}
+            for i, severity in enumerate(severities)
+        ]}]},
+        "gitleaks-report.json": [
+            {"RuleID": "aws", "File": f"app-{i}.env", "StartLine": 1, "Fingerprint": f"fp-{i}"} for i in range(secrets)
+        ],
+    })
+
+
+def query(backend):
+    return [tuple(row) for row in backend.run_queries({"trends": TRENDS})["trends"]]
+
+
+def test_index_persists_and_only_reads_new_or_deleted_runs(tmp_path):
+    reports, index_file = tmp_path / "reports", str(tmp_path / "cache" / "local-index.sqlite")
+    write_run(reports, date(2026, 10, 14), 1, ["CRITICAL", "LOW"])
+    write_run(reports, date(2026, 10, 15), 2, ["HIGH"], secrets=2)
+
+    first = LocalBackend(str(reports), index_file)
+    assert query(first) == [("2026-10-14", 1, 2, 1), ("2026-10-15", 0, 1, 2)]
+    assert first.stats["index"]["runs"] == 4 and first.stats["index"]["rows"] == 6
+
+    # A later run reuses the file and has nothing new to read
+    second = LocalBackend(str(reports), index_file)
+    assert query(second) == query(first)
+    assert second.stats["index"]["runs"] == 0 and second.stats["index"]["rows"] == 0
+
+    write_run(reports, date(2026, 10, 16), 3, ["CRITICAL", "CRITICAL"], secrets=0)
+    shutil.rmtree(reports / "trivy" / "2026" / "10" / "14")
+    third = LocalBackend(str(reports), index_file)
+    assert query(third) == [("2026-10-14", 0, 0, 1), ("2026-10-15", 0, 1, 2), ("2026-10-16", 2, 2, 0)]
+    assert third.stats["index"]["runs"] == 2 and third.stats["index"]["dropped_runs"] == 1
+
+
+def test_index_for_another_directory_is_rebuilt(tmp_path):
+    index_file = str(tmp_path / "local-index.sqlite")
+    write_run(tmp_path / "a", date(2026, 10, 14), 1, ["CRITICAL"])
+    write_run(tmp_path / "b", date(2026, 10, 15), 1, ["LOW"])
+
+    assert query(LocalBackend(str(tmp_path / "a"), index_file)) == [("2026-10-14", 1, 1, 1)]
+    assert query(LocalBackend(str(tmp_path / "b"), index_file)) == [("2026-10-15", 0, 1, 1)]
+
+
+def test_each_report_directory_gets_its_own_index_file(tmp_path):
+    assert local_index_file(str(tmp_path / "app-a")) != local_index_file(str(tmp_path / "app-b"))
+    assert local_index_file(str(tmp_path / "app-a")).endswith(".sqlite")
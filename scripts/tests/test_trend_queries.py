@@ -0,0 +1,78 @@
+from datetime import date
+
+from botocore.stub import ANY
+
+from ai_trend_intelligence import QUERY_SETS, TREND_QUERIES, date_filter, fetch_trend_data
+from athena_client import AthenaQueryExecutor, AthenaResultCache
+from conftest import execution, result_page
+from trend_backends import AthenaBackend
+
+TREND_COLUMNS = [('scan_date', 'varchar'), ('critical_count', 'bigint'), ('high_count', 'bigint'),
+                 ('medium_count', 'bigint'), ('low_count', 'bigint'), ('total_count', 'bigint')]
+
+
+def test_trend_queries_start_together_and_share_one_status_poll(athena_stub):
+    client, stubber = athena_stub
+    ids = ['q-trends', 'q-critical', 'q-secrets']
+    # All three are submitted before anything is polled...
+    for qid in ids:
+        stubber.add_response('start_query_execution', {'QueryExecutionId': qid}, {
+            'QueryString': ANY, 'QueryExecutionContext': ANY, 'ResultConfiguration': ANY
+        })
+    # ...and one batched status call covers them
+    stubber.add_response('batch_get_query_execution', {
+        'QueryExecutions': [execution(qid, 'SUCCEEDED', DataScannedInBytes=100) for qid in ids],
+        'UnprocessedQueryExecutionIds': []
+    }, {'QueryExecutionIds': ids})
+    stubber.add_response('get_query_results', result_page(TREND_COLUMNS, [
+        [name for name, _ in TREND_COLUMNS],
+        ['2026-10-15', '2', '5', '7', '1', '15'],
+    ]), {'QueryExecutionId': 'q-trends', 'MaxResults': ANY})
+    stubber.add_response('get_query_results', result_page([('vulnerabilityid', 'varchar')], []),
+                         {'QueryExecutionId': 'q-critical', 'MaxResults': ANY})
+    stubber.add_response('get_query_results', result_page([('scan_date', 'varchar')], []),
+                         {'QueryExecutionId': 'q-secrets', 'MaxResults': ANY})
+
+    executor = AthenaQueryExecutor(client=client, output_location='s3://bucket/results/',
+                                   poll_initial=0, result_reuse_minutes=0)
+    backend = AthenaBackend(executor=executor, result_cache=AthenaResultCache(enabled=False))
+    errors = {}
+
+    data = fetch_trend_data(tuple(TREND_QUERIES), 30, date(2026, 10, 16), tables='raw',
+                            backend=backend, errors=errors)
+
+    assert errors == {}
+    assert data['trends'][0]['date'] == '2026-10-15'
+    assert data['trends'][0]['critical'] == 2
+    assert data['critical_issues'] == [] and data['secrets'] == []
+    assert executor.total_bytes_scanned() == 300
+
+
+def test_days_missing_from_the_rollup_are_read_from_the_raw_tables(athena_stub):
+    client, stubber = athena_stub
+    # The rollup only has today, as CI rolls up one partition per run
+    for qid, rows in (('q-rollup', [['2026-10-16', '1', '0', '0', '0', '1']]),
+                      ('q-raw', [['2026-10-14', '3', '1', '0', '0', '4']])):
+        query = {'q-rollup': QUERY_SETS['rollup']['trends'].format(
+                     date_filter=date_filter(date(2026, 10, 13), date(2026, 10, 16))),
+                 'q-raw': QUERY_SETS['raw']['trends'].format(
+                     date_filter=date_filter(date(2026, 10, 13), date(2026, 10, 15)))}[qid]
+        stubber.add_response('start_query_execution', {'QueryExecutionId': qid}, {
+            'QueryString': query, 'QueryExecutionContext': ANY, 'ResultConfiguration': ANY
+        })
+        stubber.add_response('batch_get_query_execution', {
+            'QueryExecutions': [execution(qid, 'SUCCEEDED', DataScannedInBytes=10)],
+            'UnprocessedQueryExecutionIds': []
+        }, {'QueryExecutionIds': [qid]})
+        stubber.add_response('get_query_results', result_page(TREND_COLUMNS, [
+            [name for name, _ in TREND_COLUMNS], *rows
+        ]), {'QueryExecutionId': qid, 'MaxResults': ANY})
+
+    executor = AthenaQueryExecutor(client=client, output_location='s3://bucket/results/',
+                                   poll_initial=0, result_reuse_minutes=0)
+    backend = AthenaBackend(executor=executor, result_cache=AthenaResultCache(enabled=False))
+
+    data = fetch_trend_data(('trends',), 3, date(2026, 10, 16), tables='rollup', backend=backend)
+
+    assert [day['date'] for day in data['trends']] == ['2026-10-16', '2026-10-14']
+    assert data['trends'][1]['critical'] == 3
@@ -0,0 +1,347 @@
+"""
+Trend Analytics
+
+NumPy-backed statistics for the trend intelligence scripts. A
+TrendSeries holds daily severity counts for one or many repositories on
+a shared calendar axis (oldest day first), with a mask for days that had
+a scan. Every statistic - risk scores, rolling averages, exponentially
+weighted risk, least-squares slope and change-point detection - is
+computed for all repositories and severities at once with array
+operations, so thousands of repos over years of history take
+milliseconds.
+"""
+
+import os
+from datetime import date, timedelta
+
+import numpy as np
+
+SEVERITY_COLUMNS = ('critical', 'high', 'medium', 'low')
+SEVERITY_WEIGHTS = np.array([10.0, 5.0, 2.0, 0.5])
+SECRET_WEIGHT = 15.0
+MAX_RISK = 100.0
+# Upper bounds of the LOW / MEDIUM / HIGH risk levels; anything above is CRITICAL
+RISK_LEVEL_BOUNDS = np.array([20.0, 50.0, 80.0])
+RISK_LEVELS = np.array(["LOW", "MEDIUM", "HIGH", "CRITICAL"])
+
+TREND_WINDOW = 7
+TREND_THRESHOLD_PCT = 10.0
+EWMA_HALFLIFE_DAYS = float(os.getenv('TREND_EWMA_HALFLIFE_DAYS', '3'))
+SLOPE_WINDOW = 30
+CHANGE_POINT_MIN_DAYS = 3
+CHANGE_POINT_Z = 3.0
+# Repos analyzed per block; keeps the (repos, days) temporaries cache-sized
+ANALYZE_BLOCK_REPOS = 128
+
+
+class TrendSeries:
+    """Daily counts for R repositories over D consecutive days.
+
+    counts is (R, D, 4) in SEVERITY_COLUMNS order, totals and secrets are
+    (R, D), and present / secret_present mark the days that actually had
+    a Trivy / Gitleaks result. Absent days hold zeros and are ignored by
+    every statistic.
+    """
+
+    def __init__(self, repos, start, counts, totals, present, secrets=None, secret_present=None):
+        self.repos = list(repos)
+        self.start = start
+        self.counts = np.asarray(counts, dtype=float)
+        self.totals = np.asarray(totals, dtype=float)
+        self.present = np.asarray(present, dtype=bool)
+        shape = self.totals.shape
+        self.secrets = np.zeros(shape) if secrets is None else np.asarray(secrets, dtype=float)
+        self.secret_present = np.zeros(shape, dtype=bool) if secret_present is None else np.asarray(secret_present, dtype=bool)
+
+    @property
+    def days(self):
+        return self.totals.shape[1]
+
+    def date_at(self, index):
+        return self.start + timedelta(days=int(index))
+
+    @classmethod
+    def from_repos(cls, data):
+        """Build from {repo: (trends, secrets)} where both are parsed trend dicts"""
+        repos = list(data)
+        parsed = []
+        all_days = []
+        for trends, secrets in data.values():
+            trend_days = [date.fromisoformat(t['date']) for t in trends if t.get('date')]
+            secret_days = [date.fromisoformat(s['date']) for s in secrets or [] if s.get('date')]
+            parsed.append((trend_days, secret_days))
+            all_days.extend(trend_days)
+            all_days.extend(secret_days)
+
+        start = min(all_days) if all_days else date.today()
+        days = (max(all_days) - start).days + 1 if all_days else 0
+        shape = (len(repos), days)
+        counts = np.zeros(shape + (len(SEVERITY_COLUMNS),))
+        totals = np.zeros(shape)
+        present = np.zeros(shape, dtype=bool)
+        secret_counts = np.zeros(shape)
+        secret_present = np.zeros(shape, dtype=bool)
+
+        for r, ((trends, secrets), (trend_days, secret_days)) in enumerate(zip(data.values(), parsed)):
+            trends = [t for t in trends if t.get('date')]
+            if trends:
+                idx = np.array([(d - start).days for d in trend_days])
+                counts[r, idx] = [[t.get(c, 0) for c in SEVERITY_COLUMNS] for t in trends]
+                totals[r, idx] = [t.get('total', 0) for t in trends]
+                present[r, idx] = True
+            secrets = [s for s in secrets or [] if s.get('date')]
+            if secrets:
+                idx = np.array([(d - start).days for d in secret_days])
+                secret_counts[r, idx] = [s.get('count', 0) for s in secrets]
+                secret_present[r, idx] = True
+
+        return cls(repos, start, counts, totals, present, secret_counts, secret_present)
+
+    @classmethod
+    def from_trends(cls, trends, secrets=None, repo='default'):
+        """Single-repo series from the parsed trend and secret dicts (any order)"""
+        return cls.from_repos({repo: (trends, secrets or [])})
+
+    def block(self, start, stop):
+        """View of repos [start, stop) sharing this series' day axis"""
+        return TrendSeries(
+            self.repos[start:stop], self.start, self.counts[start:stop], self.totals[start:stop],
+            self.present[start:stop], self.secrets[start:stop], self.secret_present[start:stop]
+        )
+
+    def risk_scores(self):
+        """(R, D) daily risk score: weighted severities plus the secret penalty, capped at 100"""
+        raw = self.counts @ SEVERITY_WEIGHTS + self.secrets * SECRET_WEIGHT
+        return np.minimum(MAX_RISK, raw)
+
+    def latest_risk(self):
+        """(R,) risk of each repo's latest scan plus the secrets of its latest secret scan.
+
+        NaN for repos without any scan.
+        """
+        vuln = value_at(self.counts @ SEVERITY_WEIGHTS, last_present_index(self.present))
+        secret = np.nan_to_num(value_at(self.secrets, last_present_index(self.secret_present)))
+        return np.minimum(MAX_RISK, vuln + secret * SECRET_WEIGHT)
+
+
+def risk_levels(scores):
+    """Risk level names for an array of scores; UNKNOWN where the score is NaN"""
+    scores = np.asarray(scores, dtype=float)
+    levels = RISK_LEVELS[np.searchsorted(RISK_LEVEL_BOUNDS, np.nan_to_num(scores), side='left')]
+    return np.where(np.isnan(scores), "UNKNOWN", levels)
+
+
+def plain_number(value):
+    """Round to one decimal and drop a trailing .0, for JSON and prompts"""
+    value = round(float(value), 1)
+    return int(value) if value.is_integer() else value
+
+
+def calculate_risk_score(trends, secrets):
+    """Security risk score (0-100) and level from the latest scan and latest secret scan"""
+    if not trends:
+        return 0, "UNKNOWN"
+
+    score = TrendSeries.from_trends(trends, secrets).latest_risk()
+    if score[0] != score[0]:  # NaN: no dated scan
+        return 0, "UNKNOWN"
+    return plain_number(score[0]), str(risk_levels(score)[0])
+
+
+def last_present_index(present):
+    """(R,) index of the last True day per row, -1 if none"""
+    days = present.shape[-1]
+    if days == 0:
+        return np.full(present.shape[:-1], -1)
+    reversed_first = np.argmax(present[..., ::-1], axis=-1)
+    return np.where(present.any(axis=-1), days - 1 - reversed_first, -1)
+
+
+def value_at(values, index):
+    """(R,) values[r, index[r]] of an (R, D) array, NaN where index is -1"""
+    if values.shape[-1] == 0:
+        return np.full(values.shape[:-1], np.nan)
+    picked = values[np.arange(values.shape[0]), np.maximum(index, 0)]
+    return np.where(index >= 0, picked, np.nan)
+
+
+def _trailing_sum(values, window):
+    """Sum of the last `window` entries along the day axis, at every day"""
+    padded = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    np.cumsum(values, axis=-1, out=padded[..., 1:])
+    out = padded[..., 1:].copy()
+    if window < values.shape[-1]:
+        out[..., window:] -= padded[..., 1:-window]
+    return out
+
+
+def rolling_mean(values, present, window=TREND_WINDOW):
+    """Trailing mean over the scanned days of each `window`-day span; NaN where none were scanned"""
+    w = _trailing_sum(present.astype(float), window)
+    s = _trailing_sum(np.where(present, values, 0.0), window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(w > 0, s / w, np.nan)
+
+
+def _span_mean(values, present, start, stop):
+    """Mean over the scanned days of [start, stop) along the day axis; NaN if none"""
+    w = present[..., start:stop].sum(axis=-1)
+    s = np.where(present[..., start:stop], values[..., start:stop], 0.0).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(w > 0, s / w, np.nan)
+
+
+def ewma(values, present, halflife=EWMA_HALFLIFE_DAYS):
+    """Exponentially weighted average along the day axis, updated only on scanned days.
+
+    Starts at each row's first scanned value; NaN before it.
+    """
+    if values.shape[-1] == 0:
+        return np.full(values.shape, np.nan)
+    alpha = 1.0 - 0.5 ** (1.0 / halflife)
+    # Walk the days over contiguous (D, R) copies; column slices of (R, D) are strided
+    x = np.moveaxis(values, -1, 0).copy()
+    gain = np.moveaxis(present, -1, 0) * alpha
+    first = np.argmax(present, axis=-1)
+    state = np.take_along_axis(values, first[..., None], axis=-1)[..., 0].astype(float)
+    out = np.empty_like(x)
+    for d in range(x.shape[0]):
+        state += gain[d] * (x[d] - state)
+        out[d] = state
+    out = np.moveaxis(out, 0, -1)
+    out[np.cumsum(present, axis=-1) == 0] = np.nan
+    return out
+
+
+def least_squares_slope(values, present, window=SLOPE_WINDOW):
+    """Per-day slope of a least-squares line through the scanned days of the last `window` days"""
+    days = values.shape[-1]
+    window = min(window, days)
+    y = values[..., days - window:]
+    w = present[..., days - window:].astype(float)
+    x = np.arange(window, dtype=float)
+
+    sw = w.sum(axis=-1)
+    sx = (w * x).sum(axis=-1)
+    sy = (w * y).sum(axis=-1)
+    sxx = (w * x * x).sum(axis=-1)
+    sxy = (w * x * y).sum(axis=-1)
+    denominator = sw * sxx - sx * sx
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(denominator > 0, (sw * sxy - sx * sy) / denominator, np.nan)
+
+
+def detect_change_point(values, present, min_days=CHANGE_POINT_MIN_DAYS, z_threshold=CHANGE_POINT_Z):
+    """Most likely single mean shift along the day axis.
+
+    Every split is scored at once from cumulative sums with a two-sample
+    z statistic (difference of segment means over the pooled within-segment
+    deviation). Returns (index, shift, z): index is the first day of the
+    new level, or -1 where no split reaches z_threshold.
+    """
+    y = np.where(present, values, 0.0)
+    n_left = np.cumsum(present, axis=-1, dtype=float)[..., :-1]
+    s_left = np.cumsum(y, axis=-1)[..., :-1]
+    n = present.sum(axis=-1, keepdims=True)
+    s = y.sum(axis=-1, keepdims=True)
+    y *= y
+    q_left = np.cumsum(y, axis=-1)[..., :-1]
+    q = y.sum(axis=-1, keepdims=True)
+    n_right, s_right = n - n_left, s - s_left
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_left = s_left / n_left
+        mean_right = s_right / n_right
+        # Within-segment sum of squares: q - s * mean on each side
+        sse = q - s_left * mean_left - s_right * mean_right
+        sigma = np.sqrt(np.maximum(sse, 0.0) / np.maximum(n - 2, 1))
+        shift = mean_right - mean_left
+        z = np.abs(shift) / (np.maximum(sigma, 1e-9) * np.sqrt(1.0 / n_left + 1.0 / n_right))
+    # Only splits with enough scans on both sides, placed right before a scanned day
+    z[(n_left < min_days) | (n_right < min_days) | ~present[..., 1:]] = -np.inf
+
+    if z.shape[-1] == 0:
+        empty = np.full(values.shape[:-1], -1)
+        return empty, np.zeros(empty.shape), np.zeros(empty.shape)
+    best = np.argmax(z, axis=-1)
+    best_z = np.take_along_axis(z, best[..., None], axis=-1)[..., 0]
+    best_shift = np.take_along_axis(shift, best[..., None], axis=-1)[..., 0]
+    found = best_z >= z_threshold
+    return np.where(found, best + 1, -1), np.where(found, best_shift, 0.0), np.where(found, best_z, 0.0)
+
+
+def trend_direction(totals, present, window=TREND_WINDOW, threshold_pct=TREND_THRESHOLD_PCT):
+    """Compare the mean of the last `window` days with the `window` days before it.
+
+    Returns (directions, change_pct) arrays: IMPROVING / DEGRADING when the
+    change passes threshold_pct, STABLE otherwise, INSUFFICIENT_DATA when
+    either span has no scans.
+    """
+    days = totals.shape[-1]
+    recent = _span_mean(totals, present, max(0, days - window), days)
+    older = _span_mean(totals, present, max(0, days - 2 * window), max(0, days - window))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        change = np.where(older > 0, (recent - older) / older * 100.0, 0.0)
+    change = np.nan_to_num(change)
+    directions = np.select(
+        [np.isnan(recent) | np.isnan(older), change > threshold_pct, change < -threshold_pct],
+        ["INSUFFICIENT_DATA", "DEGRADING", "IMPROVING"],
+        "STABLE"
+    )
+    return directions, np.where(directions == "INSUFFICIENT_DATA", 0.0, change)
+
+
+def _analyze_block(series):
+    latest = series.latest_risk()
+    directions, change = trend_direction(series.totals, series.present)
+    last = last_present_index(series.present)
+    cp_index, cp_shift, cp_z = detect_change_point(series.totals, series.present)
+    return {
+        "latest": latest,
+        "levels": risk_levels(latest),
+        "directions": directions,
+        "change": change,
+        "last": last,
+        "rolling": value_at(rolling_mean(series.totals, series.present), last),
+        "ewma": value_at(ewma(series.risk_scores(), series.present), last),
+        "slope": least_squares_slope(series.totals, series.present),
+        "cp_index": cp_index,
+        "cp_shift": cp_shift,
+        "cp_z": cp_z,
+    }
+
+
+def _rounded(value, digits=1):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def analyze(series):
+    """Per-repo summary of every statistic, as plain dicts in series.repos order"""
+    blocks = [
+        _analyze_block(series.block(i, i + ANALYZE_BLOCK_REPOS))
+        for i in range(0, len(series.repos), ANALYZE_BLOCK_REPOS)
+    ]
+    if not blocks:
+        return []
+    stats = {key: np.concatenate([b[key] for b in blocks]) for key in blocks[0]}
+
+    results = []
+    for r, repo in enumerate(series.repos):
+        scanned = stats["last"][r] >= 0
+        results.append({
+            "repo": repo,
+            "risk_score": _rounded(stats["latest"][r]),
+            "risk_level": str(stats["levels"][r]),
+            "trend_direction": str(stats["directions"][r]),
+            "change_pct": round(float(stats["change"][r]), 1),
+            "rolling_7d_total": _rounded(stats["rolling"][r]) if scanned else None,
+            "ewma_risk": _rounded(stats["ewma"][r]) if scanned else None,
+            "slope_per_day": _rounded(stats["slope"][r], 2),
+            "change_point": None if stats["cp_index"][r] < 0 else {
+                "date": series.date_at(stats["cp_index"][r]).isoformat(),
+                "shift": round(float(stats["cp_shift"][r]), 1),
+                "z": round(float(stats["cp_z"][r]), 1)
+            }
+        })
+    return results
@@ -0,0 +1,309 @@
+"""
+Trend Query Backends
+
+The trend script sends its SQL through a backend chosen with
+TREND_BACKEND: 'athena' (default) runs it on Amazon Athena, 'local'
+runs it on an embedded SQLite index of a report directory laid out the
+way upload_to_s3/save_to_directory write it
+(trivy/YYYY/MM/DD/run-NNN/trivy-report.json, ...).
+
+The local index holds the same flat *_findings tables that
+compact_reports.py writes, plus a daily_security_summary view, inside a
+schema named security_analytics. The 'compacted' and 'rollup' query sets
+therefore run unchanged, with no AWS account and no per-query latency.
+
+The index is a SQLite file per report directory under LOCAL_INDEX_DIR
+(default .athena-cache/local-index) that persists between runs. Each run only parses the
+run-NNN directories that are new or whose files changed since the last
+one, and drops the rows of runs that were deleted. A different report
+directory or table layout rebuilds it from scratch.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from instrumentation import get_tracer
+
+TREND_BACKEND = os.getenv('TREND_BACKEND', 'athena')
+LOCAL_REPORTS_DIR = os.getenv('LOCAL_REPORTS_DIR', 'reports')
+# Persistent local indexes, one file per report directory
+LOCAL_INDEX_DIR = os.getenv(
+    'LOCAL_INDEX_DIR', os.path.join(os.getenv('ATHENA_CACHE_DIR', '.athena-cache'), 'local-index')
+)
+# Bump when the way reports are indexed changes, so existing index files are rebuilt
+LOCAL_INDEX_VERSION = 1
+
+SQLITE_TYPES = {"string": "TEXT", "int": "INTEGER", "double": "REAL"}
+
+DAILY_SUMMARY_VIEW = """
+    CREATE VIEW security_analytics.daily_security_summary AS
+    SELECT
+      d.year, d.month, d.day,
+      d.year || '-' || d.month || '-' || d.day AS scan_date,
+      COALESCE(v.critical_count, 0) AS critical_count,
+      COALESCE(v.high_count, 0) AS high_count,
+      COALESCE(v.medium_count, 0) AS medium_count,
+      COALESCE(v.low_count, 0) AS low_count,
+      COALESCE(v.total_count, 0) AS total_count,
+      COALESCE(s.secret_count, 0) AS secret_count,
+      COALESCE(s.affected_files, 0) AS affected_files
+    FROM (
+      SELECT year, month, day FROM trivy_findings
+      UNION SELECT year, month, day FROM gitleaks_findings
+    ) d
+    LEFT JOIN (
+      SELECT year, month, day,
+        SUM(CASE WHEN severity = 'CRITICAL' THEN 1 ELSE 0 END) AS critical_count,
+        SUM(CASE WHEN severity = 'HIGH' THEN 1 ELSE 0 END) AS high_count,
+        SUM(CASE WHEN severity = 'MEDIUM' THEN 1 ELSE 0 END) AS medium_count,
+        SUM(CASE WHEN severity = 'LOW' THEN 1 ELSE 0 END) AS low_count,
+        COUNT(*) AS total_count
+      FROM trivy_findings GROUP BY year, month, day
+    ) v ON v.year = d.year AND v.month = d.month AND v.day = d.day
+    LEFT JOIN (
+      SELECT year, month, day, COUNT(*) AS secret_count, COUNT(DISTINCT file) AS affected_files
+      FROM gitleaks_findings GROUP BY year, month, day
+    ) s ON s.year = d.year AND s.month = d.month AND s.day = d.day
+    """
+
+
+def _concat(*values):
+    """Presto CONCAT: NULL if any argument is NULL"""
+    if any(v is None for v in values):
+        return None
+    return "".join(str(v) for v in values)
+
+
+class AthenaBackend:
+    """Runs trend SQL on Amazon Athena through the shared executor"""
+
+    name = "athena"
+
+    def __init__(self, executor=None, result_cache=None):
+        from athena_client import get_executor, get_result_cache
+
+        self.executor = executor or get_executor()
+        self.result_cache = result_cache or get_result_cache()
+
+    @property
+    def stats(self):
+        return self.executor.stats
+
+    def run_queries(self, queries, database=None):
+        return self.executor.run_queries(queries, database=database)
+
+    def format_stats(self):
+        return self.executor.format_stats()
+
+
+def local_index_file(directory):
+    """Index file of a report directory; named after its path so several directories can share LOCAL_INDEX_DIR"""
+    path = os.path.abspath(directory)
+    digest = hashlib.sha256(path.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(LOCAL_INDEX_DIR, f"{os.path.basename(path) or 'reports'}-{digest}.sqlite")
+
+
+class LocalBackend:
+    """Runs trend SQL on a persistent SQLite index of a local report directory"""
+
+    name = "local"
+
+    def __init__(self, directory=LOCAL_REPORTS_DIR, index_file=None):
+        self.directory = directory
+        # Pass index_file=':memory:' to rebuild the index on every run
+        self.index_file = index_file or local_index_file(directory)
+        # Queries take milliseconds on the index, so their results are not cached
+        self.result_cache = None
+        self.stats = {}
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _signature(self):
+        """Identifies the report directory and table layout the index was built for"""
+        from compact_reports import TABLES
+
+        layout = {table: columns for table, _, _, columns in TABLES.values()}
+        data = json.dumps([LOCAL_INDEX_VERSION, layout, DAILY_SUMMARY_VIEW], sort_keys=True)
+        return {
+            "layout": hashlib.sha256(data.encode('utf-8')).hexdigest(),
+            "directory": os.path.abspath(self.directory)
+        }
+
+    def _open(self):
+        """Connection with the index attached as security_analytics; None if the file is unusable"""
+        if self.index_file != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.index_file)), exist_ok=True)
+        conn = sqlite3.connect(':memory:', check_same_thread=False)
+        conn.create_function("CONCAT", -1, _concat, deterministic=True)
+        try:
+            conn.execute("ATTACH DATABASE ? AS security_analytics", (self.index_file,))
+            conn.execute("CREATE TABLE IF NOT EXISTS security_analytics.index_meta (key TEXT PRIMARY KEY, value TEXT)")
+            meta = dict(conn.execute("SELECT key, value FROM security_analytics.index_meta"))
+        except sqlite3.DatabaseError as e:
+            print(f"⚠️ Local index {self.index_file} is unreadable ({e}); rebuilding it")
+            conn.close()
+            return None
+        if meta and meta != self._signature():
+            print(f"ℹ️ Local index {self.index_file} was built for another directory or layout; rebuilding it")
+            conn.close()
+            return None
+        return conn
+
+    def _create(self, conn):
+        from compact_reports import TABLES
+
+        for table, _, _, columns in TABLES.values():
+            column_defs = ", ".join(f'"{name}" {SQLITE_TYPES[kind]}' for name, kind in columns)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS security_analytics.{table} "
+                f"({column_defs}, year TEXT, month TEXT, day TEXT)"
+            )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS security_analytics.{table}_partition ON {table} (year, month, day, run_id)"
+            )
+        # One row per indexed run directory and report type, with the files it was read from
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS security_analytics.indexed_runs "
+            "(report_type TEXT, year TEXT, month TEXT, day TEXT, run_id TEXT, files TEXT, "
+            "PRIMARY KEY (report_type, year, month, day, run_id))"
+        )
+        conn.execute(DAILY_SUMMARY_VIEW.replace("CREATE VIEW", "CREATE VIEW IF NOT EXISTS", 1))
+        conn.executemany(
+            "INSERT OR REPLACE INTO security_analytics.index_meta VALUES (?, ?)", self._signature().items()
+        )
+
+    def _update(self, conn):
+        """Index new or changed runs and drop deleted ones; returns (runs indexed, rows added, runs dropped)"""
+        from compact_reports import TABLES, find_report_days
+
+        runs_indexed = rows_added = runs_dropped = 0
+        for report_type, (table, _, rows_for, columns) in TABLES.items():
+            indexed = {
+                tuple(row[:4]): row[4] for row in conn.execute(
+                    "SELECT year, month, day, run_id, files FROM security_analytics.indexed_runs "
+                    "WHERE report_type = ?", (report_type,)
+                )
+            }
+            runs = {}
+            for (year, month, day), reports in find_report_days(self.directory, report_type).items():
+                for run_id, path in reports:
+                    runs.setdefault((year, month, day, run_id), []).append(path)
+
+            insert = f"INSERT INTO security_analytics.{table} VALUES ({', '.join('?' * (len(columns) + 3))})"
+            delete = f"DELETE FROM security_analytics.{table} WHERE year = ? AND month = ? AND day = ? AND run_id = ?"
+            for run, paths in runs.items():
+                stats = [os.stat(path) for path in paths]
+                files = json.dumps([
+                    [os.path.relpath(path, self.directory), st.st_size, st.st_mtime_ns]
+                    for path, st in zip(paths, stats)
+                ])
+                previous = indexed.pop(run, None)
+                if previous == files:
+                    continue
+                if previous is not None:
+                    conn.execute(delete, run)
+                year, month, day, run_id = run
+                for path in paths:
+                    batch = [row + (year, month, day) for row in rows_for(path, run_id)]
+                    conn.executemany(insert, batch)
+                    rows_added += len(batch)
+                conn.execute(
+                    "INSERT OR REPLACE INTO security_analytics.indexed_runs VALUES (?, ?, ?, ?, ?, ?)",
+                    (report_type, *run, files)
+                )
+                runs_indexed += 1
+            # Whatever is left was deleted from the report directory
+            for run in indexed:
+                conn.execute(delete, run)
+                conn.execute(
+                    "DELETE FROM security_analytics.indexed_runs "
+                    "WHERE report_type = ? AND year = ? AND month = ? AND day = ? AND run_id = ?",
+                    (report_type, *run)
+                )
+                runs_dropped += 1
+        return runs_indexed, rows_added, runs_dropped
+
+    def _connect(self):
+        start = time.perf_counter()
+        conn = self._open()
+        if conn is None:
+            os.remove(self.index_file)
+            conn = self._open()
+        with conn:
+            self._create(conn)
+            runs_indexed, rows_added, runs_dropped = self._update(conn)
+
+        self.stats["index"] = {
+            "name": "index",
+            "state": "SUCCEEDED",
+            "wall_seconds": round(time.perf_counter() - start, 3),
+            "rows": rows_added,
+            "runs": runs_indexed,
+            "dropped_runs": runs_dropped
+        }
+        return conn
+
+    def run_queries(self, queries, database=None):
+        results = {}
+        with self._lock:
+            if self._conn is None:
+                with get_tracer().span("local.index") as span:
+                    self._conn = self._connect()
+                    span.count("rows", self.stats["index"]["rows"])
+                    span.count("runs", self.stats["index"]["runs"])
+            for name, query in queries.items():
+                start = time.perf_counter()
+                with get_tracer().span(f"local.{name}") as span:
+                    try:
+                        cursor = self._conn.execute(query)
+                        # Lower-case like Athena so the same parsers work on both backends
+                        row_type = namedtuple('Row', [d[0].lower() for d in cursor.description], rename=True)
+                        results[name] = [row_type(*values) for values in cursor.fetchall()]
+                        state = "SUCCEEDED"
+                        span.count("rows", len(results[name]))
+                    except sqlite3.Error as e:
+                        results[name] = e
+                        state = "FAILED"
+                        span.set("error", str(e))
+                self.stats[f"{name}-{len(self.stats)}"] = {
+                    "name": name,
+                    "state": state,
+                    "wall_seconds": round(time.perf_counter() - start, 4),
+                    "rows": len(results[name]) if state == "SUCCEEDED" else 0
+                }
+        return results
+
+    def format_stats(self):
+        """Markdown table of per-query timings"""
+        lines = [
+            "| Query | State | Wall (s) | Rows |",
+            "|-------|-------|----------|------|"
+        ]
+        for s in self.stats.values():
+            lines.append(f"| {s['name']} | {s['state']} | {s['wall_seconds']} | {s['rows']} |")
+        return "\n".join(lines) + "\n"
+
+
+BACKENDS = {
+    "athena": AthenaBackend,
+    "local": LocalBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide backend selected by TREND_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if TREND_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown TREND_BACKEND '{TREND_BACKEND}' (expected one of: {', '.join(BACKENDS)})")
+            _backend = BACKENDS[TREND_BACKEND]()
+        return _backend